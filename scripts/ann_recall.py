@@ -0,0 +1,122 @@
+import json
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from repo_rag.components.ann import AnnIndex
+from repo_rag.components.constants import EVAL_DATA_PATH, RESCORE_FACTOR
+from repo_rag.components.vectorstore import Vectorstore
+
+
+SEARCH_PARAM_GRID = {
+    'IVF': ('nprobe', [1, 4, 16, 64]),
+    'HNSW': ('efSearch', [16, 64, 256]),
+}
+
+
+def store_vectors(vectorstore) -> np.ndarray:
+    """
+    Returns the vectors of a loaded store in index order, re-embedding documents if the store has no exact copy.
+    """
+    vectors = Vectorstore.vectors(vectorstore)
+    if vectors is not None:
+        return vectors
+
+    ids = [vectorstore.index_to_docstore_id[i] for i in range(len(vectorstore.index_to_docstore_id))]
+    texts = [vectorstore.docstore.search(doc_id).page_content for doc_id in ids]
+    return np.asarray(vectorstore.embedding_function.embed_documents(texts), dtype=np.float32)
+
+
+def query_vectors(vectorstore, vectors: np.ndarray, n_queries: int = 200) -> np.ndarray:
+    """
+    Returns embedded evaluation questions, or a sample of stored vectors if there are none.
+    """
+    eval_data_path = Path(EVAL_DATA_PATH)
+    if eval_data_path.exists():
+        with eval_data_path.open('r', encoding='utf-8') as f:
+            questions = [query['question'] for query in json.load(f)][:n_queries]
+        embeddings = vectorstore.embedding_function
+        return np.asarray([embeddings.embed_query(question) for question in questions], dtype=np.float32)
+
+    sample = np.random.default_rng(0).choice(len(vectors), min(n_queries, len(vectors)), replace=False)
+    return vectors[sample]
+
+
+def index_mb(index: faiss.Index) -> float:
+    """
+    Returns the serialized size of an index in MB, which is about the memory it occupies when loaded.
+    """
+    return faiss.serialize_index(index).nbytes / 1024**2
+
+
+def mean_latency(index: faiss.Index, queries: np.ndarray, k: int) -> float:
+    """
+    Returns the mean search latency per query in milliseconds.
+    """
+    start_time = time.perf_counter()
+    for query in queries:
+        index.search(query[None, :], k)
+    return (time.perf_counter() - start_time) / len(queries) * 1000
+
+
+def main():
+    """
+    Compare recall@k, latency and memory of ANN index types, compressed (SQ/PQ) vector storage and
+    dimensionality reductions (PCA/RR) against exact search on the vectors of a store. Compressed
+    indexes are also evaluated with exact re-scoring of their candidates, as done by `RescoredFAISS`.
+    """
+    version = input('Enter vectorstore version (or press Enter to use default 1): ').strip() or '1'
+    default_factories = 'HNSW32;IVF256,Flat;IVF256,PQ64;SQfp16;SQ8;PQ64;PCA256,Flat'
+    index_factories = input(
+        f"Enter FAISS factory strings separated by ';' (or press Enter to use default '{default_factories}'): "
+    ).strip()
+    index_factories = [factory.strip() for factory in (index_factories or default_factories).split(';')]
+    k = int(input('Enter k (or press Enter to use default 10): ').strip() or 10)
+
+    vectorstore = Vectorstore(int(version)).load()
+    vectors = store_vectors(vectorstore)
+    queries = query_vectors(vectorstore, vectors)
+
+    reference = faiss.IndexFlatIP(vectors.shape[1])
+    reference.add(vectors)
+    print(f'{len(vectors)} vectors, {len(queries)} queries')
+    flat_mb = index_mb(reference)
+    print(f'Flat: recall@{k} 1.000, {mean_latency(reference, queries, k):.3f} ms/query, {flat_mb:.1f} MB')
+
+    for index_factory in index_factories:
+        if AnnIndex.training_size(index_factory, reference.d):
+            index = AnnIndex.train(reference, index_factory)
+            if index is None:
+                training_size = AnnIndex.training_size(index_factory, reference.d)
+                print(f'{index_factory}: skipped, training needs {training_size} vectors')
+                continue
+        else:
+            index = AnnIndex.build(index_factory, reference.d)
+            index.add(vectors)
+
+        memory = f'{index_mb(index):.1f} MB ({index_mb(index) / flat_mb:.0%} of Flat)'
+        compressed = AnnIndex.is_compressed(index)
+
+        grid = [(None, [None])]
+        for prefix, (name, values) in SEARCH_PARAM_GRID.items():
+            if prefix in index_factory:
+                grid = [(name, values)]
+
+        for name, values in grid:
+            for value in values:
+                search_params = {name: value} if name else None
+                recall = AnnIndex.recall(index, reference, queries, k, search_params)
+                if compressed:
+                    rescored = AnnIndex.recall(index, reference, queries, k, search_params, RESCORE_FACTOR)
+                    recall = f'{recall:.3f} ({rescored:.3f} re-scored from {RESCORE_FACTOR * k} candidates)'
+                else:
+                    recall = f'{recall:.3f}'
+                latency = mean_latency(index, queries, k)
+                label = f' {name}={value}' if name else ''
+                print(f'{index_factory}{label}: recall@{k} {recall}, {latency:.3f} ms/query, {memory}')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,19 +2,20 @@ import time
 import json
 import numpy as np
 from pathlib import Path
-from langchain.schema.retriever import BaseRetriever
 
-from repo_rag.components.vectorstore import Vectorstore
+from repo_rag.components.sharded_store import ShardedRetriever, ShardedVectorstore
+from repo_rag.components.versions import StoreVersions
 from repo_rag.components.constants import EVAL_DATA_PATH
+from repo_rag.components.embeddings import query_cache
 
 
-def recall_at_k(retriever: BaseRetriever, queries: list[dict[str, list[str]]], k: int = 10) -> float:
+def recall_at_k(retriever: ShardedRetriever, queries: list[dict[str, list[str]]], k: int = 10) -> float:
     """
     Computes Recall@K for the given retriever.
 
     Parameters
     ----------
-    retriever : BaseRetriever
+    retriever : ShardedRetriever
         The retriever object used for retrieving documents.
     queries : list of dict[str, list[str]]
         A list of queries, where each query contains a 'question' (str) and a list of relevant file names.
@@ -28,11 +29,10 @@ def recall_at_k(retriever: BaseRetriever, queries: list[dict[str, list[str]]], k
     """
     recalls = []
 
-    for query in queries:
-        question = query['question']
-        relevant_files = set(query['files'])
+    retrieved = retriever.batch_search([query['question'] for query in queries])
 
-        retrieved_docs = retriever.invoke(question)
+    for query, retrieved_docs in zip(queries, retrieved):
+        relevant_files = set(query['files'])
 
         retrieved_files = set()
         for doc in retrieved_docs:
@@ -49,9 +49,13 @@ def recall_at_k(retriever: BaseRetriever, queries: list[dict[str, list[str]]], k
 
 
 def main():
-    vectorstore = Vectorstore(1)
-    loaded_vectorstore = vectorstore.load()
-    retriever = loaded_vectorstore.as_retriever(search_type='similarity', search_kwargs={'k': 50})
+    version = StoreVersions.current()
+    vectorstore = ShardedVectorstore(version)
+    print(f'Vectorstore v{version}')
+    for name, shard in vectorstore.shards().items():
+        info = shard.info
+        print(f'Shard {name or "(unsharded)"}: {info.index_factory} index of {info.dimension}-dimensional vectors')
+    retriever = vectorstore.retriever(search_type='similarity', search_kwargs={'k': 50})
 
     eval_data_path = Path(EVAL_DATA_PATH)
 
@@ -67,6 +71,11 @@ def main():
     print(f'Recall@10: {recall_score:.2f}')  # 0.62
     print(f'Mean execution time: {mean_time:.4f} seconds')  # 0.55
 
+    query_stats = query_cache.stats()
+    print(
+        f'Query embedding cache: {query_stats["hits"] + query_stats["disk_hits"]} hits, {query_stats["misses"]} misses'
+    )
+
 
 if __name__ == '__main__':
     main()
@@ -1,13 +1,23 @@
+from pathlib import Path
+
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from repo_rag.components.constants import VECTORSTORE_VERSION
+from repo_rag.components.embeddings import EMBEDDING_BACKENDS
+from repo_rag.components.filters import FileFilter
+from repo_rag.components.indexer import Indexer
 from repo_rag.components.loader import Loader
-from repo_rag.components.vectorstore import Vectorstore
+from repo_rag.components.sharded_store import ShardedVectorstore
+from repo_rag.components.rate_limiter import RateLimitedEmbeddings
+from repo_rag.components.versions import StoreVersions
 
 
 def main():
     """
     Build index by providing repository url
     """
-    repo_url = input("Enter GitHub repository URL (or press Enter to use default 'escrcpy'): ").strip()
+    repo_url = input(
+        "Enter GitHub repository URL, local checkout or archive path (or press Enter to use default 'escrcpy'): "
+    ).strip()
     batch_size = input(
         'Enter batch size (number of documents per batch for vector store upload, recommended: 900): '
     ).strip()
@@ -28,14 +38,99 @@ def main():
 
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=1024, chunk_overlap=64, separators=['\n', ' ', ''])
 
-    documents = Loader.load_and_split(repo_url, text_splitter)
+    if Path(repo_url).exists():
+        metadata_url = input('Enter GitHub repository URL used in file links (optional for git checkouts): ').strip()
+        source, repo_url = repo_url, metadata_url
+    elif input('Download repository as a single archive instead of per-file API calls? [y/N]: ').strip() == 'y':
+        source = repo_url
+    else:
+        source = None
+
+    include = input('Enter comma-separated glob patterns of files to include (or press Enter to include all): ')
+    exclude = input('Enter comma-separated glob patterns of files to exclude (or press Enter to skip): ')
+    file_filter = FileFilter(
+        include=[pattern.strip() for pattern in include.split(',') if pattern.strip()],
+        exclude=[pattern.strip() for pattern in exclude.split(',') if pattern.strip()],
+    )
+
+    index_factory = input(
+        "Enter FAISS index factory string for a new vectorstore, e.g. 'HNSW32', 'IVF1024,PQ64' or 'PCA256,HNSW32' "
+        "(or press Enter to use INDEX_FACTORY, 'Flat' by default): "
+    ).strip()
+
+    embedding_backend = input(
+        f'Enter embedding backend for a new shard, one of {", ".join(EMBEDDING_BACKENDS)} '
+        '(or press Enter to use EMBEDDING_BACKEND): '
+    ).strip()
+    embedding_model = (
+        input('Enter embedding model (or press Enter to use the default of the backend): ').strip()
+        if embedding_backend
+        else ''
+    )
+
+    if VECTORSTORE_VERSION:
+        version = VECTORSTORE_VERSION
+        print(f'Building pinned vectorstore v{version} in place')
+    else:
+        fresh = input('Build the new version from scratch instead of from the published one? [y/N]: ').strip()
+        version = StoreVersions.stage(clone=fresh != 'y')
+        print(f'Building vectorstore v{version}, published v{StoreVersions.current()} is served until it is done')
+
+    vectorstore = ShardedVectorstore(
+        version,
+        index_factory=index_factory or None,
+        embedding_backend=embedding_backend or None,
+        embedding_model=embedding_model or None,
+    )
+    shard_url = Loader.source_url(source, repo_url or None) if source is not None else repo_url
+    if not vectorstore.is_legacy() and input("Rebuild the repository's shard from scratch? [y/N]: ").strip() == 'y':
+        vectorstore.drop(shard_url)
+
+    stats = Indexer.index_repository(
+        vectorstore, repo_url, text_splitter, batch_size=batch_size, source=source, file_filter=file_filter
+    )
+
+    print(
+        f'Files: {stats["added_files"]} added, {stats["modified_files"]} modified, '
+        f'{stats["deleted_files"]} deleted, {stats["unchanged_files"]} unchanged, {stats["failed_files"]} failed'
+    )
+    print(f'Chunks: {stats["embedded_chunks"]} embedded, {stats["removed_chunks"]} removed')
+    print(
+        f'Skipped: {stats["skipped_files"]} files, {stats["skipped_bytes"]} bytes, '
+        f'~{stats["skipped_chunks"]} chunks {file_filter.stats()["reasons"]}'
+    )
+
+    if not VECTORSTORE_VERSION:
+        StoreVersions.publish(version)
+        print(f'Published vectorstore v{version}, roll back with scripts/publish_version.py')
+
+    shards = vectorstore.load(read_only=True)
+    print(f'Total documents in index: {sum(shard.index.ntotal for shard in shards.values())} in {len(shards)} shards')
+
+    shard = vectorstore.shard(shard_url)
+    print(f'Shard embeddings: {shard.info.embedding_backend} {shard.info.embedding_model}')
+
+    embeddings = shard.embeddings.embeddings
+    if isinstance(embeddings, RateLimitedEmbeddings):
+        limiter = embeddings.limiter
+        print(
+            f'Embedding requests: {embeddings.requests} ({embeddings.tokens} tokens), '
+            f'{limiter.rate_limited} rate-limited, throttled for {limiter.throttled_seconds:.1f} s'
+        )
 
-    vectorstore = Vectorstore(1)
-    vectorstore.create()
-    vectorstore.add_docs(documents, batch_size=900)
+    embedding_cache_stats = shard.embeddings.stats()
+    print(
+        f'Embedding cache: {embedding_cache_stats["hits"]} hits, {embedding_cache_stats["misses"]} misses '
+        f'(hit rate {embedding_cache_stats["hit_rate"]:.2f}), {embedding_cache_stats["tokens_saved"]} tokens saved, '
+        f'{embedding_cache_stats["evictions"]} evictions'
+    )
 
-    index = vectorstore.load().index
-    print(f'Total documents in index: {index.ntotal}')
+    if Loader.http_cache is not None:
+        cache_stats = Loader.http_cache.stats()
+        print(
+            f'GitHub HTTP cache: {cache_stats["hits"]} hits, {cache_stats["misses"]} misses '
+            f'(hit rate {cache_stats["hit_rate"]:.2f}), {cache_stats["evictions"]} evictions'
+        )
 
 
 if __name__ == '__main__':
@@ -0,0 +1,124 @@
+import base64
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+class Budget:
+    """
+    Per-minute token and request budgets of the stand-in server, refilled continuously.
+    """
+
+    def __init__(self, tpm: int, rpm: int):
+        self.tpm = tpm
+        self.rpm = rpm
+        self.tokens = float(tpm)
+        self.requests = float(rpm)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, tokens: int) -> float:
+        """Consumes the budget of a request, returning 0 or the seconds to wait if it does not fit."""
+        with self.lock:
+            now = time.monotonic()
+            elapsed, self.updated = now - self.updated, now
+            self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+            self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+
+            if self.tokens >= min(tokens, self.tpm) and self.requests >= 1:
+                self.tokens -= min(tokens, self.tpm)
+                self.requests -= 1
+                return 0.0
+
+            return max((min(tokens, self.tpm) - self.tokens) * 60 / self.tpm, (1 - self.requests) * 60 / self.rpm)
+
+
+def embedding(value: str | list[int], dimensions: int) -> np.ndarray:
+    """Returns a deterministic pseudo-random unit vector for an input."""
+    seed = int.from_bytes(hashlib.sha256(json.dumps(value).encode('utf-8')).digest()[:8], 'little')
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def make_handler(budget: Budget, dimensions: int) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/embeddings'):
+                self.send_error(404)
+                return
+
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            inputs = body['input'] if isinstance(body['input'], list) else [body['input']]
+            if inputs and isinstance(inputs[0], int):
+                inputs = [inputs]
+            tokens = sum(len(value) if isinstance(value, list) else len(value) // 4 + 1 for value in inputs)
+
+            wait = budget.take(tokens)
+            if wait:
+                self._send(
+                    429,
+                    {'error': {'message': 'Rate limit reached', 'type': 'requests', 'code': 'rate_limit_exceeded'}},
+                    {'Retry-After': f'{wait:.3f}', 'retry-after-ms': str(int(wait * 1000))},
+                )
+                return
+
+            data = []
+            for i, value in enumerate(inputs):
+                vector = embedding(value, dimensions)
+                if body.get('dimensions'):
+                    vector = vector[: body['dimensions']] / np.linalg.norm(vector[: body['dimensions']])
+                if body.get('encoding_format') == 'base64':
+                    vector = base64.b64encode(vector.tobytes()).decode('ascii')
+                else:
+                    vector = vector.tolist()
+                data.append({'object': 'embedding', 'index': i, 'embedding': vector})
+
+            self._send(
+                200,
+                {
+                    'object': 'list',
+                    'data': data,
+                    'model': body.get('model'),
+                    'usage': {'prompt_tokens': tokens, 'total_tokens': tokens},
+                },
+            )
+
+        def _send(self, status: int, payload: dict, headers: dict[str, str] | None = None):
+            content = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(content)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            if args and str(args[1]) == '429':
+                super().log_message(format, *args)
+
+    return Handler
+
+
+def main():
+    """
+    Run a local stand-in for the OpenAI embeddings endpoint with configurable rate limits.
+
+    Useful to exercise the embedding rate limiter without spending API credits, e.g.
+    `OPEN_AI_BASE_URL=http://localhost:8765/v1 python scripts/build_index.py`.
+    """
+    port = input('Enter port (or press Enter to use default 8765): ').strip() or '8765'
+    tpm = input('Enter tokens per minute limit (or press Enter to use default 1000000): ').strip() or '1000000'
+    rpm = input('Enter requests per minute limit (or press Enter to use default 3000): ').strip() or '3000'
+
+    server = ThreadingHTTPServer(('localhost', int(port)), make_handler(Budget(int(tpm), int(rpm)), 1536))
+    print(f'Serving embeddings on http://localhost:{port}/v1 (TPM {tpm}, RPM {rpm})')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import multiprocessing
+import time
+from pathlib import Path
+
+from repo_rag.components.vectorstore import Vectorstore
+
+
+def memory_mb() -> tuple[float, float]:
+    """
+    Returns resident (RSS) and proportional (PSS, shared pages split between processes) memory in MB.
+    """
+    values = {}
+    for line in Path('/proc/self/smaps_rollup').read_text().splitlines():
+        name, _, value = line.partition(':')
+        if name in ('Rss', 'Pss'):
+            values[name] = int(value.split()[0]) / 1024
+    return values['Rss'], values['Pss']
+
+
+def worker(version: int, read_only: bool, results: multiprocessing.Queue, done: multiprocessing.Event) -> None:
+    """
+    Loads the vectorstore, reports startup time and memory, and stays alive until all workers reported.
+    """
+    start_time = time.perf_counter()
+    vectorstore = Vectorstore(version).load(read_only=read_only)
+    if vectorstore.index.ntotal:
+        vectorstore.index.search(vectorstore.index.reconstruct(0)[None, :], 10)
+    startup_time = time.perf_counter() - start_time
+
+    rss, pss = memory_mb()
+    results.put((startup_time, rss, pss))
+    done.wait()
+
+
+def main():
+    """
+    Benchmark startup time and memory of N worker processes loading the same vectorstore
+    """
+    version = int(input('Enter vectorstore version (or press Enter to use default 1): ').strip() or 1)
+    workers = int(input('Enter number of workers (or press Enter to use default 4): ').strip() or 4)
+
+    context = multiprocessing.get_context('spawn')
+    for read_only in (False, True):
+        results, done = context.Queue(), context.Event()
+        processes = [context.Process(target=worker, args=(version, read_only, results, done)) for _ in range(workers)]
+        for process in processes:
+            process.start()
+
+        stats = [results.get() for _ in processes]
+        done.set()
+        for process in processes:
+            process.join()
+
+        startup_times, rss, pss = zip(*stats)
+        mode = 'mmap (read-only)' if read_only else 'heap'
+        print(
+            f'{mode}: {workers} workers, '
+            f'startup {sum(startup_times) / workers:.2f} s (max {max(startup_times):.2f} s), '
+            f'RSS {sum(rss) / workers:.0f} MB per worker, PSS {sum(pss):.0f} MB in total'
+        )
+
+
+if __name__ == '__main__':
+    main()
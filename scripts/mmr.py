@@ -2,19 +2,19 @@ import time
 import json
 import numpy as np
 from pathlib import Path
-from langchain.schema.retriever import BaseRetriever
 
-from repo_rag.components.vectorstore import Vectorstore
+from repo_rag.components.sharded_store import ShardedRetriever, ShardedVectorstore
+from repo_rag.components.versions import StoreVersions
 from repo_rag.components.constants import EVAL_DATA_PATH
 
 
-def recall_at_k(retriever: BaseRetriever, queries: list[dict[str, list[str]]], k: int = 10) -> float:
+def recall_at_k(retriever: ShardedRetriever, queries: list[dict[str, list[str]]], k: int = 10) -> float:
     """
     Computes Recall@K for the given retriever.
 
     Parameters
     ----------
-    retriever : BaseRetriever
+    retriever : ShardedRetriever
         The retriever object used for retrieving documents.
     queries : list of dict[str, list[str]]
         A list of queries, where each query contains a 'question' (str) and a list of relevant file names.
@@ -28,11 +28,10 @@ def recall_at_k(retriever: BaseRetriever, queries: list[dict[str, list[str]]], k
     """
     recalls = []
 
-    for query in queries:
-        question = query['question']
-        relevant_files = set(query['files'])
+    retrieved = retriever.batch_search([query['question'] for query in queries])
 
-        retrieved_docs = retriever.invoke(question)
+    for query, retrieved_docs in zip(queries, retrieved):
+        relevant_files = set(query['files'])
 
         retrieved_files = set()
         for doc in retrieved_docs:
@@ -49,9 +48,9 @@ def recall_at_k(retriever: BaseRetriever, queries: list[dict[str, list[str]]], k
 
 
 def main():
-    vectorstore = Vectorstore(1)
-    loaded_vectorstore = vectorstore.load()
-    retriever = loaded_vectorstore.as_retriever(search_type='mmr', search_kwargs={'k': 30, 'fetch_k': 60})
+    retriever = ShardedVectorstore(StoreVersions.current()).retriever(
+        search_type='mmr', search_kwargs={'k': 30, 'fetch_k': 60}
+    )
 
     eval_data_path = Path(EVAL_DATA_PATH)
 
@@ -0,0 +1,20 @@
+from repo_rag.components.versions import StoreVersions
+
+
+def main():
+    """
+    Publish a vectorstore version, or roll back to the previously published one
+    """
+    print(f'Published version: {StoreVersions.current()}, versions on disk: {StoreVersions.versions()}')
+    version = input('Enter version to publish (or press Enter to roll back to the previous version): ').strip()
+
+    if version:
+        StoreVersions.publish(int(version))
+    else:
+        StoreVersions.rollback()
+
+    print(f'Serving version {StoreVersions.current()}')
+
+
+if __name__ == '__main__':
+    main()
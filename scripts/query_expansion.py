@@ -3,15 +3,15 @@ import json
 from typing import Literal
 import numpy as np
 from pathlib import Path
-from langchain.schema.retriever import BaseRetriever
 
-from repo_rag.components.vectorstore import Vectorstore
+from repo_rag.components.sharded_store import ShardedRetriever, ShardedVectorstore
+from repo_rag.components.versions import StoreVersions
 from repo_rag.components.constants import EVAL_DATA_PATH
 from repo_rag.components.chains import query_expansion_chain
 
 
 def recall_at_k(
-    retriever: BaseRetriever,
+    retriever: ShardedRetriever,
     queries: list[dict[str, list[str]]],
     k: int = 10,
 ) -> float:
@@ -20,7 +20,7 @@ def recall_at_k(
 
     Parameters
     ----------
-    retriever : BaseRetriever
+    retriever : ShardedRetriever
         The retriever object used for retrieving documents.
     queries : list of dict[str, list[str]]
         A list of queries, where each query contains a 'question' (str) and a list of relevant file names.
@@ -34,13 +34,11 @@ def recall_at_k(
     """
     recalls = []
 
-    for query in queries:
-        question = query['question']
-        relevant_files = set(query['files'])
-
-        expanded_query = query_expansion_chain.invoke(question).expanded_query
+    expansions = query_expansion_chain.batch([query['question'] for query in queries])
+    retrieved = retriever.batch_search([expansion.expanded_query for expansion in expansions])
 
-        retrieved_docs = retriever.invoke(expanded_query)
+    for query, retrieved_docs in zip(queries, retrieved):
+        relevant_files = set(query['files'])
 
         retrieved_files = set()
         for doc in retrieved_docs:
@@ -57,9 +55,7 @@ def recall_at_k(
 
 
 def main():
-    vectorstore = Vectorstore(1)
-    loaded_vectorstore = vectorstore.load()
-    retriever = loaded_vectorstore.as_retriever(search_type='similarity', search_kwargs={'k': 50})
+    retriever = ShardedVectorstore(StoreVersions.current()).retriever(search_type='similarity', search_kwargs={'k': 50})
 
     eval_data_path = Path(EVAL_DATA_PATH)
 
@@ -2,15 +2,15 @@ import time
 import json
 import numpy as np
 from pathlib import Path
-from langchain.schema.retriever import BaseRetriever
 
-from repo_rag.components.vectorstore import Vectorstore
+from repo_rag.components.sharded_store import ShardedRetriever, ShardedVectorstore
+from repo_rag.components.versions import StoreVersions
 from repo_rag.components.constants import EVAL_DATA_PATH
 from repo_rag.components.chains import query_extraction_chain
 
 
 def recall_at_k(
-    retriever: BaseRetriever,
+    retriever: ShardedRetriever,
     queries: list[dict[str, list[str]]],
     k: int = 10,
 ) -> float:
@@ -19,7 +19,7 @@ def recall_at_k(
 
     Parameters
     ----------
-    retriever : BaseRetriever
+    retriever : ShardedRetriever
         The retriever object used for retrieving documents.
     queries : list of dict[str, list[str]]
         A list of queries, where each query contains a 'question' (str) and a list of relevant file names.
@@ -33,18 +33,18 @@ def recall_at_k(
     """
     recalls = []
 
-    for query in queries:
-        question = query['question']
-        relevant_files = set(query['files'])
-
-        response = query_extraction_chain.invoke(question)
+    questions = [query['question'] for query in queries]
+    search_queries = []
+    for question, response in zip(questions, query_extraction_chain.batch(questions)):
         if 'CALLED_RETRIEVER' in response.content:
-            response.content = response.content.replace('CALLED_RETRIEVER', '')
-            response = question + response.content
+            search_queries.append(question + response.content.replace('CALLED_RETRIEVER', ''))
         else:
-            response = question
+            search_queries.append(question)
 
-        retrieved_docs = retriever.invoke(response)
+    retrieved = retriever.batch_search(search_queries)
+
+    for query, retrieved_docs in zip(queries, retrieved):
+        relevant_files = set(query['files'])
 
         retrieved_files = set()
         for doc in retrieved_docs:
@@ -61,9 +61,7 @@ def recall_at_k(
 
 
 def main():
-    vectorstore = Vectorstore(1)
-    loaded_vectorstore = vectorstore.load()
-    retriever = loaded_vectorstore.as_retriever(search_type='similarity', search_kwargs={'k': 50})
+    retriever = ShardedVectorstore(StoreVersions.current()).retriever(search_type='similarity', search_kwargs={'k': 50})
 
     eval_data_path = Path(EVAL_DATA_PATH)
 
@@ -3,15 +3,15 @@ import json
 from typing import Literal
 import numpy as np
 from pathlib import Path
-from langchain.schema.retriever import BaseRetriever
 
-from repo_rag.components.vectorstore import Vectorstore
+from repo_rag.components.sharded_store import ShardedRetriever, ShardedVectorstore
+from repo_rag.components.versions import StoreVersions
 from repo_rag.components.constants import EVAL_DATA_PATH
 from repo_rag.components.reranker import Reranker
 
 
 def recall_at_k(
-    retriever: BaseRetriever,
+    retriever: ShardedRetriever,
     reranker_model: Literal['listwise', 'cross-encoder'],
     queries: list[dict[str, list[str]]],
     k: int = 10,
@@ -21,7 +21,7 @@ def recall_at_k(
 
     Parameters
     ----------
-    retriever : BaseRetriever
+    retriever : ShardedRetriever
         The retriever object used for retrieving documents.
     reranker_model: Literal['listwise', 'cross-encoder']
         The rereanker used for reranking
@@ -37,11 +37,11 @@ def recall_at_k(
     """
     recalls = []
 
-    for query in queries:
-        question = query['question']
-        relevant_files = set(query['files'])
+    questions = [query['question'] for query in queries]
+    retrieved = retriever.batch_search(questions)
 
-        retrieved_docs = retriever.invoke(question)
+    for question, query, retrieved_docs in zip(questions, queries, retrieved):
+        relevant_files = set(query['files'])
 
         reranked_docs = Reranker.rerank(reranker_model, question, retrieved_docs)
 
@@ -60,9 +60,7 @@ def recall_at_k(
 
 
 def main():
-    vectorstore = Vectorstore(1)
-    loaded_vectorstore = vectorstore.load()
-    retriever = loaded_vectorstore.as_retriever(search_type='similarity', search_kwargs={'k': 25})
+    retriever = ShardedVectorstore(StoreVersions.current()).retriever(search_type='similarity', search_kwargs={'k': 25})
 
     eval_data_path = Path(EVAL_DATA_PATH)
 
@@ -0,0 +1,371 @@
+import asyncio
+import logging
+from typing import Callable
+
+import faiss
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStoreRetriever
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class AnnIndex:
+    """
+    A component building, training and tuning FAISS indexes from factory strings.
+
+    Any `faiss.index_factory` string can be used, e.g. `Flat` (exact search), `HNSW32`,
+    `IVF1024,Flat` or `IVF1024,PQ64`, also with a dimensionality reduction applied to vectors
+    and queries alike, e.g. `PCA256,Flat` or `RR256,HNSW32`. Index types that need training
+    start out as an exact flat index and are converted by `train` once enough vectors have been
+    added, keeping the order of the vectors, so positions in the docstore mapping stay valid.
+    """
+
+    METRIC = faiss.METRIC_INNER_PRODUCT
+    TRAINING_POINTS_PER_CENTROID = 39
+    MAX_TRAINING_POINTS_PER_CENTROID = 256
+    TRAINING_POINTS_PER_DIMENSION = 1
+
+    @staticmethod
+    def build(index_factory: str, dimension: int) -> faiss.Index:
+        """Builds an empty, possibly untrained, index from a factory string."""
+        return faiss.index_factory(dimension, index_factory, AnnIndex.METRIC)
+
+    @staticmethod
+    def create(index_factory: str, dimension: int) -> faiss.Index:
+        """
+        Creates an empty index ready to add vectors to.
+
+        Parameters
+        ----------
+        index_factory : str
+            FAISS factory string of the target index type.
+        dimension : int
+            Dimension of the vectors.
+
+        Returns
+        -------
+        faiss.Index
+            The target index if it needs no training, otherwise an exact flat index to be
+            converted by `train`.
+        """
+        index = AnnIndex.build(index_factory, dimension)
+        if index.is_trained:
+            return index
+        return faiss.IndexFlatIP(dimension)
+
+    @staticmethod
+    def unwrap(index: faiss.Index) -> tuple[faiss.Index, faiss.IndexPreTransform | None]:
+        """Returns the index behind a vector transform (e.g. PCA), and the transforming index if there is one."""
+        index = faiss.downcast_index(index)
+        if isinstance(index, faiss.IndexPreTransform):
+            return faiss.downcast_index(index.index), index
+        return index, None
+
+    @staticmethod
+    def is_pending(index: faiss.Index, index_factory: str) -> bool:
+        """Checks whether the index is still the flat stand-in of an index type that needs training."""
+        return (
+            isinstance(faiss.downcast_index(index), faiss.IndexFlat)
+            and not AnnIndex.build(index_factory, index.d).is_trained
+        )
+
+    @staticmethod
+    def training_size(index_factory: str, dimension: int) -> int:
+        """
+        Returns the number of vectors needed to train an index type.
+
+        Parameters
+        ----------
+        index_factory : str
+            FAISS factory string.
+        dimension : int
+            Dimension of the vectors.
+
+        Returns
+        -------
+        int
+            `TRAINING_POINTS_PER_CENTROID` times the largest number of centroids of the
+            coarse quantizer and product quantizer, at least `TRAINING_POINTS_PER_DIMENSION`
+            times the input dimension of learned transforms such as PCA, or 0 if no training is needed.
+        """
+        index = AnnIndex.build(index_factory, dimension)
+        if index.is_trained:
+            return 0
+
+        inner, pretransform = AnnIndex.unwrap(index)
+        dimensions = 0
+        if pretransform is not None:
+            for i in range(pretransform.chain.size()):
+                transform = faiss.downcast_VectorTransform(pretransform.chain.at(i))
+                if not transform.is_trained and not isinstance(transform, faiss.RandomRotationMatrix):
+                    dimensions = max(dimensions, transform.d_in)
+
+        centroids = 1
+        try:
+            ivf = faiss.extract_index_ivf(inner)
+            centroids = ivf.nlist
+            pq = getattr(faiss.downcast_index(ivf), 'pq', None)
+        except RuntimeError:
+            pq = getattr(inner, 'pq', None)
+        if pq is not None:
+            centroids = max(centroids, pq.ksub)
+
+        return max(
+            AnnIndex.TRAINING_POINTS_PER_CENTROID * centroids, AnnIndex.TRAINING_POINTS_PER_DIMENSION * dimensions
+        )
+
+    @staticmethod
+    def train(index: faiss.Index, index_factory: str) -> faiss.Index | None:
+        """
+        Converts a flat stand-in index into the trained target index type.
+
+        Parameters
+        ----------
+        index : faiss.Index
+            Flat index holding all vectors.
+        index_factory : str
+            FAISS factory string of the target index type.
+
+        Returns
+        -------
+        faiss.Index | None
+            The trained index holding the same vectors in the same order, or None if there
+            are not enough vectors to train it yet.
+        """
+        training_size = AnnIndex.training_size(index_factory, index.d)
+        if index.ntotal < training_size:
+            return None
+
+        vectors = index.reconstruct_n(0, index.ntotal)
+        sample_size = training_size * AnnIndex.MAX_TRAINING_POINTS_PER_CENTROID // AnnIndex.TRAINING_POINTS_PER_CENTROID
+        sample = vectors
+        if len(vectors) > sample_size:
+            sample = vectors[np.random.default_rng(0).choice(len(vectors), sample_size, replace=False)]
+
+        trained = AnnIndex.build(index_factory, index.d)
+        logger.info(f'Training {index_factory} index on {len(sample)} of {len(vectors)} vectors...')
+        trained.train(sample)
+        trained.add(vectors)
+        return AnnIndex.prepare(trained)
+
+    @staticmethod
+    def remove(
+        index: faiss.Index, positions: list[int], vectors: Callable[[np.ndarray], np.ndarray] | None = None
+    ) -> faiss.Index:
+        """
+        Removes vectors, shifting the positions of the following vectors down like `IndexFlat` does.
+
+        Flat indexes, also scalar or product quantized ones, remove in place. Inverted-file
+        indexes remove the entries and renumber the remaining ids, and graph indexes (HNSW),
+        which do not support removal, are rebuilt from their remaining vectors. These are the
+        full-precision vectors if given, as the vectors reconstructed from a compressed or reduced
+        index are lossy and would be compressed again by every rebuild.
+
+        Parameters
+        ----------
+        index : faiss.Index
+            Index to remove the vectors from.
+        positions : list[int]
+            Positions of the vectors to remove.
+        vectors : Callable[[np.ndarray], np.ndarray] | None, optional
+            Returns the full-precision vectors at the given positions, such as `ExactVectors.get`, by
+            default None (the vectors reconstructed from the index).
+
+        Returns
+        -------
+        faiss.Index
+            The index without the removed vectors, a new object if it had to be rebuilt.
+        """
+        positions = np.unique(np.asarray(positions, dtype=np.int64))
+        if isinstance(AnnIndex.unwrap(index)[0], faiss.IndexFlatCodes):
+            index.remove_ids(positions)
+            return index
+
+        try:
+            ivf = faiss.extract_index_ivf(index)
+        except RuntimeError:
+            ivf = None
+
+        if ivf is not None:
+            direct_map_type = ivf.direct_map.type
+            ivf.make_direct_map(False)
+            index.remove_ids(faiss.IDSelectorBatch(positions))
+            invlists = ivf.invlists
+            for list_no in range(ivf.nlist):
+                size = invlists.list_size(list_no)
+                if size:
+                    ids = faiss.rev_swig_ptr(invlists.get_ids(list_no), size)
+                    ids -= np.searchsorted(positions, ids)
+            ivf.set_direct_map_type(direct_map_type)
+            return index
+
+        keep = np.setdiff1d(np.arange(index.ntotal), positions)
+        kept = vectors(keep) if vectors is not None else index.reconstruct_n(0, index.ntotal)[keep]
+        rebuilt = faiss.clone_index(index)
+        rebuilt.reset()
+        rebuilt.add(kept)
+        return rebuilt
+
+    @staticmethod
+    def prepare(index: faiss.Index) -> faiss.Index:
+        """Enables `reconstruct` (used by MMR search) on inverted-file indexes, returning the index."""
+        try:
+            faiss.extract_index_ivf(index).make_direct_map()
+        except RuntimeError:
+            pass
+        return index
+
+    @staticmethod
+    def is_flat(index: faiss.Index) -> bool:
+        """Checks whether the index is an exact flat index."""
+        return isinstance(faiss.downcast_index(index), faiss.IndexFlat)
+
+    @staticmethod
+    def code_size(index: faiss.Index) -> int:
+        """Returns the number of bytes an index stores per vector, without ids and graph links."""
+        inner = AnnIndex.unwrap(index)[0]
+        storage = faiss.downcast_index(inner.storage) if isinstance(inner, faiss.IndexHNSW) else inner
+        try:
+            return faiss.extract_index_ivf(storage).code_size
+        except RuntimeError:
+            return storage.sa_code_size()
+
+    @staticmethod
+    def is_compressed(index: faiss.Index) -> bool:
+        """Checks whether an index stores vectors lossily, e.g. as float16, int8, PQ codes or in fewer dimensions."""
+        return AnnIndex.code_size(index) < index.d * np.dtype(np.float32).itemsize
+
+    @staticmethod
+    def to_mappable(index: faiss.Index) -> faiss.Index:
+        """
+        Copies a flat index into an equivalent single-list inverted-file index.
+
+        FAISS can only memory-map inverted lists, so the copy can be loaded with
+        `faiss.IO_FLAG_MMAP` and shared between processes, while a search scanning its one
+        list is still exact.
+
+        Parameters
+        ----------
+        index : faiss.Index
+            Flat index.
+
+        Returns
+        -------
+        faiss.Index
+            `IndexIVFFlat` with one list holding the same vectors in the same order.
+        """
+        quantizer = faiss.IndexFlat(index.d, index.metric_type)
+        quantizer.add(np.zeros((1, index.d), dtype=np.float32))
+        mappable = faiss.IndexIVFFlat(quantizer, index.d, 1, index.metric_type)
+        mappable.is_trained = True
+        if index.ntotal:
+            mappable.add(index.reconstruct_n(0, index.ntotal))
+        return mappable
+
+    @staticmethod
+    def set_search_params(index: faiss.Index, search_params: dict[str, float] | None) -> None:
+        """
+        Sets search-time parameters such as `nprobe` or `efSearch` on an index.
+
+        Parameters
+        ----------
+        index : faiss.Index
+            Index to tune.
+        search_params : dict[str, float] | None
+            Parameter values by name, see `faiss.ParameterSpace`. Parameters the index type
+            does not have are ignored.
+        """
+        parameter_space = faiss.ParameterSpace()
+        for name, value in (search_params or {}).items():
+            try:
+                parameter_space.set_index_parameter(index, name, value)
+            except RuntimeError:
+                logger.debug(f'Index {type(index).__name__} has no search parameter {name}')
+
+    @staticmethod
+    def recall(
+        index: faiss.Index,
+        reference: faiss.Index,
+        queries: np.ndarray,
+        k: int = 10,
+        search_params: dict[str, float] | None = None,
+        rescore_factor: int | None = None,
+    ) -> float:
+        """
+        Computes recall@k of an approximate index against exact search.
+
+        Parameters
+        ----------
+        index : faiss.Index
+            Approximate index.
+        reference : faiss.Index
+            Exact (flat) index holding the same vectors in the same order.
+        queries : np.ndarray
+            Query vectors.
+        k : int, optional
+            Number of nearest neighbours, by default 10.
+        search_params : dict[str, float] | None, optional
+            Search parameters of the approximate index, by default None.
+        rescore_factor : int | None, optional
+            If given, `rescore_factor * k` candidates of the approximate index are re-ranked by
+            their exact scores like `RescoredFAISS` does, by default None.
+
+        Returns
+        -------
+        float
+            Share of the exact k nearest neighbours found by the approximate index.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        AnnIndex.set_search_params(index, search_params)
+        _, found = index.search(queries, k * (rescore_factor or 1))
+        _, expected = reference.search(queries, k)
+
+        if rescore_factor:
+            candidates = np.where(found >= 0, found, 0)
+            vectors = reference.reconstruct_batch(candidates.ravel()).reshape(*candidates.shape, reference.d)
+            scores = np.einsum('qkd,qd->qk', vectors, queries)
+            scores[found < 0] = -np.inf
+            found = np.take_along_axis(found, np.argsort(-scores, axis=1)[:, :k], axis=1)
+
+        hits = sum(
+            len(set(row[row >= 0]) & set(expected_row[expected_row >= 0])) for row, expected_row in zip(found, expected)
+        )
+        total = int((expected >= 0).sum())
+        return hits / total if total else 0.0
+
+
+class TunedRetriever(VectorStoreRetriever):
+    """
+    A vectorstore retriever applying its own FAISS search parameters (e.g. `nprobe`, `efSearch`).
+
+    FAISS search parameters are set on the index itself, so they are applied right before each
+    index search under the `search_lock` of the vectorstore, letting retrievers with different
+    speed/recall trade-offs share one index. Queries are embedded outside of the lock.
+    """
+
+    search_params: dict[str, float] = {}
+
+    def _search(self, query: str) -> list[Document]:
+        """Searches the vectorstore with the retriever's search parameters."""
+        if self.search_type not in ('similarity', 'mmr'):
+            with self.vectorstore.search_lock:
+                AnnIndex.set_search_params(self.vectorstore.index, self.search_params)
+                return super()._get_relevant_documents(query, run_manager=None)
+
+        embedding = self.vectorstore._embed_query(query)
+        with self.vectorstore.search_lock:
+            AnnIndex.set_search_params(self.vectorstore.index, self.search_params)
+            if self.search_type == 'similarity':
+                return self.vectorstore.similarity_search_by_vector(embedding, **self.search_kwargs)
+            return self.vectorstore.max_marginal_relevance_search_by_vector(embedding, **self.search_kwargs)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        return self._search(query)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        return await asyncio.to_thread(self._search, query)
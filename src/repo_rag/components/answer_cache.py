@@ -0,0 +1,238 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from repo_rag.components.constants import (
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL,
+    EMBEDDING_BACKEND,
+    EMBEDDING_DIMENSIONS,
+    EMBEDDING_MODEL,
+)
+from repo_rag.components.embeddings import get_embeddings
+from repo_rag.components.versions import StoreVersions
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class AnswerCache:
+    """
+    A bounded in-memory cache of answers, looked up by the similarity of question embeddings.
+
+    Entries hold a question, its answer and the sources it was based on, scoped by the searched
+    repositories and the vectorstore version that was served. A question is answered from the
+    cache if a cached question of the same scope is at least `threshold` similar to it (cosine
+    similarity of their embeddings), so repeated and reworded questions skip both LLM calls and
+    the retrieval. Questions are embedded with the configured query embeddings, whose own cache
+    makes repeated lookups cost no embedding request.
+
+    Entries of other versions than the served one are stale and dropped on lookup, so publishing,
+    rolling back or pinning another version invalidates them; `invalidate` drops the entries of a
+    repository rebuilt in place. Entries expire `ttl` seconds after they were added, and the least
+    recently used ones are evicted above `max_entries`.
+    """
+
+    def __init__(self, embeddings: Embeddings, threshold: float, max_entries: int, ttl: float | None = None):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.hit_age = 0.0
+
+        # entry id -> (scope, version, question, vector, answer, sources, created), in least recently used order
+        self._entries: OrderedDict[int, tuple] = OrderedDict()
+        # scope -> (entry ids, matrix of their vectors), rebuilt after the entries of a scope change
+        self._matrices: dict[tuple[str, ...] | None, tuple[list[int], np.ndarray]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def scope(repo_urls: list[str] | None) -> tuple[str, ...] | None:
+        """Returns the scope of a search of the given repositories, None for all of them."""
+        return tuple(sorted(set(repo_urls))) if repo_urls else None
+
+    def _embed(self, question: str) -> np.ndarray:
+        """Returns the L2-normalized embedding of a question."""
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, entry_ids: list[int]) -> None:
+        """Removes entries and the matrices of their scopes. Call with the lock held."""
+        for entry_id in entry_ids:
+            scope = self._entries.pop(entry_id)[0]
+            self._matrices.pop(scope, None)
+
+    def _matrix(self, scope: tuple[str, ...] | None, version: int) -> tuple[list[int], np.ndarray | None]:
+        """
+        Returns the ids and vectors of the fresh entries of a scope, dropping stale and expired ones.
+        Call with the lock held.
+        """
+        if scope in self._matrices:
+            entry_ids, matrix = self._matrices[scope]
+            # all entries of a matrix have the version it was built for
+            if not entry_ids or self._entries[entry_ids[0]][1] == version:
+                return entry_ids, matrix
+
+        now = time.time()
+        stale, expired, entry_ids = [], [], []
+        for entry_id, entry in self._entries.items():
+            if entry[0] != scope:
+                continue
+            if entry[1] != version:
+                stale.append(entry_id)
+            elif self.ttl and now - entry[6] > self.ttl:
+                expired.append(entry_id)
+            else:
+                entry_ids.append(entry_id)
+
+        if stale:
+            logger.info(f'Dropping {len(stale)} cached answers of outdated vectorstore versions.')
+        self.invalidations += len(stale)
+        self.expirations += len(expired)
+        self._drop(stale + expired)
+
+        matrix = np.stack([self._entries[entry_id][3] for entry_id in entry_ids]) if entry_ids else None
+        self._matrices[scope] = (entry_ids, matrix)
+        return entry_ids, matrix
+
+    def lookup(self, question: str, repo_urls: list[str] | None = None) -> dict | None:
+        """
+        Returns the cached answer of the most similar question of the same scope, if similar enough.
+
+        Parameters
+        ----------
+        question : str
+            Question to answer.
+        repo_urls : list[str] | None, optional
+            Searched repositories, by default None (all of them).
+
+        Returns
+        -------
+        dict | None
+            The cached 'question', its 'answer' and 'sources', the 'similarity' of the questions and the
+            'age' of the entry in seconds, or None on a miss.
+        """
+        scope = AnswerCache.scope(repo_urls)
+        version = StoreVersions.current()
+        with self._lock:
+            entry_ids, _ = self._matrix(scope, version)
+            if not entry_ids:
+                self.misses += 1
+                return None
+
+        vector = self._embed(question)
+
+        with self._lock:
+            entry_ids, matrix = self._matrix(scope, version)
+            if matrix is not None:
+                similarities = matrix @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry_id = entry_ids[best]
+                    _, _, cached_question, _, answer, sources, created = self._entries[entry_id]
+                    age = time.time() - created
+                    if self.ttl and age > self.ttl:
+                        self.expirations += 1
+                        self._drop([entry_id])
+                    else:
+                        self._entries.move_to_end(entry_id)
+                        self.hits += 1
+                        self.hit_age += age
+                        return {
+                            'question': cached_question,
+                            'answer': answer,
+                            'sources': sources,
+                            'similarity': float(similarities[best]),
+                            'age': age,
+                        }
+            self.misses += 1
+            return None
+
+    def add(self, question: str, answer: str, sources: list[str], repo_urls: list[str] | None = None) -> None:
+        """
+        Caches the answer of a question for the served vectorstore version.
+
+        Parameters
+        ----------
+        question : str
+            Answered question.
+        answer : str
+            Answer to cache.
+        sources : list[str]
+            Sources the answer is based on.
+        repo_urls : list[str] | None, optional
+            Searched repositories, by default None (all of them).
+        """
+        scope = AnswerCache.scope(repo_urls)
+        version = StoreVersions.current()
+        vector = self._embed(question)
+
+        with self._lock:
+            self._entries[self._next_id] = (scope, version, question, vector, answer, list(sources), time.time())
+            self._next_id += 1
+            self._matrices.pop(scope, None)
+            while len(self._entries) > self.max_entries:
+                self._drop([next(iter(self._entries))])
+                self.evictions += 1
+
+    def invalidate(self, repo_url: str | None = None) -> None:
+        """
+        Drops the cached answers of a repository, including those of searches of all repositories.
+
+        Parameters
+        ----------
+        repo_url : str | None, optional
+            Repository whose answers to drop, by default None (all answers).
+        """
+        with self._lock:
+            entry_ids = [
+                entry_id
+                for entry_id, entry in self._entries.items()
+                if repo_url is None or entry[0] is None or repo_url in entry[0]
+            ]
+            self.invalidations += len(entry_ids)
+            self._drop(entry_ids)
+
+    def stats(self) -> dict[str, float]:
+        """
+        Returns cache statistics.
+
+        Returns
+        -------
+        dict[str, float]
+            Number of hits and misses, hit rate, mean age of the answers of hits in seconds, number of
+            entries invalidated by version changes or rebuilds, expirations, evictions and number of entries.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'mean_hit_age': self.hit_age / self.hits if self.hits else 0.0,
+                'invalidations': self.invalidations,
+                'expirations': self.expirations,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+            }
+
+
+answer_cache = AnswerCache(
+    get_embeddings(EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS),
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_MAX_ENTRIES,
+    ttl=ANSWER_CACHE_TTL,
+)
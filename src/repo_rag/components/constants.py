@@ -5,7 +5,68 @@ from dotenv import load_dotenv
 load_dotenv()
 
 VECTORSTORE_PATH = 'vectorstores/vectorstore'
+# Pins the store used by the build, the app and the evaluation scripts, by default the version published in
+# VECTORSTORE_POINTER_PATH (or 1 before any version was published).
+VECTORSTORE_VERSION = int(os.getenv('VECTORSTORE_VERSION') or 0) or None
+VECTORSTORE_POINTER_PATH = 'vectorstores/current.json'
+INDEX_FACTORY = os.getenv('INDEX_FACTORY', 'Flat')
+# 'openai' for the OpenAI API, or 'local' for a sentence-transformers model run on the CPU.
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND') or 'openai'
+DEFAULT_EMBEDDING_MODELS = {'openai': 'text-embedding-ada-002', 'local': 'BAAI/bge-small-en-v1.5'}
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL') or DEFAULT_EMBEDDING_MODELS.get(EMBEDDING_BACKEND)
+# Models of the text-embedding-3 family (and Matryoshka models run locally) can natively return shortened
+# embeddings of this many dimensions.
+EMBEDDING_DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS') or 0) or None
+MODEL_DIMENSIONS = {
+    'text-embedding-ada-002': 1536,
+    'text-embedding-3-small': 1536,
+    'text-embedding-3-large': 3072,
+    'sentence-transformers/all-MiniLM-L6-v2': 384,
+    'BAAI/bge-small-en-v1.5': 384,
+    'BAAI/bge-base-en-v1.5': 768,
+}
+
+# Local embeddings: 'torch' or 'onnx' runtime, dynamic int8 quantization and number of CPU threads (0 for default).
+LOCAL_EMBEDDING_RUNTIME = os.getenv('LOCAL_EMBEDDING_RUNTIME') or 'torch'
+LOCAL_EMBEDDING_QUANTIZE = os.getenv('LOCAL_EMBEDDING_QUANTIZE', '0') == '1'
+LOCAL_EMBEDDING_THREADS = int(os.getenv('LOCAL_EMBEDDING_THREADS') or 0)
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv('LOCAL_EMBEDDING_BATCH_SIZE', 64))
+LOCAL_EMBEDDING_BATCH_TOKENS = int(os.getenv('LOCAL_EMBEDDING_BATCH_TOKENS', 16384))
+LOCAL_EMBEDDING_MODELS_PATH = 'cache/models'
+SEARCH_PARAMS = {'nprobe': 32, 'efSearch': 128}
+RESCORE_FACTOR = 4
+# Number of chunks searched per requested file by file-grouped searches, before widening.
+FILE_SEARCH_FACTOR = 2
+# BM25 term-frequency saturation and length normalization, and the rank offset of reciprocal-rank fusion.
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+SHARD_SEARCH_WORKERS = int(os.getenv('SHARD_SEARCH_WORKERS', 8))
+VECTORSTORE_POOL_MAX_BYTES = int(os.getenv('VECTORSTORE_POOL_MAX_BYTES', 4 * 1024 * 1024 * 1024))
 
 OPEN_AI_API_KEY = os.getenv('OPEN_AI_API_KEY', '')
+OPEN_AI_BASE_URL = os.getenv('OPEN_AI_BASE_URL') or None
+
+EMBEDDING_TPM = int(os.getenv('EMBEDDING_TPM', 1_000_000))
+EMBEDDING_RPM = int(os.getenv('EMBEDDING_RPM', 3_000))
 
 EVAL_DATA_PATH = 'data/escrcpy-commits-generated.json'
+
+HTTP_CACHE_PATH = 'cache/http'
+HTTP_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+EMBEDDING_CACHE_PATH = 'cache/embeddings'
+EMBEDDING_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Query embeddings kept in memory, their time to live in seconds (0 for none), and whether they
+# are also cached on disk next to the document embeddings.
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv('QUERY_CACHE_MAX_ENTRIES') or 10_000)
+QUERY_CACHE_TTL = float(os.getenv('QUERY_CACHE_TTL') or 0) or None
+QUERY_CACHE_DISK = os.getenv('QUERY_CACHE_DISK', '0') == '1'
+QUERY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Answers kept in memory, the cosine similarity above which a question is answered from the cache,
+# and their time to live in seconds (0 for none).
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv('ANSWER_CACHE_MAX_ENTRIES') or 1_000)
+ANSWER_CACHE_THRESHOLD = float(os.getenv('ANSWER_CACHE_THRESHOLD') or 0.95)
+ANSWER_CACHE_TTL = float(os.getenv('ANSWER_CACHE_TTL') or 0) or None
@@ -0,0 +1,224 @@
+import json
+import logging
+import mmap
+import os
+from pathlib import Path
+
+import numpy as np
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CompactDocstore(Docstore, AddableMixin):
+    """
+    A docstore keeping chunk texts in one contiguous blob and metadata in interned columns.
+
+    The snapshot consists of `docstore.texts` (UTF-8 texts back to back), `docstore.offsets.npy`
+    (start of every text in the blob, plus its end), `docstore.codes.npy` (one row per chunk with
+    the position of each metadata value in its column's value table, or -1 if missing) and
+    `docstore.json` (chunk ids and the value tables). Metadata such as `repo_url`, `file_name`
+    and `full_url` repeats across the chunks of a file, so each distinct value is stored once.
+
+    Loading maps the blob and arrays into memory instead of reading them, and `Document` objects
+    are only built for the ids that are searched. Documents added or deleted after loading are
+    kept in memory until the next snapshot is written with `write`.
+    """
+
+    FILE_NAME = 'docstore.json'
+    TEXTS_NAME = 'docstore.texts'
+    OFFSETS_NAME = 'docstore.offsets.npy'
+    CODES_NAME = 'docstore.codes.npy'
+    FILE_NAMES = (TEXTS_NAME, OFFSETS_NAME, CODES_NAME, FILE_NAME)
+
+    def __init__(
+        self,
+        ids: list[str] | None = None,
+        texts: bytes | mmap.mmap = b'',
+        offsets: np.ndarray | None = None,
+        columns: list[str] | None = None,
+        values: list[list] | None = None,
+        codes: np.ndarray | None = None,
+    ):
+        self.ids = ids or []
+        self.texts = texts
+        self.offsets = offsets if offsets is not None else np.zeros(1, dtype=np.int64)
+        self.columns = columns or []
+        self.values = values or []
+        self.codes = codes if codes is not None else np.zeros((0, 0), dtype=np.int32)
+
+        self._rows: dict[str, int] | None = None
+        self._added: dict[str, Document] = {}
+        self._deleted: set[str] = set()
+
+    @classmethod
+    def exists(cls, vectorstore_path: str | Path) -> bool:
+        """Checks whether a vectorstore has a compact docstore snapshot."""
+        return (Path(vectorstore_path) / cls.FILE_NAME).exists()
+
+    @classmethod
+    def load(cls, vectorstore_path: str | Path) -> 'CompactDocstore':
+        """
+        Maps the docstore snapshot of a vectorstore.
+
+        Parameters
+        ----------
+        vectorstore_path : str | Path
+            Directory of the vectorstore.
+
+        Returns
+        -------
+        CompactDocstore
+            Docstore reading texts and metadata from the mapped snapshot.
+        """
+        path = Path(vectorstore_path)
+        with (path / cls.FILE_NAME).open('r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        texts = b''
+        with (path / cls.TEXTS_NAME).open('rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return cls(
+            ids=data['ids'],
+            texts=texts,
+            offsets=np.load(path / cls.OFFSETS_NAME, mmap_mode='r'),
+            columns=data['columns'],
+            values=data['values'],
+            codes=np.load(path / cls.CODES_NAME, mmap_mode='r'),
+        )
+
+    @classmethod
+    def write(cls, docstore: Docstore, ids: list[str], vectorstore_path: str | Path, prefix: str = '') -> None:
+        """
+        Writes a snapshot of the given documents of any docstore.
+
+        Parameters
+        ----------
+        docstore : Docstore
+            Docstore holding the documents.
+        ids : list[str]
+            Ids of the documents in index order.
+        vectorstore_path : str | Path
+            Directory of the vectorstore.
+        prefix : str, optional
+            Prefix of the written file names, by default ''.
+        """
+        path = Path(vectorstore_path)
+        columns: dict[str, dict[str, int]] = {}
+        values: dict[str, list] = {}
+        rows = []
+        offsets = [0]
+
+        with (path / f'{prefix}{cls.TEXTS_NAME}').open('wb') as f:
+            for doc_id in ids:
+                doc = docstore.search(doc_id)
+                if not isinstance(doc, Document):
+                    raise ValueError(f'Could not find document {doc_id} in the docstore')
+
+                text = doc.page_content.encode('utf-8', errors='surrogatepass')
+                f.write(text)
+                offsets.append(offsets[-1] + len(text))
+
+                row = {}
+                for name, value in doc.metadata.items():
+                    table = columns.setdefault(name, {})
+                    key = json.dumps(value, sort_keys=True)
+                    if key not in table:
+                        table[key] = len(table)
+                        values.setdefault(name, []).append(value)
+                    row[name] = table[key]
+                rows.append(row)
+
+        codes = np.full((len(ids), len(columns)), -1, dtype=np.int32)
+        for i, row in enumerate(rows):
+            for j, name in enumerate(columns):
+                codes[i, j] = row.get(name, -1)
+
+        np.save(path / f'{prefix}{cls.OFFSETS_NAME}', np.asarray(offsets, dtype=np.int64))
+        np.save(path / f'{prefix}{cls.CODES_NAME}', codes)
+        with (path / f'{prefix}{cls.FILE_NAME}').open('w', encoding='utf-8') as f:
+            json.dump({'ids': list(ids), 'columns': list(columns), 'values': list(values.values())}, f)
+
+    def _row(self, doc_id: str) -> int | None:
+        """Returns the snapshot row of an id, or None if it is not in the snapshot or was deleted."""
+        if self._rows is None:
+            self._rows = dict(zip(self.ids, range(len(self.ids))))
+        if doc_id in self._deleted:
+            return None
+        return self._rows.get(doc_id)
+
+    def _document(self, doc_id: str, row: int) -> Document:
+        """Builds the document stored in a snapshot row."""
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        text = self.texts[start:end].decode('utf-8', errors='surrogatepass')
+        metadata = {
+            name: self.values[j][code] for j, (name, code) in enumerate(zip(self.columns, self.codes[row])) if code >= 0
+        }
+        return Document(id=doc_id, page_content=text, metadata=metadata)
+
+    def search(self, search: str) -> str | Document:
+        """
+        Looks up a document by id.
+
+        Parameters
+        ----------
+        search : str
+            Id of the document.
+
+        Returns
+        -------
+        str | Document
+            The document, or a message if it was not found like `InMemoryDocstore` returns.
+        """
+        if search in self._added:
+            return self._added[search]
+
+        row = self._row(search)
+        if row is None:
+            return f'ID {search} not found.'
+        return self._document(search, row)
+
+    def add(self, texts: dict[str, Document]) -> None:
+        """
+        Adds documents in memory until the next snapshot.
+
+        Parameters
+        ----------
+        texts : dict[str, Document]
+            Documents by id.
+
+        Raises
+        ------
+        ValueError
+            if an id is already in the docstore
+        """
+        overlapping = [doc_id for doc_id in texts if doc_id in self._added or self._row(doc_id) is not None]
+        if overlapping:
+            raise ValueError(f'Tried to add ids that already exist: {overlapping}')
+        self._added.update(texts)
+
+    def delete(self, ids: list) -> None:
+        """
+        Deletes documents by id.
+
+        Parameters
+        ----------
+        ids : list
+            Ids of the documents.
+
+        Raises
+        ------
+        ValueError
+            if an id is not in the docstore
+        """
+        missing = [doc_id for doc_id in ids if doc_id not in self._added and self._row(doc_id) is None]
+        if missing:
+            raise ValueError(f'Tried to delete ids that does not exist: {missing}')
+
+        for doc_id in ids:
+            if self._added.pop(doc_id, None) is None:
+                self._deleted.add(doc_id)
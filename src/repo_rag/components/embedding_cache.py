@@ -0,0 +1,449 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    An on-disk cache of embeddings keyed by model name and SHA-256 of the embedded text.
+
+    Vectors are stored as float32 blobs in a sqlite database shared by all builds and
+    repositories, so unchanged chunks, forks and boilerplate repeated across repositories are
+    only embedded once. The cache is capped at `max_bytes` of vectors and evicts least recently
+    used entries above that size. With a `ttl`, entries older than `ttl` seconds are no longer
+    returned and are evicted in turn.
+    """
+
+    MAX_PARAMETERS = 500
+
+    def __init__(self, path: str, max_bytes: int, file_name: str = 'embeddings.sqlite', ttl: float | None = None):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.file_name = file_name
+        self.ttl = ttl
+
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self._total_bytes = 0
+
+    @staticmethod
+    def key(text: str) -> str:
+        """Returns the cache key of a text."""
+        return hashlib.sha256(text.encode('utf-8', errors='surrogatepass')).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Opens the cache database on first use. Must be called with the lock held."""
+        if self._connection is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path / self.file_name, check_same_thread=False)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS embeddings '
+                '(model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, size INTEGER NOT NULL, '
+                'last_access REAL NOT NULL, created REAL NOT NULL DEFAULT 0, PRIMARY KEY (model, hash))'
+            )
+            columns = [row[1] for row in self._connection.execute('PRAGMA table_info(embeddings)')]
+            if 'created' not in columns:
+                self._connection.execute('ALTER TABLE embeddings ADD COLUMN created REAL NOT NULL DEFAULT 0')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)')
+            self._total_bytes = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM embeddings').fetchone()[0]
+        return self._connection
+
+    def get(self, model: str, keys: list[str]) -> dict[str, list[float]]:
+        """
+        Looks up cached embeddings, marking the found ones as recently used.
+
+        Parameters
+        ----------
+        model : str
+            Name of the embedding model.
+        keys : list[str]
+            Cache keys of the texts.
+
+        Returns
+        -------
+        dict[str, list[float]]
+            Embeddings of the cached texts by key.
+        """
+        found = {}
+        created_after = time.time() - self.ttl if self.ttl else 0
+        with self._lock:
+            connection = self._connect()
+            for i in range(0, len(keys), EmbeddingCache.MAX_PARAMETERS):
+                batch = keys[i : i + EmbeddingCache.MAX_PARAMETERS]
+                placeholders = ', '.join('?' * len(batch))
+                rows = connection.execute(
+                    f'SELECT hash, vector FROM embeddings '
+                    f'WHERE model = ? AND hash IN ({placeholders}) AND created >= ?',
+                    (model, *batch, created_after),
+                ).fetchall()
+                found.update((key, np.frombuffer(vector, dtype=np.float32).tolist()) for key, vector in rows)
+
+            if found:
+                now = time.time()
+                connection.executemany(
+                    'UPDATE embeddings SET last_access = ? WHERE model = ? AND hash = ?',
+                    [(now, model, key) for key in found],
+                )
+                connection.commit()
+
+        return found
+
+    def put(self, model: str, embeddings: dict[str, list[float]]) -> None:
+        """
+        Stores embeddings, evicting least recently used entries above the size cap.
+
+        Parameters
+        ----------
+        model : str
+            Name of the embedding model.
+        embeddings : dict[str, list[float]]
+            Embeddings by cache key.
+        """
+        now = time.time()
+        rows = [
+            (model, key, vector.tobytes(), vector.nbytes, now, now)
+            for key, vector in ((key, np.asarray(vector, dtype=np.float32)) for key, vector in embeddings.items())
+        ]
+
+        with self._lock:
+            connection = self._connect()
+            for row in rows:
+                previous = connection.execute(
+                    'SELECT size FROM embeddings WHERE model = ? AND hash = ?', (row[0], row[1])
+                ).fetchone()
+                connection.execute(
+                    'INSERT OR REPLACE INTO embeddings (model, hash, vector, size, last_access, created) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    row,
+                )
+                self._total_bytes += row[3] - (previous[0] if previous else 0)
+
+            while self._total_bytes > self.max_bytes:
+                model_to_evict, key, size = connection.execute(
+                    'SELECT model, hash, size FROM embeddings ORDER BY last_access LIMIT 1'
+                ).fetchone()
+                connection.execute('DELETE FROM embeddings WHERE model = ? AND hash = ?', (model_to_evict, key))
+                self._total_bytes -= size
+                self.evictions += 1
+
+            connection.commit()
+
+    def size_bytes(self) -> int:
+        """Returns the size of the cached vectors in bytes."""
+        with self._lock:
+            self._connect()
+            return self._total_bytes
+
+
+class QueryEmbeddingCache:
+    """
+    A bounded in-memory cache of query embeddings with least-recently-used eviction, backed by an
+    optional on-disk `EmbeddingCache`.
+
+    Queries are keyed by embedding model and normalized text (Unicode NFKC, case-folded, with
+    whitespace collapsed), so repeated and trivially different questions skip the embedding
+    request. Entries expire `ttl` seconds after they were embedded. Concurrent requests for the
+    same missing query, from threads or from coroutines running `embed_query` in threads, wait
+    for a single embedding request. Batches of queries embed their missing queries in one call
+    with `get_or_embed_many`.
+    """
+
+    def __init__(self, max_entries: int, ttl: float | None = None, disk: EmbeddingCache | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk = disk
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._entries: OrderedDict[tuple[str, str], tuple[list[float], float]] = OrderedDict()
+        self._pending: dict[tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Returns the normalized text of a query used as its key."""
+        return ' '.join(unicodedata.normalize('NFKC', text).casefold().split())
+
+    def _get(self, key: tuple[str, str]) -> list[float] | None:
+        """Returns a fresh entry and marks it as most recently used. Call with the lock held."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        vector, created = entry
+        if self.ttl and time.time() - created > self.ttl:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return vector
+
+    def _put(self, key: tuple[str, str], vector: list[float]) -> None:
+        """Stores an entry, evicting the least recently used ones above `max_entries`. Call with the lock held."""
+        self._entries[key] = (vector, time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_embed(self, model: str, text: str, embed: Callable[[str], list[float]]) -> list[float]:
+        """
+        Returns the cached embedding of a query, embedding it on a miss.
+
+        Parameters
+        ----------
+        model : str
+            Name of the embedding model.
+        text : str
+            Query text.
+        embed : Callable[[str], list[float]]
+            Function embedding the query on a miss.
+
+        Returns
+        -------
+        list[float]
+            Embedding of the query.
+        """
+        key = (model, QueryEmbeddingCache.normalize(text))
+        with self._lock:
+            vector = self._get(key)
+            if vector is not None:
+                self.hits += 1
+                return vector
+
+            pending = self._pending.get(key)
+            if pending is None:
+                self._pending[key] = future = Future()
+            else:
+                self.hits += 1
+
+        if pending is not None:
+            return pending.result()
+
+        try:
+            disk_key = EmbeddingCache.key(key[1])
+            vector = self.disk.get(model, [disk_key]).get(disk_key) if self.disk is not None else None
+            on_disk = vector is not None
+            if not on_disk:
+                vector = embed(text)
+                if self.disk is not None:
+                    self.disk.put(model, {disk_key: vector})
+        except BaseException as e:
+            with self._lock:
+                del self._pending[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            if on_disk:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+            self._put(key, vector)
+            del self._pending[key]
+        future.set_result(vector)
+        return vector
+
+    def get_or_embed_many(
+        self, model: str, texts: list[str], embed_many: Callable[[list[str]], list[list[float]]]
+    ) -> list[list[float]]:
+        """
+        Returns the cached embeddings of queries, embedding the missing ones in a single call.
+
+        Parameters
+        ----------
+        model : str
+            Name of the embedding model.
+        texts : list[str]
+            Query texts.
+        embed_many : Callable[[list[str]], list[list[float]]]
+            Function embedding the missing queries, once per distinct normalized text.
+
+        Returns
+        -------
+        list[list[float]]
+            Embeddings in the order of the texts.
+        """
+        keys = [(model, QueryEmbeddingCache.normalize(text)) for text in texts]
+        vectors = {}
+        with self._lock:
+            for key in set(keys):
+                vector = self._get(key)
+                if vector is not None:
+                    vectors[key] = vector
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        on_disk = {}
+        if missing and self.disk is not None:
+            disk_keys = {EmbeddingCache.key(key[1]): key for key in missing}
+            on_disk = {
+                disk_keys[disk_key]: vector for disk_key, vector in self.disk.get(model, list(disk_keys)).items()
+            }
+
+        to_embed = {key: text for key, text in missing.items() if key not in on_disk}
+        embedded = dict(zip(to_embed, embed_many(list(to_embed.values())))) if to_embed else {}
+        if embedded and self.disk is not None:
+            self.disk.put(model, {EmbeddingCache.key(key[1]): vector for key, vector in embedded.items()})
+
+        vectors.update(on_disk)
+        vectors.update(embedded)
+        with self._lock:
+            self.hits += len(keys) - len(on_disk) - len(embedded)
+            self.disk_hits += len(on_disk)
+            self.misses += len(embedded)
+            for key in missing:
+                self._put(key, vectors[key])
+        return [vectors[key] for key in keys]
+
+    def stats(self) -> dict[str, float]:
+        """
+        Returns cache statistics.
+
+        Returns
+        -------
+        dict[str, float]
+            Number of memory hits, disk hits and misses, hit rate (of both tiers), evictions,
+            expirations and number of entries in memory.
+        """
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / total if total else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'entries': len(self._entries),
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper answering `embed_documents` from an `EmbeddingCache` where possible.
+
+    Only texts missing from the cache are sent to the wrapped embeddings, once per distinct
+    text, and their vectors are added to the cache. Queries are answered from a
+    `QueryEmbeddingCache` if one is given, and passed through unchanged otherwise.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache: EmbeddingCache,
+        model: str | None = None,
+        query_cache: QueryEmbeddingCache | None = None,
+    ):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model or getattr(embeddings, 'model', None) or type(embeddings).__name__
+        self.query_cache = query_cache
+
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+        self._lock = threading.Lock()
+
+    def _count_tokens(self, text: str) -> int:
+        """Counts tokens with the wrapped embeddings' tokenizer, if it has one."""
+        count_tokens = getattr(self.embeddings, 'count_tokens', None)
+        return count_tokens(text) if count_tokens else len(text) // 4 + 1
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeds texts, reusing cached embeddings of identical texts.
+
+        Parameters
+        ----------
+        texts : list[str]
+            Texts to embed.
+
+        Returns
+        -------
+        list[list[float]]
+            Embeddings in the order of the texts.
+        """
+        keys = [EmbeddingCache.key(text) for text in texts]
+        embeddings = self.cache.get(self.model, list(set(keys)))
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in embeddings}
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            new = dict(zip(missing, vectors))
+            self.cache.put(self.model, new)
+            embeddings.update(new)
+
+        hits = [text for key, text in zip(keys, texts) if key not in missing]
+        with self._lock:
+            self.hits += len(hits)
+            self.misses += len(texts) - len(hits)
+            self.tokens_saved += sum(self._count_tokens(text) for text in hits)
+
+        return [embeddings[key] for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        """Embeds a query with the wrapped embeddings, reusing the embeddings of repeated queries."""
+        if self.query_cache is None:
+            return self.embeddings.embed_query(text)
+        return self.query_cache.get_or_embed(self.model, text, self.embeddings.embed_query)
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeds queries, reusing the embeddings of repeated queries and sending the others to the wrapped
+        embeddings in one `embed_documents` call, which embeds queries and documents alike. A single query
+        is embedded with `embed_query`.
+
+        Parameters
+        ----------
+        texts : list[str]
+            Query texts.
+
+        Returns
+        -------
+        list[list[float]]
+            Embeddings in the order of the texts.
+        """
+        if len(texts) == 1:
+            return [self.embed_query(texts[0])]
+        if self.query_cache is None:
+            return self.embeddings.embed_documents(texts)
+        return self.query_cache.get_or_embed_many(self.model, texts, self.embeddings.embed_documents)
+
+    def stats(self) -> dict[str, float]:
+        """
+        Returns cache statistics.
+
+        Returns
+        -------
+        dict[str, float]
+            Number of hits and misses, hit rate, tokens saved, evictions and size of cached vectors in bytes.
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'tokens_saved': self.tokens_saved,
+            'evictions': self.cache.evictions,
+            'size_bytes': self.cache.size_bytes(),
+        }
@@ -1,5 +1,128 @@
+from functools import lru_cache
+
 from langchain_openai import OpenAIEmbeddings
 
-from repo_rag.components.constants import OPEN_AI_API_KEY
+from repo_rag.components.constants import (
+    EMBEDDING_CACHE_MAX_BYTES,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_RPM,
+    EMBEDDING_TPM,
+    LOCAL_EMBEDDING_BATCH_SIZE,
+    LOCAL_EMBEDDING_BATCH_TOKENS,
+    LOCAL_EMBEDDING_MODELS_PATH,
+    LOCAL_EMBEDDING_QUANTIZE,
+    LOCAL_EMBEDDING_RUNTIME,
+    LOCAL_EMBEDDING_THREADS,
+    MODEL_DIMENSIONS,
+    OPEN_AI_API_KEY,
+    OPEN_AI_BASE_URL,
+    QUERY_CACHE_DISK,
+    QUERY_CACHE_MAX_BYTES,
+    QUERY_CACHE_MAX_ENTRIES,
+    QUERY_CACHE_TTL,
+)
+from repo_rag.components.embedding_cache import CachedEmbeddings, EmbeddingCache, QueryEmbeddingCache
+from repo_rag.components.local_embeddings import LocalEmbeddings
+from repo_rag.components.rate_limiter import RateLimitedEmbeddings, RateLimiter
+
+EMBEDDING_BACKENDS = ('openai', 'local')
+
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_BYTES)
+query_cache = QueryEmbeddingCache(
+    QUERY_CACHE_MAX_ENTRIES,
+    ttl=QUERY_CACHE_TTL,
+    disk=EmbeddingCache(EMBEDDING_CACHE_PATH, QUERY_CACHE_MAX_BYTES, file_name='queries.sqlite', ttl=QUERY_CACHE_TTL)
+    if QUERY_CACHE_DISK
+    else None,
+)
+
+
+@lru_cache(maxsize=None)
+def get_embeddings(backend: str, model: str, dimensions: int | None = None) -> CachedEmbeddings:
+    """
+    Returns the process-wide embeddings of a model, cached on disk, with queries cached in `query_cache`.
+
+    OpenAI embeddings are throttled to the `EMBEDDING_TPM`/`EMBEDDING_RPM` budgets, local embeddings
+    run with the `LOCAL_EMBEDDING_*` settings.
+
+    Parameters
+    ----------
+    backend : str
+        'openai' or 'local'.
+    model : str
+        Name of the OpenAI model, or sentence-transformers model name or path.
+    dimensions : int | None, optional
+        Number of dimensions of shortened embeddings, by default None (the model's dimension).
+
+    Returns
+    -------
+    CachedEmbeddings
+        Embeddings of the model.
+
+    Raises
+    ------
+    ValueError
+        if the backend is unknown
+    """
+    if backend == 'openai':
+        # Retries are handled by `RateLimitedEmbeddings`, so that rate-limit responses also slow down other requests.
+        embeddings = RateLimitedEmbeddings(
+            OpenAIEmbeddings(
+                model=model, dimensions=dimensions, api_key=OPEN_AI_API_KEY, base_url=OPEN_AI_BASE_URL, max_retries=0
+            ),
+            RateLimiter(tpm=EMBEDDING_TPM, rpm=EMBEDDING_RPM),
+        )
+        cache_model = model
+    elif backend == 'local':
+        embeddings = LocalEmbeddings(
+            model,
+            dimensions=dimensions,
+            runtime=LOCAL_EMBEDDING_RUNTIME,
+            quantize=LOCAL_EMBEDDING_QUANTIZE,
+            threads=LOCAL_EMBEDDING_THREADS,
+            batch_size=LOCAL_EMBEDDING_BATCH_SIZE,
+            batch_tokens=LOCAL_EMBEDDING_BATCH_TOKENS,
+            models_path=LOCAL_EMBEDDING_MODELS_PATH,
+        )
+        cache_model = f'local:{model}' + ('/int8' if LOCAL_EMBEDDING_QUANTIZE else '')
+    else:
+        raise ValueError(f'Unknown embedding backend {backend}, use one of {EMBEDDING_BACKENDS}.')
+
+    return CachedEmbeddings(
+        embeddings,
+        embedding_cache,
+        model=f'{cache_model}/{dimensions}' if dimensions else cache_model,
+        query_cache=query_cache,
+    )
+
+
+def embedding_dimension(backend: str, model: str, dimensions: int | None = None) -> int:
+    """
+    Returns the dimension of the embeddings of a model, loading local models that are not in `MODEL_DIMENSIONS`.
+
+    Parameters
+    ----------
+    backend : str
+        'openai' or 'local'.
+    model : str
+        Name of the OpenAI model, or sentence-transformers model name or path.
+    dimensions : int | None, optional
+        Number of dimensions of shortened embeddings, by default None (the model's dimension).
+
+    Returns
+    -------
+    int
+        Dimension of the embeddings.
 
-openai_embeddings = OpenAIEmbeddings(api_key=OPEN_AI_API_KEY)
+    Raises
+    ------
+    ValueError
+        if the dimension of an OpenAI model is unknown and not given
+    """
+    if dimensions:
+        return dimensions
+    if model in MODEL_DIMENSIONS:
+        return MODEL_DIMENSIONS[model]
+    if backend == 'local':
+        return get_embeddings(backend, model).embeddings.dimension
+    raise ValueError(f'Unknown dimension of the embeddings of {model}, set EMBEDDING_DIMENSIONS.')
@@ -0,0 +1,113 @@
+import json
+import logging
+from pathlib import Path
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class FileMap:
+    """
+    Maps the chunks of a vectorstore to the files they were split from, in index order.
+
+    Files are identified by their `repo_url` and `file_name` metadata and numbered, so search
+    results can be grouped by file with array operations on the file ids of their positions,
+    without building their documents (see `RescoredFAISS.file_search_by_vector`).
+
+    The snapshot is `files.npy`, the int32 file id of every index position, which is mapped on
+    load, and `files.json`, the repository URL and path of every file id. Chunks added since the
+    snapshot are kept in memory, and removals shift positions down like the index does, like
+    `ExactVectors`.
+    """
+
+    FILE_NAME = 'files.json'
+    IDS_NAME = 'files.npy'
+    FILE_NAMES = (IDS_NAME, FILE_NAME)
+
+    def __init__(self, files: list[list[str]] | None = None, file_ids: np.ndarray | None = None):
+        self.files = [tuple(file) for file in files or []]
+        self.file_ids = file_ids if file_ids is not None else np.zeros(0, dtype=np.int32)
+
+        self._keys: dict[tuple[str, str], int] | None = None
+        self._added: list[int] = []
+
+    @staticmethod
+    def key(metadata: dict) -> tuple[str, str]:
+        """Returns the repository URL and path of the file of a chunk."""
+        return metadata.get('repo_url', ''), metadata.get('file_name', '')
+
+    @classmethod
+    def exists(cls, vectorstore_path: str | Path) -> bool:
+        """Checks whether a vectorstore has a file map snapshot."""
+        return (Path(vectorstore_path) / cls.FILE_NAME).exists()
+
+    @classmethod
+    def load(cls, vectorstore_path: str | Path) -> 'FileMap':
+        """Maps the file map snapshot of a vectorstore."""
+        path = Path(vectorstore_path)
+        with (path / cls.FILE_NAME).open('r', encoding='utf-8') as f:
+            files = json.load(f)['files']
+        return cls(files, np.load(path / cls.IDS_NAME, mmap_mode='r'))
+
+    @classmethod
+    def build(cls, metadatas: list[dict]) -> 'FileMap':
+        """Builds the file map of chunks from their metadata in index order."""
+        file_map = cls()
+        file_map.add(metadatas)
+        return file_map
+
+    def __len__(self) -> int:
+        return len(self.file_ids) + len(self._added)
+
+    def _file_id(self, key: tuple[str, str]) -> int:
+        """Returns the id of a file, numbering files not seen before."""
+        if self._keys is None:
+            self._keys = {file: file_id for file_id, file in enumerate(self.files)}
+        if key not in self._keys:
+            self._keys[key] = len(self.files)
+            self.files.append(key)
+        return self._keys[key]
+
+    def _flush(self) -> None:
+        """Appends the ids of added chunks to the array."""
+        if self._added:
+            self.file_ids = np.concatenate([self.file_ids, np.asarray(self._added, dtype=np.int32)])
+            self._added = []
+
+    def add(self, metadatas: list[dict]) -> None:
+        """Appends the files of chunks, in the order they are added to the index."""
+        self._added.extend(self._file_id(FileMap.key(metadata)) for metadata in metadatas)
+
+    def remove(self, positions: list[int]) -> None:
+        """Removes the chunks at the given positions, shifting the following ones down."""
+        self._flush()
+        self.file_ids = np.delete(self.file_ids, np.asarray(positions, dtype=np.int64))
+
+    def get(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Returns the file ids of the chunks at the given positions.
+
+        Parameters
+        ----------
+        positions : np.ndarray
+            Positions in the index.
+
+        Returns
+        -------
+        np.ndarray
+            int32 file ids, see `files` for the file of an id.
+        """
+        self._flush()
+        return np.asarray(self.file_ids[np.asarray(positions, dtype=np.int64)])
+
+    def write(self, vectorstore_path: str | Path, prefix: str = '') -> None:
+        """Writes a snapshot, prefixing the file names. Files without chunks left are dropped and the ids renumbered."""
+        self._flush()
+        used, file_ids = np.unique(np.asarray(self.file_ids), return_inverse=True)
+
+        path = Path(vectorstore_path)
+        np.save(path / f'{prefix}{FileMap.IDS_NAME}', file_ids.astype(np.int32))
+        with (path / f'{prefix}{FileMap.FILE_NAME}').open('w', encoding='utf-8') as f:
+            json.dump({'files': [self.files[file_id] for file_id in used]}, f)
@@ -0,0 +1,268 @@
+import math
+import os
+import re
+from collections import Counter
+
+
+def glob_to_regex(pattern: str) -> re.Pattern:
+    """
+    Translates a gitignore-style glob into a regex matching file paths.
+
+    Patterns without a slash match at any depth, patterns with a leading or inner slash are
+    anchored, a trailing slash matches directories only and `**` matches across directories.
+    A pattern matching a directory also matches every file below it.
+
+    Parameters
+    ----------
+    pattern : str
+        Glob pattern, e.g. `node_modules/`, `*.min.js` or `/docs/**/*.md`.
+
+    Returns
+    -------
+    re.Pattern
+        Compiled regex to match against paths relative to the pattern's directory.
+    """
+    dir_only = pattern.endswith('/')
+    anchored = '/' in pattern.rstrip('/')
+    pattern = pattern.strip('/')
+
+    regex, i = '', 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('**', i):
+            regex += '.*'
+            i += 2
+        elif pattern[i] == '*':
+            regex += '[^/]*'
+            i += 1
+        elif pattern[i] == '?':
+            regex += '[^/]'
+            i += 1
+        elif pattern[i] == '[' and ']' in pattern[i + 1 :]:
+            end = pattern.index(']', i + 1)
+            regex += '[' + pattern[i + 1 : end].replace('!', '^', 1).replace('\\', '\\\\') + ']'
+            i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+
+    prefix = '' if anchored else '(?:.*/)?'
+    suffix = '/.*' if dir_only else '(?:/.*)?'
+    return re.compile(prefix + regex + suffix + '$')
+
+
+class FileFilter:
+    """
+    A content-aware filter deciding which repository files are worth indexing.
+
+    On top of `Loader.IGNORED_EXTENSIONS` it skips:
+    - files matched by `.gitignore` rules or marked `linguist-generated`, `linguist-vendored`
+      or `binary` in `.gitattributes`,
+    - files matched by the exclude globs (lockfiles, vendored trees and minified bundles by
+      default) or not matched by the include globs, if any are given,
+    - files above the size cap (a lower one applies to data files such as JSON fixtures),
+    - binary content and minified or very long-line files.
+
+    Skipped files are counted per reason together with their size and an estimate of the
+    number of chunks they would have produced.
+    """
+
+    RULES_FILES = ('.gitignore', '.gitattributes')
+    SKIPPED_ATTRIBUTES = ('linguist-generated', 'linguist-vendored', 'binary')
+
+    DEFAULT_EXCLUDE = (
+        'node_modules/',
+        'bower_components/',
+        'vendor/',
+        'third_party/',
+        'dist/',
+        '*.min.js',
+        '*.min.css',
+        '*.map',
+        '*.lock',
+        'package-lock.json',
+        'pnpm-lock.yaml',
+        'npm-shrinkwrap.json',
+        'go.sum',
+    )
+    DATA_EXTENSIONS = {'.json', '.csv', '.tsv', '.xml', '.ndjson', '.jsonl', '.geojson'}
+
+    def __init__(
+        self,
+        include: list[str] | None = None,
+        exclude: list[str] | None = None,
+        max_file_bytes: int = 500_000,
+        max_data_file_bytes: int = 100_000,
+        max_line_length: int = 500,
+        max_long_line_share: float = 0.5,
+        chunk_size: int = 1024,
+    ):
+        self.include = [glob_to_regex(pattern) for pattern in include or []]
+        self.exclude = [glob_to_regex(pattern) for pattern in (*FileFilter.DEFAULT_EXCLUDE, *(exclude or []))]
+        self.max_file_bytes = max_file_bytes
+        self.max_data_file_bytes = max_data_file_bytes
+        self.max_line_length = max_line_length
+        self.max_long_line_share = max_long_line_share
+        self.chunk_size = chunk_size
+
+        self._ignore_rules: list[tuple[int, str, re.Pattern, bool]] = []
+        self._attribute_rules: list[tuple[int, str, re.Pattern, dict[str, bool]]] = []
+
+        self.skipped = Counter()
+        self.skipped_bytes = 0
+        self.skipped_chunks = 0
+
+    @staticmethod
+    def is_rules_file(file_name: str) -> bool:
+        """Checks whether the file is a `.gitignore` or `.gitattributes` file."""
+        return os.path.basename(file_name) in FileFilter.RULES_FILES
+
+    def add_rules(self, file_name: str, content: str) -> None:
+        """
+        Adds rules from a `.gitignore` or `.gitattributes` file, scoped to its directory.
+
+        Parameters
+        ----------
+        file_name : str
+            Path of the rules file relative to the repository root.
+        content : str
+            Content of the rules file.
+        """
+        directory = os.path.dirname(file_name)
+        depth = directory.count('/') + 1 if directory else 0
+
+        for line in content.splitlines():
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            if file_name.endswith('.gitignore'):
+                negate = line.startswith('!')
+                self._ignore_rules.append((depth, directory, glob_to_regex(line.lstrip('!')), negate))
+            else:
+                pattern, *attributes = line.split()
+                values = {}
+                for attribute in attributes:
+                    name, _, value = attribute.lstrip('-!').partition('=')
+                    values[name] = not attribute.startswith(('-', '!')) and value.lower() not in ('false', '0')
+                self._attribute_rules.append((depth, directory, glob_to_regex(pattern), values))
+
+        self._ignore_rules.sort(key=lambda rule: rule[0])
+        self._attribute_rules.sort(key=lambda rule: rule[0])
+
+    @staticmethod
+    def _relative(file_name: str, directory: str) -> str | None:
+        """Returns the path relative to the rules directory, or None if the file is outside it."""
+        if not directory:
+            return file_name
+        if file_name.startswith(directory + '/'):
+            return file_name[len(directory) + 1 :]
+        return None
+
+    def _skip(self, reason: str, size: int) -> str:
+        """Records a skipped file and returns the reason."""
+        self.skipped[reason] += 1
+        self.skipped_bytes += size
+        self.skipped_chunks += math.ceil(size / self.chunk_size)
+        return reason
+
+    def check_path(self, file_name: str, size: int | None = None) -> str | None:
+        """
+        Checks a file by its path and size, before its content is fetched.
+
+        Parameters
+        ----------
+        file_name : str
+            Path of the file relative to the repository root.
+        size : int | None, optional
+            Size of the file in bytes, if known, by default None.
+
+        Returns
+        -------
+        str | None
+            Reason for skipping the file, or None if it should be indexed.
+        """
+        size = size or 0
+
+        if self.include and not any(regex.match(file_name) for regex in self.include):
+            return self._skip('not included', size)
+
+        if any(regex.match(file_name) for regex in self.exclude):
+            return self._skip('excluded', size)
+
+        ignored = False
+        for _, directory, regex, negate in self._ignore_rules:
+            relative = self._relative(file_name, directory)
+            if relative is not None and regex.match(relative):
+                ignored = not negate
+        if ignored:
+            return self._skip('gitignore', size)
+
+        attributes = {}
+        for _, directory, regex, values in self._attribute_rules:
+            relative = self._relative(file_name, directory)
+            if relative is not None and regex.match(relative):
+                attributes.update(values)
+        for attribute in FileFilter.SKIPPED_ATTRIBUTES:
+            if attributes.get(attribute):
+                return self._skip(attribute, size)
+
+        if os.path.splitext(file_name)[1].lower() in FileFilter.DATA_EXTENSIONS and size > self.max_data_file_bytes:
+            return self._skip('data file too large', size)
+
+        if size > self.max_file_bytes:
+            return self._skip('too large', size)
+
+        return None
+
+    def check_content(self, file_name: str, content: str | bytes) -> str | None:
+        """
+        Checks a file by its content.
+
+        Parameters
+        ----------
+        file_name : str
+            Path of the file relative to the repository root.
+        content : str | bytes
+            Raw or decoded file content.
+
+        Returns
+        -------
+        str | None
+            Reason for skipping the file, or None if it should be indexed.
+        """
+        size = len(content.encode('utf-8', errors='replace')) if isinstance(content, str) else len(content)
+
+        if size > self.max_file_bytes or (
+            os.path.splitext(file_name)[1].lower() in FileFilter.DATA_EXTENSIONS and size > self.max_data_file_bytes
+        ):
+            return self._skip('too large', size)
+
+        head = content[:8000]
+        if ('\0' if isinstance(content, str) else b'\0') in head:
+            return self._skip('binary', size)
+
+        lines = content.splitlines()
+        long_lines_length = sum(len(line) for line in lines if len(line) > self.max_line_length)
+        if lines and long_lines_length > self.max_long_line_share * len(content):
+            return self._skip('minified or long lines', size)
+
+        return None
+
+    def stats(self) -> dict[str, int | dict[str, int]]:
+        """
+        Returns statistics of the skipped files.
+
+        Returns
+        -------
+        dict[str, int | dict[str, int]]
+            Number of skipped files per reason, skipped bytes and an estimate of skipped chunks.
+        """
+        return {
+            'skipped_files': sum(self.skipped.values()),
+            'skipped_bytes': self.skipped_bytes,
+            'skipped_chunks': self.skipped_chunks,
+            'reasons': dict(self.skipped),
+        }
@@ -0,0 +1,142 @@
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class HttpCache:
+    """
+    An on-disk cache of HTTP responses revalidated with ETag/If-None-Match.
+
+    Responses are stored in a sqlite database keyed by URL. Cached entries are revalidated
+    with a conditional request, so an unchanged resource costs a `304 Not Modified` without
+    a body (which GitHub does not count against the API rate limit). The cache is capped at
+    `max_bytes` of response bodies and evicts least recently used entries above that size.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self._total_bytes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Opens the cache database on first use. Must be called with the lock held."""
+        if self._connection is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path / 'responses.sqlite', check_same_thread=False)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS responses '
+                '(url TEXT PRIMARY KEY, etag TEXT NOT NULL, body BLOB NOT NULL, size INTEGER NOT NULL, '
+                'last_access REAL NOT NULL)'
+            )
+            self._connection.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+            self._total_bytes = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        return self._connection
+
+    def _lookup(self, url: str) -> tuple[str, bytes] | None:
+        with self._lock:
+            return self._connect().execute('SELECT etag, body FROM responses WHERE url = ?', (url,)).fetchone()
+
+    def _touch(self, url: str) -> None:
+        with self._lock:
+            connection = self._connect()
+            connection.execute('UPDATE responses SET last_access = ? WHERE url = ?', (time.time(), url))
+            connection.commit()
+
+    def _store(self, url: str, etag: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+
+        with self._lock:
+            connection = self._connect()
+            previous = connection.execute('SELECT size FROM responses WHERE url = ?', (url,)).fetchone()
+            connection.execute(
+                'INSERT OR REPLACE INTO responses (url, etag, body, size, last_access) VALUES (?, ?, ?, ?, ?)',
+                (url, etag, body, len(body), time.time()),
+            )
+            self._total_bytes += len(body) - (previous[0] if previous else 0)
+
+            while self._total_bytes > self.max_bytes:
+                url_to_evict, size = connection.execute(
+                    'SELECT url, size FROM responses ORDER BY last_access LIMIT 1'
+                ).fetchone()
+                connection.execute('DELETE FROM responses WHERE url = ?', (url_to_evict,))
+                self._total_bytes -= size
+                self.evictions += 1
+
+            connection.commit()
+
+    def get(self, session: requests.Session, url: str, headers: dict[str, str] | None = None) -> requests.Response:
+        """
+        Issues a GET request, answering it from the cache when the server confirms the entry is fresh.
+
+        Parameters
+        ----------
+        session : requests.Session
+            Session used to send the (conditional) request.
+        url : str
+            URL to fetch.
+        headers : dict[str, str] | None, optional
+            Extra request headers, by default None.
+
+        Returns
+        -------
+        requests.Response
+            The server response; revalidated cache hits are returned as `200` responses with the cached body.
+        """
+        headers = dict(headers or {})
+        cached = self._lookup(url)
+        if cached:
+            headers['If-None-Match'] = cached[0]
+
+        response = session.get(url, headers=headers)
+
+        if cached and response.status_code == 304:
+            with self._lock:
+                self.hits += 1
+            self._touch(url)
+
+            response.status_code = 200
+            response._content = cached[1]
+            response.encoding = response.encoding or 'utf-8'
+            return response
+
+        with self._lock:
+            self.misses += 1
+        etag = response.headers.get('ETag')
+        if response.status_code == 200 and etag:
+            self._store(url, etag, response.content)
+
+        return response
+
+    def stats(self) -> dict[str, float]:
+        """
+        Returns cache statistics.
+
+        Returns
+        -------
+        dict[str, float]
+            Number of hits, misses and evictions, hit rate and size of cached bodies in bytes.
+        """
+        with self._lock:
+            requests_count = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests_count if requests_count else 0.0,
+                'evictions': self.evictions,
+                'size_bytes': self._total_bytes,
+            }
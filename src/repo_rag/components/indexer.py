@@ -0,0 +1,129 @@
+import logging
+
+from langchain.text_splitter import TextSplitter
+
+from repo_rag.components.filters import FileFilter
+from repo_rag.components.loader import Loader
+from repo_rag.components.pipeline import IngestionPipeline
+from repo_rag.components.sharded_store import ShardedVectorstore
+from repo_rag.components.vectorstore import Vectorstore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class Indexer:
+    """
+    A component keeping a vectorstore in sync with a repository.
+
+    Files are compared with the vectorstore manifest by blob SHA: only added or modified
+    files are fetched, split and embedded, and chunks of modified or deleted files are
+    removed from the index. Changed files are streamed through an `IngestionPipeline`, so
+    fetching, splitting, embedding and indexing overlap. The store is compacted at the end of
+    a build, so it can be served with `Vectorstore.load(read_only=True)`. Given a
+    `ShardedVectorstore`, the repository is indexed into its own shard.
+    """
+
+    @staticmethod
+    def index_repository(
+        vectorstore: Vectorstore | ShardedVectorstore,
+        repo_url: str,
+        splitter: TextSplitter,
+        batch_size: int,
+        token: str | None = None,
+        source: str | None = None,
+        file_filter: FileFilter | None = None,
+    ) -> dict[str, int]:
+        """
+        Incrementally (re-)indexes a repository.
+
+        Parameters
+        ----------
+        vectorstore : Vectorstore | ShardedVectorstore
+            Vectorstore to update, or sharded vectorstore whose shard of the repository to update.
+        repo_url : str
+            URL of the GitHub repository.
+        splitter : TextSplitter
+            TextSplitter instance used to divide documents into smaller chunks.
+        batch_size : int
+            Number of documents embedded per batch.
+        token : str | None, optional
+            GitHub authentication token, by default None.
+        source : str | None, optional
+            Local archive or directory to read the repository from instead of the GitHub API,
+            see `Loader.iter_source`, by default None.
+        file_filter : FileFilter | None, optional
+            Filter of files not worth indexing, by default `FileFilter()` with default settings.
+            Previously indexed files that are now filtered out are removed from the index.
+
+        Returns
+        -------
+        dict[str, int]
+            Number of unchanged, added, modified, deleted and failed (not fetched) files, of removed and
+            embedded chunks, and of files, bytes and (estimated) chunks skipped by the filter.
+        """
+        repo_url = Loader.source_url(source, repo_url or None) if source is not None else repo_url.rstrip('/')
+        if isinstance(vectorstore, ShardedVectorstore):
+            vectorstore = vectorstore.shard(repo_url)
+
+        # finish an interrupted compaction before the manifest is read
+        vectorstore.log.recover()
+        manifest = vectorstore.manifest
+        file_filter = file_filter or FileFilter()
+
+        if source is None:
+            files = Loader.iter_files(repo_url, token, known=manifest.shas(repo_url), file_filter=file_filter)
+        else:
+            files = (
+                (file_doc.metadata['file_name'], file_doc.metadata['sha'], file_doc)
+                for file_doc in Loader.iter_source(source, repo_url or None, token=token, file_filter=file_filter)
+            )
+
+        present, added, modified, failed = set(), [], [], []
+
+        def changed_files():
+            for file_name, sha, file_doc in files:
+                present.add(file_name)
+                entry = manifest.get(repo_url, file_name)
+                if file_doc is None:
+                    # unchanged files are not fetched, changed files without a document could not be fetched
+                    if not entry or entry['sha'] != sha:
+                        failed.append(file_name)
+                    continue
+
+                if file_doc.metadata['repo_url'] != repo_url:
+                    raise ValueError(f'File {file_name} belongs to {file_doc.metadata["repo_url"]}, not to {repo_url}.')
+                if entry and entry['sha'] == sha:
+                    continue
+
+                (modified if entry else added).append(file_name)
+                yield file_doc
+
+        pipeline = IngestionPipeline(vectorstore, splitter, batch_size)
+        embedded_chunks, removed_chunks = pipeline.run(changed_files())
+
+        deleted = [file_name for file_name in manifest.files(repo_url) if file_name not in present] if present else []
+        removed_chunks += vectorstore.delete_files(repo_url, deleted)
+        if vectorstore.log.size():
+            vectorstore.compact()
+
+        logger.info(
+            f'{len(added)} added, {len(modified)} modified, {len(deleted)} deleted files. '
+            f'Embedded {embedded_chunks} and removed {removed_chunks} documents.'
+        )
+        if failed:
+            logger.warning(f'Could not fetch {len(failed)} files, they are retried by the next build: {failed}')
+        logger.info(f'Skipped files: {file_filter.stats()}')
+
+        return {
+            'unchanged_files': len(present) - len(added) - len(modified) - len(failed),
+            'added_files': len(added),
+            'modified_files': len(modified),
+            'deleted_files': len(deleted),
+            'failed_files': len(failed),
+            'removed_chunks': removed_chunks,
+            'embedded_chunks': embedded_chunks,
+            'skipped_files': file_filter.stats()['skipped_files'],
+            'skipped_bytes': file_filter.skipped_bytes,
+            'skipped_chunks': file_filter.skipped_chunks,
+        }
@@ -0,0 +1,316 @@
+import json
+import logging
+import math
+import re
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from repo_rag.components.constants import BM25_B, BM25_K1
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LexicalIndex:
+    """
+    A BM25 inverted index over the chunks of a vectorstore, searched next to the FAISS index.
+
+    Texts are split by `tokenize`, which knows code identifiers: `getUserName` is indexed as
+    `getusername`, `get`, `user` and `name`, so a question mentioning either the identifier or
+    its words matches the chunk.
+
+    The snapshot holds the postings in compressed sparse row form, one row per term:
+    `lexical.indptr.npy` (start of every term's postings, plus their end), `lexical.rows.npy`
+    (document rows), `lexical.tfs.npy` (term frequencies), `lexical.lengths.npy` (number of
+    tokens of every document) and `lexical.json` (document ids and terms). The arrays are mapped
+    on load. Documents added or deleted after loading are kept in memory until the next snapshot
+    is written with `write`, like `CompactDocstore`.
+    """
+
+    FILE_NAME = 'lexical.json'
+    INDPTR_NAME = 'lexical.indptr.npy'
+    ROWS_NAME = 'lexical.rows.npy'
+    TFS_NAME = 'lexical.tfs.npy'
+    LENGTHS_NAME = 'lexical.lengths.npy'
+    FILE_NAMES = (INDPTR_NAME, ROWS_NAME, TFS_NAME, LENGTHS_NAME, FILE_NAME)
+
+    IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|[0-9]+')
+    WORD = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+')
+    STOPWORDS = frozenset(
+        'a an and are as at be by can do does for from how i in is it of on or that the this to was what when '
+        'where which who why will with'.split()
+    )
+
+    def __init__(
+        self,
+        ids: list[str] | None = None,
+        terms: list[str] | None = None,
+        indptr: np.ndarray | None = None,
+        rows: np.ndarray | None = None,
+        tfs: np.ndarray | None = None,
+        lengths: np.ndarray | None = None,
+        k1: float = BM25_K1,
+        b: float = BM25_B,
+    ):
+        self.ids = ids or []
+        self.terms = terms or []
+        self.indptr = indptr if indptr is not None else np.zeros(1, dtype=np.int64)
+        self.rows = rows if rows is not None else np.zeros(0, dtype=np.int32)
+        self.tfs = tfs if tfs is not None else np.zeros(0, dtype=np.uint16)
+        self.lengths = lengths if lengths is not None else np.zeros(0, dtype=np.float32)
+        self.k1 = k1
+        self.b = b
+
+        self._term_ids: dict[str, int] | None = None
+        self._rows: dict[str, int] | None = None
+        self._live: np.ndarray | None = None
+        self._snapshot_length = float(self.lengths.sum())
+        self._deleted_length = 0.0
+        self._deleted = 0
+
+        self._added: dict[str, Counter] = {}
+        self._added_lengths: dict[str, int] = {}
+        self._postings: dict[str, dict[str, int]] = {}
+
+    @staticmethod
+    def tokenize(text: str) -> list[str]:
+        """
+        Splits text into lowercase terms, splitting camelCase and snake_case identifiers into their words.
+
+        Parameters
+        ----------
+        text : str
+            Code or natural-language text.
+
+        Returns
+        -------
+        list[str]
+            Every identifier as a whole followed by its words, without single characters and stopwords.
+        """
+        tokens = []
+        for identifier in LexicalIndex.IDENTIFIER.findall(text):
+            words = [word.lower() for part in identifier.split('_') for word in LexicalIndex.WORD.findall(part)]
+            whole = identifier.lower().strip('_')
+            if len(words) > 1:
+                tokens.append(whole)
+            tokens += words
+        return [token for token in tokens if len(token) > 1 and token not in LexicalIndex.STOPWORDS]
+
+    @classmethod
+    def exists(cls, vectorstore_path: str | Path) -> bool:
+        """Checks whether a vectorstore has a lexical index snapshot."""
+        return (Path(vectorstore_path) / cls.FILE_NAME).exists()
+
+    @classmethod
+    def load(cls, vectorstore_path: str | Path) -> 'LexicalIndex':
+        """Maps the lexical index snapshot of a vectorstore."""
+        path = Path(vectorstore_path)
+        with (path / cls.FILE_NAME).open('r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        return cls(
+            ids=data['ids'],
+            terms=data['terms'],
+            indptr=np.load(path / cls.INDPTR_NAME, mmap_mode='r'),
+            rows=np.load(path / cls.ROWS_NAME, mmap_mode='r'),
+            tfs=np.load(path / cls.TFS_NAME, mmap_mode='r'),
+            lengths=np.load(path / cls.LENGTHS_NAME, mmap_mode='r'),
+        )
+
+    @classmethod
+    def build(cls, ids: list[str], texts: list[str]) -> 'LexicalIndex':
+        """Indexes documents of a vectorstore that has no lexical index snapshot yet."""
+        index = cls()
+        index.add(ids, texts)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.ids) - self._deleted + len(self._added)
+
+    def _term_id(self, term: str) -> int | None:
+        """Returns the snapshot row of a term, or None if it is not in the snapshot."""
+        if self._term_ids is None:
+            self._term_ids = dict(zip(self.terms, range(len(self.terms))))
+        return self._term_ids.get(term)
+
+    def _row(self, doc_id: str) -> int | None:
+        """Returns the snapshot row of a document, or None if it is not in the snapshot or was deleted."""
+        if self._rows is None:
+            self._rows = dict(zip(self.ids, range(len(self.ids))))
+        row = self._rows.get(doc_id)
+        if row is None or (self._live is not None and not self._live[row]):
+            return None
+        return row
+
+    def add(self, ids: list[str], texts: list[str]) -> None:
+        """
+        Indexes documents in memory until the next snapshot.
+
+        Parameters
+        ----------
+        ids : list[str]
+            Ids of the documents.
+        texts : list[str]
+            Texts of the documents.
+        """
+        self.delete([doc_id for doc_id in ids if doc_id in self._added or self._row(doc_id) is not None])
+        for doc_id, text in zip(ids, texts):
+            counts = Counter(LexicalIndex.tokenize(text))
+            self._added[doc_id] = counts
+            self._added_lengths[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+
+    def delete(self, ids: list[str]) -> None:
+        """
+        Removes documents from the index, ignoring ids that are not indexed.
+
+        Parameters
+        ----------
+        ids : list[str]
+            Ids of the documents.
+        """
+        for doc_id in ids:
+            counts = self._added.pop(doc_id, None)
+            if counts is not None:
+                del self._added_lengths[doc_id]
+                for term in counts:
+                    postings = self._postings[term]
+                    del postings[doc_id]
+                    if not postings:
+                        del self._postings[term]
+                continue
+
+            row = self._row(doc_id)
+            if row is None:
+                continue
+            if self._live is None:
+                self._live = np.ones(len(self.ids), dtype=bool)
+            self._live[row] = False
+            self._deleted += 1
+            self._deleted_length += float(self.lengths[row])
+
+    def _bm25(self, tfs: np.ndarray, lengths: np.ndarray, idf: float, mean_length: float) -> np.ndarray:
+        """Returns the BM25 term scores of documents with the given term frequencies and lengths."""
+        return idf * tfs * (self.k1 + 1) / (tfs + self.k1 * (1 - self.b + self.b * lengths / mean_length))
+
+    def search(self, query: str, k: int = 4) -> list[tuple[str, float]]:
+        """
+        Returns the documents with the highest BM25 scores for a query.
+
+        Parameters
+        ----------
+        query : str
+            Query text, tokenized like the documents.
+        k : int, optional
+            Number of documents to return, by default 4.
+
+        Returns
+        -------
+        list[tuple[str, float]]
+            Ids of the documents matching any query term and their scores, best first.
+        """
+        n = len(self)
+        terms = set(LexicalIndex.tokenize(query))
+        if not n or not terms:
+            return []
+
+        mean_length = max((self._snapshot_length - self._deleted_length + sum(self._added_lengths.values())) / n, 1.0)
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        added_scores: dict[str, float] = {}
+
+        for term in terms:
+            rows, tfs = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+            term_id = self._term_id(term)
+            if term_id is not None:
+                start, end = int(self.indptr[term_id]), int(self.indptr[term_id + 1])
+                rows, tfs = np.asarray(self.rows[start:end]), np.asarray(self.tfs[start:end], dtype=np.float32)
+                if self._live is not None:
+                    live = self._live[rows]
+                    rows, tfs = rows[live], tfs[live]
+            postings = self._postings.get(term, {})
+
+            df = len(rows) + len(postings)
+            if not df:
+                continue
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+            if len(rows):
+                scores[rows] += self._bm25(tfs, self.lengths[rows], idf, mean_length)
+            for doc_id, tf in postings.items():
+                added_scores[doc_id] = added_scores.get(doc_id, 0.0) + float(
+                    self._bm25(np.float32(tf), np.float32(self._added_lengths[doc_id]), idf, mean_length)
+                )
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+        results = [(self.ids[row], float(scores[row])) for row in candidates] + list(added_scores.items())
+        return sorted(results, key=lambda result: result[1], reverse=True)[:k]
+
+    def write(self, vectorstore_path: str | Path, prefix: str = '') -> None:
+        """
+        Writes a snapshot of the indexed documents, prefixing the file names.
+
+        The postings of the snapshot are merged with the documents added since, deleted
+        documents and terms left without postings are dropped, and no text is tokenized again.
+
+        Parameters
+        ----------
+        vectorstore_path : str | Path
+            Directory of the vectorstore.
+        prefix : str, optional
+            Prefix of the written file names, by default ''.
+        """
+        path = Path(vectorstore_path)
+        live_rows = np.flatnonzero(self._live) if self._live is not None else np.arange(len(self.ids))
+        new_rows = np.full(len(self.ids), -1, dtype=np.int64)
+        new_rows[live_rows] = np.arange(len(live_rows))
+
+        entry_terms = np.repeat(np.arange(len(self.terms), dtype=np.int64), np.diff(self.indptr))
+        entry_rows = new_rows[np.asarray(self.rows, dtype=np.int64)]
+        kept = entry_rows >= 0
+        entry_terms, entry_rows, entry_tfs = entry_terms[kept], entry_rows[kept], np.asarray(self.tfs)[kept]
+
+        terms = list(self.terms)
+        term_ids = dict(zip(terms, range(len(terms))))
+        added_terms, added_rows, added_tfs = [], [], []
+        for row, counts in enumerate(self._added.values(), start=len(live_rows)):
+            for term, tf in counts.items():
+                if term not in term_ids:
+                    term_ids[term] = len(terms)
+                    terms.append(term)
+                added_terms.append(term_ids[term])
+                added_rows.append(row)
+                added_tfs.append(min(tf, np.iinfo(np.uint16).max))
+
+        entry_terms = np.concatenate([entry_terms, np.asarray(added_terms, dtype=np.int64)])
+        entry_rows = np.concatenate([entry_rows, np.asarray(added_rows, dtype=np.int64)])
+        entry_tfs = np.concatenate([entry_tfs, np.asarray(added_tfs, dtype=np.uint16)])
+
+        counts = np.bincount(entry_terms, minlength=len(terms))
+        used = np.flatnonzero(counts)
+        renumbered = np.full(len(terms), -1, dtype=np.int64)
+        renumbered[used] = np.arange(len(used))
+        entry_terms = renumbered[entry_terms]
+        order = np.lexsort((entry_rows, entry_terms))
+
+        indptr = np.zeros(len(used) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(counts[used])
+        lengths = np.concatenate(
+            [
+                np.asarray(self.lengths, dtype=np.float32)[live_rows],
+                np.asarray(list(self._added_lengths.values()), dtype=np.float32),
+            ]
+        )
+
+        np.save(path / f'{prefix}{LexicalIndex.INDPTR_NAME}', indptr)
+        np.save(path / f'{prefix}{LexicalIndex.ROWS_NAME}', entry_rows[order].astype(np.int32))
+        np.save(path / f'{prefix}{LexicalIndex.TFS_NAME}', entry_tfs[order])
+        np.save(path / f'{prefix}{LexicalIndex.LENGTHS_NAME}', lengths)
+        with (path / f'{prefix}{LexicalIndex.FILE_NAME}').open('w', encoding='utf-8') as f:
+            json.dump(
+                {'ids': [self.ids[row] for row in live_rows] + list(self._added), 'terms': [terms[i] for i in used]}, f
+            )
@@ -1,10 +1,28 @@
 import os
+import hashlib
 import logging
+import subprocess
+import tarfile
+import threading
+import zipfile
+from collections import deque
+from pathlib import Path
+from typing import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlparse
+from uuid import NAMESPACE_URL, uuid5
+
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 from langchain_core.documents import Document
 from langchain.text_splitter import TextSplitter
 
+from repo_rag.components.constants import HTTP_CACHE_MAX_BYTES, HTTP_CACHE_PATH
+from repo_rag.components.filters import FileFilter
+from repo_rag.components.http_cache import HttpCache
+from repo_rag.components.symbols import SymbolIndex
+
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
@@ -18,11 +36,34 @@ class Loader:
     This class interacts with the GitHub API to retrieve files while filtering out
     unsupported file types. It supports loading raw file content and splitting
     documents into smaller chunks for further processing.
+
+    File contents are fetched concurrently by a bounded worker pool sharing one
+    connection-pooled HTTP session, with a cap on in-flight requests per host.
+
+    A whole repository can also be read from a single source - a streamed tarball,
+    a local archive, a git checkout or a plain directory - without per-file API calls.
+
+    The file listing comes from a single recursive tree request, and every GitHub response
+    goes through `Loader.http_cache`, so rebuilding an unchanged repository only costs
+    conditional requests. Set `Loader.http_cache = None` to disable caching.
     """
 
     GITHUB_API = 'https://api.github.com/repos/'
+    GITHUB_RAW = 'https://raw.githubusercontent.com/'
     token = os.getenv('GITHUB_TOKEN')
 
+    MAX_WORKERS = 16
+    MAX_CONNECTIONS_PER_HOST = 8
+
+    _session: requests.Session | None = None
+    _session_lock = threading.Lock()
+    _host_semaphores: dict[str, threading.BoundedSemaphore] = {}
+
+    http_cache: HttpCache | None = HttpCache(HTTP_CACHE_PATH, HTTP_CACHE_MAX_BYTES)
+
+    ARCHIVE_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.zip')
+    SKIPPED_DIRS = {'.git'}
+
     IGNORED_EXTENSIONS = {
         '.png',
         '.jpg',
@@ -62,20 +103,133 @@ class Loader:
     }
 
     @staticmethod
-    def _get_repo_files(repo_url: str, token: str | None = None):
+    def _get_session() -> requests.Session:
+        """Returns the shared HTTP session, creating it on first use.
+
+        The session keeps TLS connections alive between requests, so fetching many files
+        from the same host pays for a single handshake per pooled connection.
+
+        Returns
+        -------
+        requests.Session
+            Connection-pooled session shared by all Loader requests.
+        """
+        with Loader._session_lock:
+            if Loader._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=Loader.MAX_CONNECTIONS_PER_HOST,
+                    pool_maxsize=max(Loader.MAX_WORKERS, Loader.MAX_CONNECTIONS_PER_HOST),
+                    max_retries=3,
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                Loader._session = session
+            return Loader._session
+
+    @staticmethod
+    def _get_host_semaphore(url: str) -> threading.BoundedSemaphore:
+        """Returns the semaphore limiting concurrent requests to the host of the given url.
+
+        Parameters
+        ----------
+        url : str
+            URL that is about to be requested.
+
+        Returns
+        -------
+        threading.BoundedSemaphore
+            Semaphore shared by all requests to the same host.
+        """
+        host = urlparse(url).netloc
+        with Loader._session_lock:
+            if host not in Loader._host_semaphores:
+                Loader._host_semaphores[host] = threading.BoundedSemaphore(Loader.MAX_CONNECTIONS_PER_HOST)
+            return Loader._host_semaphores[host]
+
+    @staticmethod
+    def _request(url: str, token: str | None = None) -> requests.Response:
+        """Issues a GET request through the shared session, respecting the per-host limit.
+
+        Parameters
+        ----------
+        url : str
+            URL to fetch.
+        token : str | None, optional
+            GitHub authentication token, by default None.
+
+        Returns
+        -------
+        requests.Response
+            Response of the request.
+        """
+        headers = {'Authorization': f'token {token or Loader.token}'} if token or Loader.token else {}
+
+        with Loader._get_host_semaphore(url):
+            if Loader.http_cache is not None:
+                return Loader.http_cache.get(Loader._get_session(), url, headers)
+            return Loader._get_session().get(url, headers=headers)
+
+    @staticmethod
+    def _get_repo_files(repo_url: str, token: str | None = None, ref: str | None = None):
         """Fetches files from a repository, filtering out ignored file types.
 
+        The listing comes from a single recursive git tree request. If GitHub truncates the tree
+        (very large repositories) or the request fails, the contents API is walked directory by directory.
+
         Parameters
         ----------
         repo_url : str
             URL of the GitHub repository.
         token : str | None, optional
             GitHub authentication token, by default None.
+        ref : str | None, optional
+            Branch, tag or commit to list, by default the default branch.
 
         Returns
         -------
         list of tuple
-            List of tuples containing (file_name, download_url, full_file_url, repo_url).
+            List of tuples containing (file_name, download_url, full_file_url, repo_url, blob_sha, size).
+        """
+        repo_name = repo_url.rstrip('/').split('github.com/')[-1]
+        tree_url = f'{Loader.GITHUB_API}{repo_name}/git/trees/{ref or "HEAD"}?recursive=1'
+
+        response = Loader._request(tree_url, token)
+        if response.status_code != 200:
+            logger.error(f'Error fetching: {tree_url} | Status: {response.status_code}')
+            return Loader._get_repo_files_by_contents(repo_url, token)
+
+        tree = response.json()
+        if tree.get('truncated'):
+            logger.warning(f'Tree listing of {repo_url} is truncated, listing directories one by one.')
+            return Loader._get_repo_files_by_contents(repo_url, token)
+
+        files = []
+        for item in tree['tree']:
+            if item['type'] != 'blob' or Loader._is_ignored(item['path']):
+                continue
+
+            download_url = f'{Loader.GITHUB_RAW}{repo_name}/{ref or "HEAD"}/{quote(item["path"])}'
+            full_file_url = f'{repo_url}/blob/{ref or "main"}/{item["path"]}'
+            files.append((item['path'], download_url, full_file_url, repo_url, item['sha'], item.get('size')))
+
+        return files
+
+    @staticmethod
+    def _get_repo_files_by_contents(repo_url: str, token: str | None = None):
+        """Fetches files from a repository by walking the contents API, one request per directory.
+
+        Parameters
+        ----------
+        repo_url : str
+            URL of the GitHub repository.
+        token : str | None, optional
+            GitHub authentication token, by default None.
+
+        Returns
+        -------
+        list of tuple
+            List of tuples containing (file_name, download_url, full_file_url, repo_url, blob_sha, size).
         """
         repo_name = repo_url.rstrip('/').split('github.com/')[-1]
         api_url = f'{Loader.GITHUB_API}{repo_name}/contents/'
@@ -84,9 +238,7 @@ class Loader:
             """
             Helper function to recursively fetch files from the repository.
             """
-            headers = {'Authorization': f'token {token or Loader.token}'} if token or Loader.token else {}
-
-            response = requests.get(url, headers=headers)
+            response = Loader._request(url, token)
             if response.status_code != 200:
                 logger.error(f'Error fetching: {url} | Status: {response.status_code}')
                 return []
@@ -99,7 +251,9 @@ class Loader:
                         continue
 
                     full_file_url = f'{repo_url}/blob/main/{path}{item["name"]}'
-                    files.append((path + item['name'], item['download_url'], full_file_url, repo_url))
+                    files.append(
+                        (path + item['name'], item['download_url'], full_file_url, repo_url, item['sha'], item['size'])
+                    )
 
                 elif item['type'] == 'dir':
                     files.extend(fetch_files(item['url'], path + item['name'] + '/'))
@@ -124,9 +278,12 @@ class Loader:
         str | None
             Content of the file as a string, or None if an error occurs.
         """
-        headers = {'Authorization': f'token {token or Loader.token}'} if token or Loader.token else {}
+        try:
+            response = Loader._request(file_url, token)
+        except requests.RequestException as e:
+            logger.error(f'Error fetching file content: {file_url} | {e}')
+            return None
 
-        response = requests.get(file_url, headers=headers)
         if response.status_code == 200:
             return response.text
 
@@ -134,7 +291,178 @@ class Loader:
         return None
 
     @staticmethod
-    def load(repo_url: str, token: str | None = None):
+    def _fetch_contents(files: Iterable[tuple], token: str | None = None, max_workers: int | None = None):
+        """Fetches the contents of the given files concurrently, yielding results in input order.
+
+        At most `2 * max_workers` files are in flight or buffered at once, so a slow consumer
+        throttles fetching instead of accumulating downloaded files in memory.
+
+        Parameters
+        ----------
+        files : iterable of tuple
+            Tuples of (file_name, download_url, full_file_url, repo_url, blob_sha, size) as returned by
+            `_get_repo_files`.
+        token : str | None, optional
+            GitHub authentication token, by default None.
+        max_workers : int | None, optional
+            Size of the worker pool, by default `Loader.MAX_WORKERS`. Use 1 to fetch sequentially.
+
+        Yields
+        ------
+        tuple
+            Pairs of (file tuple, file content or None).
+        """
+        max_workers = max_workers or Loader.MAX_WORKERS
+
+        if max_workers <= 1:
+            for file in files:
+                yield file, Loader._get_file_content(file[1], token)
+            return
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='loader') as executor:
+            in_flight = deque()
+            for file in files:
+                in_flight.append((file, executor.submit(Loader._get_file_content, file[1], token)))
+
+                if len(in_flight) >= 2 * max_workers:
+                    file, future = in_flight.popleft()
+                    yield file, future.result()
+
+            for file, future in in_flight:
+                yield file, future.result()
+
+    @staticmethod
+    def blob_sha(content: bytes) -> str:
+        """Computes the git blob SHA of the content, the same id GitHub reports in tree listings.
+
+        Parameters
+        ----------
+        content : bytes
+            Raw file content.
+
+        Returns
+        -------
+        str
+            Hex digest of the git blob object.
+        """
+        return hashlib.sha1(b'blob %d\0' % len(content) + content).hexdigest()
+
+    @staticmethod
+    def chunk_id(repo_url: str, file_name: str, sha: str, index: int) -> str:
+        """Returns a deterministic id of the index-th chunk of a file version.
+
+        Parameters
+        ----------
+        repo_url : str
+            URL of the GitHub repository.
+        file_name : str
+            Path of the file relative to the repository root.
+        sha : str
+            Blob SHA of the file.
+        index : int
+            Position of the chunk within the file.
+
+        Returns
+        -------
+        str
+            Chunk id, stable across builds as long as the file does not change.
+        """
+        return str(uuid5(NAMESPACE_URL, f'{repo_url}/{file_name}@{sha}#{index}'))
+
+    @staticmethod
+    def split(file_doc: Document, splitter: TextSplitter) -> list[Document]:
+        """Splits a file document into chunks with deterministic ids, recording the definitions
+        each chunk holds for the symbol table (see `SymbolIndex.annotate`).
+
+        Parameters
+        ----------
+        file_doc : Document
+            Document holding a whole file, with `repo_url`, `file_name` and `sha` metadata.
+        splitter : TextSplitter
+            TextSplitter instance used to divide documents into smaller chunks.
+
+        Returns
+        -------
+        list of Document
+            Chunks of the file.
+        """
+        chunks = splitter.split_documents([file_doc])
+        SymbolIndex.annotate(file_doc, chunks)
+
+        metadata = file_doc.metadata
+        if 'sha' in metadata:
+            for index, chunk in enumerate(chunks):
+                chunk.id = Loader.chunk_id(metadata['repo_url'], metadata['file_name'], metadata['sha'], index)
+
+        return chunks
+
+    @staticmethod
+    def iter_files(
+        repo_url: str,
+        token: str | None = None,
+        known: dict[str, str] | None = None,
+        max_workers: int | None = None,
+        ref: str | None = None,
+        file_filter: FileFilter | None = None,
+    ) -> Iterator[tuple[str, str, Document | None]]:
+        """Lists the repository and fetches only files whose blob SHA differs from the known one.
+
+        Parameters
+        ----------
+        repo_url : str
+            URL of the GitHub repository.
+        token : str | None, optional
+            GitHub authentication token, by default None.
+        known : dict[str, str] | None, optional
+            Blob SHAs of already indexed files by file name, by default None (fetch everything).
+        max_workers : int | None, optional
+            Number of files fetched concurrently, by default `Loader.MAX_WORKERS`.
+        ref : str | None, optional
+            Branch, tag or commit to read, by default the default branch.
+        file_filter : FileFilter | None, optional
+            Filter of files not worth indexing, by default None. `.gitignore` and `.gitattributes`
+            files from the listing are fetched first and their rules added to it.
+
+        Yields
+        ------
+        tuple[str, str, Document | None]
+            Triples of (file_name, blob_sha, file document). The document is None for unchanged
+            files and for files that could not be fetched. Filtered out files are not yielded.
+        """
+        repo_url = repo_url.rstrip('/')
+        known = known or {}
+
+        files = Loader._get_repo_files(repo_url, token, ref)
+        if file_filter is not None:
+            for file_name, download_url, *_ in files:
+                if FileFilter.is_rules_file(file_name):
+                    rules = Loader._get_file_content(download_url, token)
+                    file_filter.add_rules(file_name, rules or '')
+
+            files = [file for file in files if file_filter.check_path(file[0], file[5]) is None]
+
+        changed = []
+        for file in files:
+            file_name, sha = file[0], file[4]
+            if known.get(file_name) == sha:
+                yield file_name, sha, None
+            else:
+                changed.append(file)
+
+        for (file_name, _, full_url, url, sha, _), file_content in Loader._fetch_contents(changed, token, max_workers):
+            if file_content and file_filter is not None and file_filter.check_content(file_name, file_content):
+                continue
+
+            file_doc = None
+            if file_content:
+                file_doc = Document(
+                    page_content=file_content,
+                    metadata={'file_name': file_name, 'full_url': full_url, 'repo_url': url, 'sha': sha},
+                )
+            yield file_name, sha, file_doc
+
+    @staticmethod
+    def load(repo_url: str, token: str | None = None, max_workers: int | None = None):
         """
         Loads files from the repository and returns them as documents.
 
@@ -144,6 +472,8 @@ class Loader:
             URL of the GitHub repository.
         token : str | None, optional
             GitHub authentication token, by default None.
+        max_workers : int | None, optional
+            Number of files fetched concurrently, by default `Loader.MAX_WORKERS`.
 
         Returns
         -------
@@ -152,18 +482,19 @@ class Loader:
         """
         file_docs = []
         files = Loader._get_repo_files(repo_url, token)
-        for file_name, raw_url, full_url, repo_url in files:
-            file_content = Loader._get_file_content(raw_url, token)
+        for (file_name, _, full_url, repo_url, sha, _), file_content in Loader._fetch_contents(
+            files, token, max_workers
+        ):
             if file_content:
                 file_doc = Document(
                     page_content=file_content,
-                    metadata={'file_name': file_name, 'full_url': full_url, 'repo_url': repo_url},
+                    metadata={'file_name': file_name, 'full_url': full_url, 'repo_url': repo_url, 'sha': sha},
                 )
                 file_docs.append(file_doc)
         return file_docs
 
     @staticmethod
-    def load_and_split(repo_url: str, splitter: TextSplitter, token: str | None = None):
+    def load_and_split(repo_url: str, splitter: TextSplitter, token: str | None = None, max_workers: int | None = None):
         """Loads files from the repository, splits them into chunks, and returns them as documents.
 
         Parameters
@@ -174,6 +505,8 @@ class Loader:
             TextSplitter instance used to divide documents into smaller chunks.
         token : str | None, optional
             GitHub authentication token, by default None.
+        max_workers : int | None, optional
+            Number of files fetched concurrently, by default `Loader.MAX_WORKERS`.
 
         Returns
         -------
@@ -182,15 +515,320 @@ class Loader:
         """
         file_docs = []
         files = Loader._get_repo_files(repo_url, token)
-        for file_name, raw_url, full_url, url in files:
-            file_content = Loader._get_file_content(raw_url, token)
-
+        for (file_name, _, full_url, url, sha, _), file_content in Loader._fetch_contents(files, token, max_workers):
             if file_content:
                 file_doc = Document(
                     page_content=file_content,
-                    metadata={'file_name': file_name, 'full_url': full_url, 'repo_url': url},
+                    metadata={'file_name': file_name, 'full_url': full_url, 'repo_url': url, 'sha': sha},
                 )
-                split_file_doc = splitter.split_documents([file_doc])
+                split_file_doc = Loader.split(file_doc, splitter)
                 file_docs += split_file_doc
 
         return file_docs
+
+    @staticmethod
+    def _is_ignored(file_name: str) -> bool:
+        """Checks whether the file should be skipped based on its extension or directory.
+
+        Parameters
+        ----------
+        file_name : str
+            Path of the file relative to the repository root.
+
+        Returns
+        -------
+        bool
+            True if the file should not be indexed.
+        """
+        if Loader.SKIPPED_DIRS & set(file_name.split('/')[:-1]):
+            return True
+        return os.path.splitext(file_name)[1].lower() in Loader.IGNORED_EXTENSIONS
+
+    @staticmethod
+    def _decode(content: bytes) -> str | None:
+        """Decodes file content as UTF-8, returning None for binary files."""
+        try:
+            return content.decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+
+    @staticmethod
+    def _iter_tar(fileobj, strip_root: bool = True) -> Iterator[tuple[str, bytes]]:
+        """Reads files from a tar stream sequentially, without extracting it to disk.
+
+        Parameters
+        ----------
+        fileobj : file-like
+            Readable (not necessarily seekable) stream with gzip-compressed or plain tar data.
+        strip_root : bool, optional
+            Whether to drop the top-level directory GitHub adds to archives, by default True.
+
+        Yields
+        ------
+        tuple[str, bytes]
+            Pairs of (file_name, raw file content).
+        """
+        with tarfile.open(fileobj=fileobj, mode='r|*') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+
+                file_name = member.name.split('/', 1)[-1] if strip_root else member.name
+                if not file_name or Loader._is_ignored(file_name):
+                    continue
+
+                yield file_name, archive.extractfile(member).read()
+
+    @staticmethod
+    def _iter_tar_file(path: str | Path) -> Iterator[tuple[str, bytes]]:
+        """Reads files from a local tar archive, see `Loader._iter_tar`."""
+        with open(path, 'rb') as fileobj:
+            yield from Loader._iter_tar(fileobj)
+
+    @staticmethod
+    def _iter_tar_response(response: requests.Response) -> Iterator[tuple[str, bytes]]:
+        """Reads files from a streamed tarball response, see `Loader._iter_tar`."""
+        with response:
+            response.raw.decode_content = True
+            yield from Loader._iter_tar(response.raw)
+
+    @staticmethod
+    def _iter_zip(path: str | Path, strip_root: bool = True) -> Iterator[tuple[str, bytes]]:
+        """Reads files from a zip archive entry by entry, without extracting it to disk.
+
+        Parameters
+        ----------
+        path : str | Path
+            Path of the zip archive.
+        strip_root : bool, optional
+            Whether to drop the top-level directory GitHub adds to archives, by default True.
+
+        Yields
+        ------
+        tuple[str, bytes]
+            Pairs of (file_name, raw file content).
+        """
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+
+                file_name = info.filename.split('/', 1)[-1] if strip_root else info.filename
+                if not file_name or Loader._is_ignored(file_name):
+                    continue
+
+                yield file_name, archive.read(info)
+
+    @staticmethod
+    def _iter_directory(path: str | Path) -> Iterator[tuple[str, bytes]]:
+        """Reads files from a local directory. For git checkouts only tracked files are read.
+
+        Parameters
+        ----------
+        path : str | Path
+            Root directory of the repository.
+
+        Yields
+        ------
+        tuple[str, bytes]
+            Pairs of (file_name, raw file content).
+        """
+        root = Path(path)
+
+        if (root / '.git').exists():
+            output = subprocess.run(
+                ['git', '-C', str(root), 'ls-files', '-z'], capture_output=True, check=True
+            ).stdout.decode('utf-8')
+            file_names = sorted(name for name in output.split('\0') if name)
+        else:
+            file_names = sorted(
+                file.relative_to(root).as_posix()
+                for file in root.rglob('*')
+                if file.is_file() and not Loader.SKIPPED_DIRS & set(file.relative_to(root).parts)
+            )
+
+        for file_name in file_names:
+            file = root / file_name
+            if Loader._is_ignored(file_name) or not file.is_file():
+                continue
+
+            yield file_name, file.read_bytes()
+
+    @staticmethod
+    def _git_info(path: str | Path) -> tuple[str | None, str | None]:
+        """Returns (remote_url, branch) of a local git checkout, or Nones if unavailable."""
+
+        def git(*args: str) -> str | None:
+            result = subprocess.run(['git', '-C', str(path), *args], capture_output=True, text=True)
+            if result.returncode != 0:
+                return None
+            return result.stdout.strip() or None
+
+        remote_url = git('remote', 'get-url', 'origin')
+        if remote_url:
+            if remote_url.startswith('git@'):
+                remote_url = 'https://' + remote_url[len('git@') :].replace(':', '/', 1)
+            remote_url = remote_url.removesuffix('.git')
+
+        branch = git('rev-parse', '--abbrev-ref', 'HEAD')
+        return remote_url, branch if branch != 'HEAD' else git('rev-parse', 'HEAD')
+
+    @staticmethod
+    def source_url(source: str, repo_url: str | None = None) -> str:
+        """
+        Returns the repository URL recorded in the metadata of documents read by `iter_source`.
+
+        Parameters
+        ----------
+        source : str
+            GitHub repository URL, path of a local archive, or path of a local git checkout or directory.
+        repo_url : str | None, optional
+            URL of the GitHub repository used for metadata, by default the source URL or
+            the `origin` remote of a local checkout.
+
+        Returns
+        -------
+        str
+            URL of the repository, or the absolute path of a local directory that has no remote.
+
+        Raises
+        ------
+        ValueError
+            if no repo_url is given for a local archive
+        """
+        path = Path(source)
+        if path.is_dir():
+            remote_url = Loader._git_info(path)[0] if (path / '.git').exists() else None
+            repo_url = repo_url or remote_url or path.resolve().as_posix()
+        elif path.is_file() and source.endswith(Loader.ARCHIVE_SUFFIXES):
+            if not repo_url:
+                raise ValueError('repo_url is required when loading from a local archive.')
+        else:
+            repo_url = repo_url or source
+        return repo_url.rstrip('/')
+
+    @staticmethod
+    def iter_source(
+        source: str,
+        repo_url: str | None = None,
+        ref: str | None = None,
+        token: str | None = None,
+        file_filter: FileFilter | None = None,
+    ) -> Iterator[Document]:
+        """Reads every file of a repository from a single source and yields them as documents.
+
+        Parameters
+        ----------
+        source : str
+            GitHub repository URL (streamed as one tarball), path of a local .tar/.tar.gz/.tgz/.zip
+            archive, or path of a local git checkout or directory.
+        repo_url : str | None, optional
+            URL of the GitHub repository used for metadata, by default the source URL or
+            the `origin` remote of a local checkout.
+        ref : str | None, optional
+            Branch, tag or commit to read, by default the default branch ('main' in file urls).
+        token : str | None, optional
+            GitHub authentication token, by default None.
+        file_filter : FileFilter | None, optional
+            Filter of files not worth indexing, by default None. Rules of `.gitignore` and
+            `.gitattributes` files apply to the entries read after them; directories and GitHub
+            archives list them before the other files of their directory.
+
+        Yields
+        ------
+        Document
+            Documents with the same `file_name`/`full_url`/`repo_url`/`sha` metadata as `Loader.load`.
+        """
+        path = Path(source)
+
+        if path.is_dir():
+            remote_url, branch = Loader._git_info(path) if (path / '.git').exists() else (None, None)
+            repo_url = repo_url or remote_url or path.resolve().as_posix()
+            ref = ref or branch or 'main'
+            files = Loader._iter_directory(path)
+
+        elif path.is_file() and source.endswith(Loader.ARCHIVE_SUFFIXES):
+            if not repo_url:
+                raise ValueError('repo_url is required when loading from a local archive.')
+
+            if source.endswith('.zip'):
+                files = Loader._iter_zip(path)
+            else:
+                files = Loader._iter_tar_file(path)
+
+        else:
+            repo_url = (repo_url or source).rstrip('/')
+            repo_name = source.rstrip('/').split('github.com/')[-1]
+            archive_url = f'{Loader.GITHUB_API}{repo_name}/tarball/{ref or ""}'.rstrip('/')
+
+            response = Loader._get_session().get(
+                archive_url,
+                headers={'Authorization': f'token {token or Loader.token}'} if token or Loader.token else {},
+                stream=True,
+            )
+            if response.status_code != 200:
+                logger.error(f'Error fetching archive: {archive_url} | Status: {response.status_code}')
+                return
+
+            files = Loader._iter_tar_response(response)
+
+        ref = ref or 'main'
+        repo_url = repo_url.rstrip('/')
+
+        for file_name, raw_content in files:
+            if file_filter is not None:
+                if FileFilter.is_rules_file(file_name):
+                    file_filter.add_rules(file_name, raw_content.decode('utf-8', errors='replace'))
+
+                if file_filter.check_path(file_name, len(raw_content)) or file_filter.check_content(
+                    file_name, raw_content
+                ):
+                    continue
+
+            content = Loader._decode(raw_content)
+            if not content:
+                continue
+
+            yield Document(
+                page_content=content,
+                metadata={
+                    'file_name': file_name,
+                    'full_url': f'{repo_url}/blob/{ref}/{file_name}',
+                    'repo_url': repo_url,
+                    'sha': Loader.blob_sha(raw_content),
+                },
+            )
+
+    @staticmethod
+    def load_and_split_source(
+        source: str,
+        splitter: TextSplitter,
+        repo_url: str | None = None,
+        ref: str | None = None,
+        token: str | None = None,
+    ) -> list[Document]:
+        """Reads a repository from a single source and splits each file as soon as it is read.
+
+        Parameters
+        ----------
+        source : str
+            GitHub repository URL, local archive or local directory, see `Loader.iter_source`.
+        splitter : TextSplitter
+            TextSplitter instance used to divide documents into smaller chunks.
+        repo_url : str | None, optional
+            URL of the GitHub repository used for metadata, by default None.
+        ref : str | None, optional
+            Branch, tag or commit to read, by default None.
+        token : str | None, optional
+            GitHub authentication token, by default None.
+
+        Returns
+        -------
+        list of Document
+            List of split Document objects.
+        """
+        file_docs = []
+        for file_doc in Loader.iter_source(source, repo_url, ref, token):
+            file_docs += Loader.split(file_doc, splitter)
+
+        return file_docs
@@ -0,0 +1,205 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    Embeddings of a sentence-transformers model computed on the CPU, with PyTorch or ONNX Runtime.
+
+    Documents are sorted by length and grouped into batches of similar length, bounded by
+    `batch_size` texts and `batch_tokens` padded tokens, so little compute is spent on padding.
+    Queries are batched dynamically: concurrent `embed_query` calls arriving within `max_wait`
+    seconds of each other are embedded in one forward pass.
+
+    The model is loaded on first use. With `quantize`, its linear layers run with dynamic int8
+    quantization (`torch.quantization.quantize_dynamic`, or an ONNX model quantized by ONNX
+    Runtime), which is several times faster on CPUs at a small cost in accuracy. Embeddings are
+    L2-normalized, so inner products are cosine similarities.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        dimensions: int | None = None,
+        runtime: str = 'torch',
+        quantize: bool = False,
+        threads: int = 0,
+        batch_size: int = 64,
+        batch_tokens: int = 16384,
+        max_wait: float = 0.005,
+        models_path: str | Path = 'cache/models',
+    ):
+        if runtime not in ('torch', 'onnx'):
+            raise ValueError(f"Unknown runtime {runtime}, use 'torch' or 'onnx'.")
+
+        self.model = model
+        self.dimensions = dimensions
+        self.runtime = runtime
+        self.quantize = quantize
+        self.threads = threads
+        self.batch_size = batch_size
+        self.batch_tokens = batch_tokens
+        self.max_wait = max_wait
+        self.models_path = Path(models_path)
+
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._encode_lock = threading.Lock()
+        self._queries: queue.Queue[tuple[str, Future]] = queue.Queue()
+        self._worker: threading.Thread | None = None
+
+    @property
+    def dimension(self) -> int:
+        """Dimension of the embeddings."""
+        return self._load().get_sentence_embedding_dimension()
+
+    def _load(self):
+        """Loads the model on first use."""
+        if self._model is not None:
+            return self._model
+
+        with self._load_lock:
+            if self._model is None:
+                self._model = self._load_model()
+        return self._model
+
+    def _load_model(self):
+        """Loads the model for the configured runtime, quantizing it if requested."""
+        # Imported here, so that stores embedded with the OpenAI API do not pay for loading PyTorch.
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if self.threads:
+            torch.set_num_threads(self.threads)
+
+        logger.info(f'Loading embedding model {self.model} ({self.runtime}{", int8" if self.quantize else ""})...')
+        if self.runtime == 'torch':
+            model = SentenceTransformer(self.model, device='cpu', truncate_dim=self.dimensions)
+            if self.quantize:
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            return model
+
+        import onnxruntime
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        session_options = onnxruntime.SessionOptions()
+        if self.threads:
+            session_options.intra_op_num_threads = self.threads
+        model_kwargs = {'provider': 'CPUExecutionProvider', 'session_options': session_options}
+
+        if not self.quantize:
+            return SentenceTransformer(
+                self.model, device='cpu', backend='onnx', truncate_dim=self.dimensions, model_kwargs=model_kwargs
+            )
+
+        quantized_name = 'onnx/model_qint8_avx2.onnx'
+        model_path = self.models_path / self.model.replace('/', '--')
+        if not (model_path / quantized_name).exists():
+            model = SentenceTransformer(self.model, device='cpu', backend='onnx')
+            model.save(str(model_path))
+            export_dynamic_quantized_onnx_model(model, 'avx2', str(model_path))
+        return SentenceTransformer(
+            str(model_path),
+            device='cpu',
+            backend='onnx',
+            truncate_dim=self.dimensions,
+            model_kwargs={**model_kwargs, 'file_name': quantized_name},
+        )
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        """Embeds one batch of texts."""
+        model = self._load()
+        with self._encode_lock:
+            return model.encode(
+                texts,
+                batch_size=len(texts),
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+
+    def _batches(self, texts: list[str]) -> list[list[int]]:
+        """Groups text positions, longest first, into batches of similar length within the batch limits."""
+        max_tokens = self._load().max_seq_length
+        lengths = [min(len(text) // 4 + 1, max_tokens) for text in texts]
+
+        batches, batch = [], []
+        for i in sorted(range(len(texts)), key=lambda i: -lengths[i]):
+            if batch and (len(batch) >= self.batch_size or (len(batch) + 1) * lengths[batch[0]] > self.batch_tokens):
+                batches.append(batch)
+                batch = []
+            batch.append(i)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeds texts in length-sorted batches.
+
+        Parameters
+        ----------
+        texts : list[str]
+            Texts to embed.
+
+        Returns
+        -------
+        list[list[float]]
+            Embeddings in the order of the texts.
+        """
+        embeddings: list[list[float] | None] = [None] * len(texts)
+        for batch in self._batches(texts):
+            for i, vector in zip(batch, self._encode([texts[i] for i in batch])):
+                embeddings[i] = vector.tolist()
+        return embeddings
+
+    def _serve_queries(self) -> None:
+        """Embeds queued queries, batching those that arrive within `max_wait` of the first one."""
+        while True:
+            batch = [self._queries.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queries.get(timeout=self.max_wait))
+            except queue.Empty:
+                pass
+
+            try:
+                vectors = self._encode([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector.tolist())
+
+    def embed_query(self, text: str) -> list[float]:
+        """
+        Embeds a query, together with concurrent queries.
+
+        Parameters
+        ----------
+        text : str
+            Query text.
+
+        Returns
+        -------
+        list[float]
+            Embedding of the query.
+        """
+        with self._load_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._serve_queries, name='local-embeddings', daemon=True)
+                self._worker.start()
+
+        future = Future()
+        self._queries.put((text, future))
+        return future.result()
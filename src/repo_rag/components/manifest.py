@@ -0,0 +1,160 @@
+import json
+import os
+from pathlib import Path
+
+
+class Manifest:
+    """
+    Index manifest stored next to a vectorstore.
+
+    Maps repository URL -> file path -> blob SHA and ids of the chunks embedded for that
+    file version. A file's SHA is only recorded once all of its chunks are committed, so a
+    build interrupted in the middle of a file re-indexes that file on the next run.
+
+    Changes are also recorded as operations, so they can be appended to the vectorstore's
+    `SegmentLog` together with the commit they belong to and replayed with `apply`.
+    """
+
+    FILE_NAME = 'manifest.json'
+
+    def __init__(self, path: str | Path, repos: dict[str, dict[str, dict]] | None = None):
+        self.path = Path(path)
+        self.repos = repos or {}
+        self._ops: list[list] = []
+
+    @classmethod
+    def load(cls, vectorstore_path: str | Path) -> 'Manifest':
+        """
+        Loads the manifest of a vectorstore, or returns an empty one if it does not exist.
+
+        Parameters
+        ----------
+        vectorstore_path : str | Path
+            Directory of the vectorstore.
+
+        Returns
+        -------
+        Manifest
+            Loaded manifest.
+        """
+        path = Path(vectorstore_path) / cls.FILE_NAME
+        if not path.exists():
+            return cls(path)
+
+        with path.open('r', encoding='utf-8') as f:
+            return cls(path, json.load(f)['repos'])
+
+    def exists(self) -> bool:
+        """Checks whether the manifest has been saved."""
+        return self.path.exists()
+
+    def save(self, path: str | Path | None = None) -> None:
+        """
+        Writes the manifest atomically, so readers never see a partially written file.
+
+        Parameters
+        ----------
+        path : str | Path | None, optional
+            Path to write the manifest to instead of its own, by default None.
+        """
+        path = Path(path or self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        with tmp_path.open('w', encoding='utf-8') as f:
+            json.dump({'repos': self.repos}, f)
+        os.replace(tmp_path, path)
+
+    def pending(self) -> list[list]:
+        """Returns the operations recorded since the last call, as JSON-serializable lists."""
+        ops, self._ops = self._ops, []
+        return ops
+
+    def apply(self, ops: list[list]) -> None:
+        """
+        Replays operations returned by `pending`, without recording them again.
+
+        Parameters
+        ----------
+        ops : list[list]
+            Operations as `[method name, *arguments]`.
+        """
+        pending = self._ops
+        for name, *args in ops:
+            getattr(self, name)(*args)
+        self._ops = pending
+
+    def shas(self, repo_url: str) -> dict[str, str]:
+        """
+        Returns blob SHAs of the completely indexed files of a repository.
+
+        Parameters
+        ----------
+        repo_url : str
+            URL of the GitHub repository.
+
+        Returns
+        -------
+        dict[str, str]
+            Blob SHA by file name.
+        """
+        files = self.repos.get(repo_url, {})
+        return {file_name: entry['sha'] for file_name, entry in files.items() if entry['sha']}
+
+    def get(self, repo_url: str, file_name: str) -> dict | None:
+        """Returns the manifest entry (`sha` and `chunk_ids`) of a file, or None if it is not indexed."""
+        return self.repos.get(repo_url, {}).get(file_name)
+
+    def files(self, repo_url: str) -> list[str]:
+        """Returns names of all files of the repository present in the manifest."""
+        return list(self.repos.get(repo_url, {}))
+
+    def add_chunks(self, repo_url: str, file_name: str, chunk_ids: list[str]) -> None:
+        """
+        Records committed chunks of a file whose SHA is not confirmed yet.
+
+        Parameters
+        ----------
+        repo_url : str
+            URL of the GitHub repository.
+        file_name : str
+            Path of the file relative to the repository root.
+        chunk_ids : list[str]
+            Ids of the committed chunks.
+        """
+        chunk_ids = list(chunk_ids)
+        entry = self.repos.setdefault(repo_url, {}).setdefault(file_name, {'sha': None, 'chunk_ids': []})
+        entry['chunk_ids'].extend(chunk_id for chunk_id in chunk_ids if chunk_id not in entry['chunk_ids'])
+        self._ops.append(['add_chunks', repo_url, file_name, chunk_ids])
+
+    def complete(self, repo_url: str, file_name: str, sha: str) -> None:
+        """Marks all chunks of the file version with the given SHA as committed."""
+        entry = self.repos.setdefault(repo_url, {}).setdefault(file_name, {'sha': None, 'chunk_ids': []})
+        entry['sha'] = sha
+        self._ops.append(['complete', repo_url, file_name, sha])
+
+    def remove_files(self, repo_url: str, file_names: list[str]) -> list[str]:
+        """
+        Removes files from the manifest.
+
+        Parameters
+        ----------
+        repo_url : str
+            URL of the GitHub repository.
+        file_names : list[str]
+            Paths of the removed files.
+
+        Returns
+        -------
+        list[str]
+            Ids of the chunks of the removed files.
+        """
+        files = self.repos.get(repo_url, {})
+        self._ops.append(['remove_files', repo_url, list(file_names)])
+
+        chunk_ids = []
+        for file_name in file_names:
+            entry = files.pop(file_name, None)
+            if entry:
+                chunk_ids.extend(entry['chunk_ids'])
+
+        return chunk_ids
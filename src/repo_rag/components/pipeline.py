@@ -0,0 +1,161 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
+
+from langchain.text_splitter import TextSplitter
+from langchain_core.documents import Document
+
+from repo_rag.components.loader import Loader
+from repo_rag.components.vectorstore import FileTracker, Vectorstore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+_DONE = object()
+
+
+class IngestionPipeline:
+    """
+    A streaming ingestion pipeline: fetch -> split -> embed batch -> FAISS add.
+
+    Every stage runs in its own thread and hands work to the next one through a bounded
+    queue. A slow stage blocks the stages upstream of it (backpressure), so all stages stay
+    busy at the same time while memory use is bounded by the queue sizes, not the repo size.
+    Up to `queue_size` embedding batches are in flight at once, each throttled by the
+    rate limiter of the OpenAI embeddings of the vectorstore (see `Vectorstore.embeddings`).
+    """
+
+    def __init__(self, vectorstore: Vectorstore, splitter: TextSplitter, batch_size: int, queue_size: int = 4):
+        self.vectorstore = vectorstore
+        self.splitter = splitter
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+
+        self._stop = threading.Event()
+        self._errors: list[BaseException] = []
+
+    def _put(self, target: queue.Queue, item) -> None:
+        """Puts an item on a bounded queue, giving up when another stage has failed."""
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, source: queue.Queue):
+        """Takes an item from a queue, returning `_DONE` when another stage has failed."""
+        while not self._stop.is_set():
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _stage(self, name: str, work: Callable[[], None]) -> threading.Thread:
+        """Starts a stage thread, stopping the whole pipeline if it raises."""
+
+        def run():
+            try:
+                work()
+            except BaseException as e:
+                logger.error(f'Ingestion stage {name} failed: {e}')
+                self._errors.append(e)
+                self._stop.set()
+
+        thread = threading.Thread(target=run, name=f'ingestion-{name}', daemon=True)
+        thread.start()
+        return thread
+
+    def run(self, file_docs: Iterable[Document]) -> tuple[int, int]:
+        """
+        Streams file documents through the pipeline into the vectorstore.
+
+        Parameters
+        ----------
+        file_docs : Iterable[Document]
+            Whole-file documents, typically a generator fetching them lazily.
+
+        Returns
+        -------
+        tuple[int, int]
+            Number of chunks added to and removed from the vectorstore.
+
+        Raises
+        ------
+        RuntimeError
+            if any of the stages failed
+        """
+        vectorstore = self.vectorstore.load_for_commit()
+
+        tracker = FileTracker(vectorstore)
+
+        files_queue = queue.Queue(maxsize=self.queue_size)
+        chunks_queue = queue.Queue(maxsize=self.batch_size)
+        batches_queue = queue.Queue(maxsize=self.queue_size)
+        added = []
+
+        def fetch():
+            for file_doc in file_docs:
+                if self._stop.is_set():
+                    return
+                self._put(files_queue, file_doc)
+            self._put(files_queue, _DONE)
+
+        def split():
+            while (file_doc := self._get(files_queue)) is not _DONE:
+                chunks = Loader.split(file_doc, self.splitter)
+                tracker.register(chunks)
+                for chunk in chunks:
+                    self._put(chunks_queue, chunk)
+            self._put(chunks_queue, _DONE)
+
+        def embed_batch(batch: list[Document]) -> tuple[list[Document], list[Document], list[list[float]] | None]:
+            new_batch = [doc for doc in batch if doc.id not in tracker.existing_ids]
+            embeddings = None
+            if new_batch:
+                embeddings = self.vectorstore.embeddings.embed_documents([doc.page_content for doc in new_batch])
+            return batch, new_batch, embeddings
+
+        def embed():
+            batch = []
+            with ThreadPoolExecutor(max_workers=self.queue_size, thread_name_prefix='ingestion-embed') as executor:
+                while True:
+                    chunk = self._get(chunks_queue)
+                    if chunk is not _DONE:
+                        batch.append(chunk)
+
+                    if batch and (chunk is _DONE or len(batch) == self.batch_size):
+                        self._put(batches_queue, executor.submit(embed_batch, batch))
+                        batch = []
+
+                    if chunk is _DONE:
+                        break
+                self._put(batches_queue, _DONE)
+
+        def index():
+            while (item := self._get(batches_queue)) is not _DONE:
+                batch, new_batch, embeddings = item.result()
+                embedded_ids = {doc.id: vector for doc, vector in zip(new_batch, embeddings or [])}
+                vectors = [embedded_ids.get(doc.id) for doc in batch] if embeddings else None
+
+                added.append(self.vectorstore.commit(vectorstore, batch, tracker, vectors))
+                logger.info(f'Added {added[-1]} documents to vectorstore. ({sum(added)} in total)')
+
+        threads = [
+            self._stage('fetch', fetch),
+            self._stage('split', split),
+            self._stage('embed', embed),
+            self._stage('index', index),
+        ]
+        for thread in threads:
+            thread.join()
+
+        if self._errors:
+            raise RuntimeError('Ingestion pipeline failed') from self._errors[0]
+
+        self.vectorstore.remove_stale(vectorstore, tracker)
+        return sum(added), tracker.removed
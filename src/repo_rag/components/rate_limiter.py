@@ -0,0 +1,256 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tiktoken
+from langchain_core.embeddings import Embeddings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    A token-bucket limiter enforcing tokens-per-minute and requests-per-minute budgets.
+
+    Both buckets refill continuously. A rate-limit response pauses every caller until its
+    `Retry-After` has passed and lowers the effective budget, which then recovers gradually
+    with each successful request.
+    """
+
+    MIN_SCALE = 0.5
+
+    def __init__(self, tpm: int, rpm: int):
+        self.tpm = tpm
+        self.rpm = rpm
+
+        self._lock = threading.Lock()
+        self._tokens = float(tpm)
+        self._requests = float(rpm)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._scale = 1.0
+
+        self.throttled_seconds = 0.0
+        self.rate_limited = 0
+
+    def _refill(self, now: float) -> None:
+        """Adds budget accumulated since the last update. Must be called with the lock held."""
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.tpm * self._scale, self._tokens + elapsed * self.tpm * self._scale / 60)
+        self._requests = min(self.rpm * self._scale, self._requests + elapsed * self.rpm * self._scale / 60)
+
+    def acquire(self, tokens: int) -> None:
+        """
+        Blocks until a request of the given size fits into both budgets, then consumes it.
+
+        Parameters
+        ----------
+        tokens : int
+            Number of tokens the request will use. Requests larger than the whole
+            per-minute budget wait for a full bucket.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                needed_tokens = min(tokens, self.tpm * self._scale)
+                if now >= self._blocked_until and self._tokens >= needed_tokens and self._requests >= 1:
+                    self._tokens -= needed_tokens
+                    self._requests -= 1
+                    return
+
+                wait = max(
+                    self._blocked_until - now,
+                    (needed_tokens - self._tokens) * 60 / (self.tpm * self._scale),
+                    (1 - self._requests) * 60 / (self.rpm * self._scale),
+                    0.01,
+                )
+                self.throttled_seconds += wait
+
+            time.sleep(wait)
+
+    def penalize(self, retry_after: float) -> None:
+        """
+        Reacts to a rate-limit response: pauses all callers and lowers the budget.
+
+        Parameters
+        ----------
+        retry_after : float
+            Seconds to wait before sending the next request.
+        """
+        with self._lock:
+            self.rate_limited += 1
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            self._scale = max(RateLimiter.MIN_SCALE, self._scale * 0.9)
+            self._tokens = min(self._tokens, 0.0)
+
+    def reward(self) -> None:
+        """Slowly restores the budget after a successful request."""
+        with self._lock:
+            self._scale = min(1.0, self._scale * 1.01)
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that keeps several requests in flight within TPM/RPM budgets.
+
+    Texts are grouped into requests by count and token size, the tokens of each request are
+    counted with the model's tokenizer and charged against the `RateLimiter`, and up to
+    `max_in_flight` requests run concurrently. Rate-limit errors (HTTP 429) are retried after
+    the server's `Retry-After`, pausing all other requests meanwhile.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        limiter: RateLimiter,
+        max_in_flight: int = 8,
+        max_request_texts: int = 256,
+        max_request_tokens: int = 100_000,
+        max_retries: int = 6,
+    ):
+        self.embeddings = embeddings
+        self.limiter = limiter
+        self.max_in_flight = max_in_flight
+        self.max_request_texts = max_request_texts
+        self.max_request_tokens = max_request_tokens
+        self.max_retries = max_retries
+
+        model = getattr(embeddings, 'tiktoken_model_name', None) or getattr(embeddings, 'model', None)
+        try:
+            try:
+                self._encoding = tiktoken.encoding_for_model(model)
+            except (KeyError, TypeError):
+                self._encoding = tiktoken.get_encoding('cl100k_base')
+        except Exception as e:
+            logger.warning(f'Could not load tokenizer, estimating token counts from text length: {e}')
+            self._encoding = None
+
+        self.requests = 0
+        self.tokens = 0
+
+    @property
+    def model(self) -> str | None:
+        """Name of the wrapped embedding model."""
+        return getattr(self.embeddings, 'model', None)
+
+    def count_tokens(self, text: str) -> int:
+        """Counts the tokens of a text with the model's tokenizer."""
+        if self._encoding is None:
+            return len(text) // 4 + 1
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    @staticmethod
+    def _status_code(error: Exception) -> int | None:
+        """Returns the HTTP status code of an API error, if any."""
+        return getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        """Checks whether an error is a server or connection error worth retrying."""
+        status_code = RateLimitedEmbeddings._status_code(error)
+        if status_code is not None:
+            return status_code >= 500
+        return type(error).__name__ in ('APIConnectionError', 'APITimeoutError')
+
+    @staticmethod
+    def _retry_after(error: Exception) -> float | None:
+        """Returns the delay requested by a rate-limit error, or None if the error is not one."""
+        if RateLimitedEmbeddings._status_code(error) != 429:
+            return None
+
+        response = getattr(error, 'response', None)
+
+        headers = getattr(response, 'headers', None) or {}
+        try:
+            return float(headers.get('retry-after-ms')) / 1000
+        except (TypeError, ValueError):
+            pass
+        try:
+            return float(headers.get('retry-after'))
+        except (TypeError, ValueError):
+            return 1.0
+
+    def _requests(self, texts: list[str]) -> list[tuple[int, int, int]]:
+        """Groups texts into requests, returning (start, end, tokens) of each one."""
+        requests, start, tokens = [], 0, 0
+        for i, text in enumerate(texts):
+            text_tokens = self.count_tokens(text)
+            if i > start and (i - start >= self.max_request_texts or tokens + text_tokens > self.max_request_tokens):
+                requests.append((start, i, tokens))
+                start, tokens = i, 0
+            tokens += text_tokens
+
+        if start < len(texts):
+            requests.append((start, len(texts), tokens))
+        return requests
+
+    def _embed_request(self, texts: list[str], tokens: int) -> list[list[float]]:
+        """Sends a single request within the budget, retrying on rate-limit and transient errors."""
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(tokens)
+            try:
+                embeddings = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                retry_after = self._retry_after(e)
+                if attempt == self.max_retries or (retry_after is None and not self._is_transient(e)):
+                    raise
+
+                if retry_after is None:
+                    logger.warning(f'Embedding request failed: {e}. Retrying in {2**attempt} seconds...')
+                    time.sleep(2**attempt)
+                else:
+                    logger.warning(f'Embedding rate limit reached. Retrying in {retry_after:.1f} seconds...')
+                    self.limiter.penalize(retry_after)
+                continue
+
+            self.limiter.reward()
+            self.requests += 1
+            self.tokens += tokens
+            return embeddings
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeds texts with up to `max_in_flight` concurrent requests.
+
+        Parameters
+        ----------
+        texts : list[str]
+            Texts to embed.
+
+        Returns
+        -------
+        list[list[float]]
+            Embeddings in the order of the texts.
+        """
+        requests = self._requests(texts)
+        if len(requests) <= 1:
+            return [
+                vector for start, end, tokens in requests for vector in self._embed_request(texts[start:end], tokens)
+            ]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(requests))) as executor:
+            results = executor.map(
+                lambda request: self._embed_request(texts[request[0] : request[1]], request[2]), requests
+            )
+            return [vector for result in results for vector in result]
+
+    def embed_query(self, text: str) -> list[float]:
+        """
+        Embeds a query, charging it against the same budget.
+
+        Parameters
+        ----------
+        text : str
+            Query text.
+
+        Returns
+        -------
+        list[float]
+            Query embedding.
+        """
+        return self._embed_request([text], self.count_tokens(text))[0]
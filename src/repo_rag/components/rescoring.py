@@ -0,0 +1,565 @@
+import logging
+import operator
+import threading
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
+
+from repo_rag.components.constants import FILE_SEARCH_FACTOR, RESCORE_FACTOR
+from repo_rag.components.file_map import FileMap
+from repo_rag.components.lexical import LexicalIndex
+from repo_rag.components.symbols import SymbolIndex
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ExactVectors:
+    """
+    Full-precision copies of the vectors of a compressed (scalar or product quantized) index.
+
+    The snapshot is a float32 `vectors.npy` in index order that is memory-mapped on load, so it
+    stays on disk and only the rows of search candidates are read. Vectors added since the
+    snapshot are kept in memory, and removals shift positions down like the index does.
+    """
+
+    FILE_NAME = 'vectors.npy'
+
+    def __init__(self, dimension: int, vectors: np.ndarray | None = None):
+        self.dimension = dimension
+        self.vectors = vectors if vectors is not None else np.zeros((0, dimension), dtype=np.float32)
+        self._added: list[np.ndarray] = []
+        self._rows: np.ndarray | None = None
+
+    @classmethod
+    def exists(cls, vectorstore_path: str | Path) -> bool:
+        """Checks whether a vectorstore has a snapshot of exact vectors."""
+        return (Path(vectorstore_path) / cls.FILE_NAME).exists()
+
+    @classmethod
+    def load(cls, vectorstore_path: str | Path) -> 'ExactVectors':
+        """Maps the snapshot of exact vectors of a vectorstore."""
+        vectors = np.load(Path(vectorstore_path) / cls.FILE_NAME, mmap_mode='r')
+        return cls(vectors.shape[1], vectors)
+
+    @classmethod
+    def from_index(cls, index: faiss.Index) -> 'ExactVectors':
+        """Copies the vectors of an index that stores them exactly, such as a flat index."""
+        return cls(index.d, index.reconstruct_n(0, index.ntotal) if index.ntotal else None)
+
+    def __len__(self) -> int:
+        if self._rows is not None:
+            return len(self._rows)
+        return len(self.vectors) + sum(len(vectors) for vectors in self._added)
+
+    def add(self, vectors: np.ndarray) -> None:
+        """Appends vectors, in the order they are added to the index."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        if self._rows is not None:
+            start = len(self.vectors) + sum(len(added) for added in self._added)
+            self._rows = np.concatenate([self._rows, np.arange(start, start + len(vectors))])
+        self._added.append(vectors)
+
+    def remove(self, positions: list[int]) -> None:
+        """Removes the vectors at the given positions, shifting the following ones down."""
+        if self._rows is None:
+            self._rows = np.arange(len(self))
+        self._rows = np.delete(self._rows, np.asarray(positions, dtype=np.int64))
+
+    def get(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Returns the vectors at the given positions.
+
+        Parameters
+        ----------
+        positions : np.ndarray
+            Positions in the index.
+
+        Returns
+        -------
+        np.ndarray
+            float32 array of shape (len(positions), dimension).
+        """
+        rows = np.asarray(positions, dtype=np.int64)
+        if self._rows is not None:
+            rows = self._rows[rows]
+
+        vectors = np.empty((len(rows), self.dimension), dtype=np.float32)
+        on_disk = rows < len(self.vectors)
+        vectors[on_disk] = self.vectors[rows[on_disk]]
+        if not on_disk.all():
+            if len(self._added) > 1:
+                self._added = [np.concatenate(self._added)]
+            vectors[~on_disk] = self._added[0][rows[~on_disk] - len(self.vectors)]
+        return vectors
+
+    def write(self, vectorstore_path: str | Path, prefix: str = '', batch_size: int = 65536) -> None:
+        """Writes all vectors in index order as a snapshot, prefixing the file name."""
+        path = Path(vectorstore_path) / f'{prefix}{ExactVectors.FILE_NAME}'
+        total = len(self)
+        snapshot = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(total, self.dimension))
+        for start in range(0, total, batch_size):
+            end = min(start + batch_size, total)
+            snapshot[start:end] = self.get(np.arange(start, end))
+        snapshot.flush()
+        del snapshot
+
+
+class RescoredFAISS(FAISS):
+    """
+    A FAISS vectorstore re-scoring search candidates of a compressed index with exact vectors.
+
+    The index (e.g. `SQfp16`, `SQ8` or `PQ64`) only holds compressed codes. Searches fetch
+    `rescore_factor` times as many candidates from it and rank them by their exact similarity
+    computed from `ExactVectors`, and MMR uses the exact vectors instead of lossy reconstructions.
+    Without exact vectors it searches like `FAISS`. MMR selection is vectorized for every index type,
+    see `mmr`, and can diversify results by file.
+
+    Added and deleted documents are kept in sync with a `LexicalIndex` of their texts, searched
+    by `lexical_search`, a `SymbolIndex` of the definitions in their metadata, looked up by
+    `lookup_symbol`, and a `FileMap` of their files, by which `file_search_by_vector` groups results.
+
+    `search_lock` guards the index while retrievers set their search parameters and search it,
+    so searches of different vectorstores (e.g. the shards of a `ShardedVectorstore`) run in parallel.
+    """
+
+    def __init__(
+        self,
+        *args,
+        exact_vectors: ExactVectors | None = None,
+        lexical_index: LexicalIndex | None = None,
+        symbol_index: SymbolIndex | None = None,
+        file_map: FileMap | None = None,
+        rescore_factor: int = RESCORE_FACTOR,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.exact_vectors = exact_vectors
+        self.lexical_index = lexical_index
+        self.symbol_index = symbol_index
+        self.file_map = file_map
+        self.rescore_factor = rescore_factor
+        self.search_lock = threading.Lock()
+
+    def add_embeddings(
+        self,
+        text_embeddings: Iterable[tuple[str, list[float]]],
+        metadatas: list[dict] | None = None,
+        ids: list[str] | None = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        """
+        Adds embeddings to the index, the lexical index, the symbol table, the file map and, for compressed
+        indexes, to the exact vectors.
+        """
+        text_embeddings = list(text_embeddings)
+        ids = super().add_embeddings(text_embeddings, metadatas=metadatas, ids=ids, **kwargs)
+        if self.lexical_index is not None:
+            self.lexical_index.add(ids, [text for text, _ in text_embeddings])
+        if self.symbol_index is not None:
+            self.symbol_index.add(ids, metadatas or [{}] * len(ids))
+        if self.file_map is not None:
+            self.file_map.add(metadatas or [{}] * len(ids))
+        if self.exact_vectors is not None and text_embeddings:
+            vectors = np.asarray([embedding for _, embedding in text_embeddings], dtype=np.float32)
+            if self._normalize_L2:
+                faiss.normalize_L2(vectors)
+            self.exact_vectors.add(vectors)
+        return ids
+
+    def _query_vectors(self, embeddings: list[list[float]] | np.ndarray) -> np.ndarray:
+        """Returns query embeddings as a float32 matrix, normalized if the index expects it."""
+        vectors = np.array(embeddings, dtype=np.float32).reshape(-1, self.index.d)
+        if self._normalize_L2:
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def _rescored_search(self, embedding: list[float], k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Searches the compressed index for candidates and returns the best k by exact score."""
+        return self._rescored_search_batch([embedding], k)[0]
+
+    def _rescored_search_batch(
+        self, embeddings: list[list[float]] | np.ndarray, k: int
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        """Searches the compressed index for the candidates of all embeddings at once and returns the best k of each."""
+        vectors = self._query_vectors(embeddings)
+        _, indices = self.index.search(vectors, k * self.rescore_factor)
+
+        results = []
+        for vector, row in zip(vectors, indices):
+            candidates = row[row >= 0]
+            exact = self.exact_vectors.get(candidates)
+            if self.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+                scores = exact @ vector
+                order = np.argsort(-scores, kind='stable')[:k]
+            else:
+                scores = ((exact - vector) ** 2).sum(axis=1)
+                order = np.argsort(scores, kind='stable')[:k]
+            results.append((scores[order], candidates[order]))
+        return results
+
+    def _similarity_search(self, embedding: list[float], k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the similarities and positions of the k nearest vectors, most similar first. L2 distances
+        are turned into cosine similarities, which they are equivalent to for normalized embeddings.
+        """
+        if self.exact_vectors is not None:
+            scores, positions = self._rescored_search(embedding, k)
+        else:
+            scores, indices = self.index.search(self._query_vectors([embedding]), k)
+            found = indices[0] >= 0
+            scores, positions = scores[0][found], indices[0][found]
+
+        if self.index.metric_type != faiss.METRIC_INNER_PRODUCT:
+            scores = 1 - scores / 2
+        return scores, positions
+
+    def _document(self, position: int) -> Document:
+        """Returns the document stored at an index position."""
+        doc_id = self.index_to_docstore_id[position]
+        doc = self.docstore.search(doc_id)
+        if not isinstance(doc, Document):
+            raise ValueError(f'Could not find document for id {doc_id}, got {doc}')
+        return doc
+
+    def lexical_search(self, query: str, k: int = 4) -> list[tuple[Document, float]]:
+        """
+        Returns the documents with the highest BM25 scores for a query, see `LexicalIndex`.
+
+        Parameters
+        ----------
+        query : str
+            Query text.
+        k : int, optional
+            Number of documents to return, by default 4.
+
+        Returns
+        -------
+        list[tuple[Document, float]]
+            Documents and their BM25 scores, best first, or no documents without a lexical index.
+        """
+        if self.lexical_index is None:
+            return []
+
+        docs = []
+        for doc_id, score in self.lexical_index.search(query, k):
+            doc = self.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                docs.append((doc, score))
+        return docs
+
+    def lookup_symbol(self, name: str) -> list[Document]:
+        """
+        Returns the chunks holding definitions of a symbol, see `SymbolIndex`.
+
+        Parameters
+        ----------
+        name : str
+            Exact name of the symbol.
+
+        Returns
+        -------
+        list[Document]
+            Chunks overlapping a definition of the symbol in file order, or none without a symbol table.
+        """
+        if self.symbol_index is None:
+            return []
+
+        docs = []
+        for doc_id, *_ in self.symbol_index.lookup(name):
+            doc = self.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                docs.append(doc)
+        return docs
+
+    def file_search_by_vector(
+        self, embedding: list[float], k: int = 4, aggregate: str = 'max', fetch_factor: int = FILE_SEARCH_FACTOR
+    ) -> list[tuple[Document, float]]:
+        """
+        Returns the files most similar to an embedding, represented by their most similar chunk.
+
+        The `fetch_factor * k` nearest chunks are grouped by the file ids of their positions, see
+        `FileMap`, and files are scored by the best (`'max'`) or the total (`'sum'`) similarity of
+        their chunks among them. The search is only widened, doubling the number of chunks, while
+        fewer than k distinct files come back. Documents are built for the returned files only.
+
+        Parameters
+        ----------
+        embedding : list[float]
+            Query embedding.
+        k : int, optional
+            Number of files to return, by default 4.
+        aggregate : str, optional
+            'max' or 'sum', by default 'max'.
+        fetch_factor : int, optional
+            Number of chunks to search per file at first, by default `FILE_SEARCH_FACTOR`.
+
+        Returns
+        -------
+        list[tuple[Document, float]]
+            The most similar chunk of every file and the file's score, best first, or none without a file map.
+
+        Raises
+        ------
+        ValueError
+            if the aggregation is not 'max' or 'sum'
+        """
+        if aggregate not in ('max', 'sum'):
+            raise ValueError(f"Aggregation {aggregate} is not supported, use 'max' or 'sum'.")
+
+        ntotal = self.index.ntotal
+        if self.file_map is None or not ntotal:
+            return []
+
+        fetch_k = min(k * fetch_factor, ntotal)
+        while True:
+            scores, positions = self._similarity_search(embedding, fetch_k)
+            # Results are sorted, so the first chunk of every file is its most similar one.
+            files, first, inverse = np.unique(self.file_map.get(positions), return_index=True, return_inverse=True)
+            if len(files) >= k or fetch_k >= ntotal:
+                break
+            fetch_k = min(fetch_k * 2, ntotal)
+
+        if aggregate == 'max':
+            file_scores = scores[first]
+        else:
+            file_scores = np.bincount(inverse.ravel(), weights=scores, minlength=len(files))
+        order = np.argsort(-file_scores, kind='stable')[:k]
+        return [(self._document(positions[first[i]]), float(file_scores[i])) for i in order]
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: Callable | dict[str, Any] | None = None,
+        fetch_k: int = 20,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        """
+        Returns the documents most similar to an embedding, ranked by their exact score.
+
+        Parameters
+        ----------
+        embedding : list[float]
+            Query embedding.
+        k : int, optional
+            Number of documents to return, by default 4.
+        filter : Callable | dict[str, Any] | None, optional
+            Metadata filter, by default None.
+        fetch_k : int, optional
+            Number of documents to fetch before filtering, by default 20.
+        **kwargs
+            `score_threshold` to drop less similar documents.
+
+        Returns
+        -------
+        list[tuple[Document, float]]
+            Documents and their scores.
+        """
+        if self.exact_vectors is None:
+            return super().similarity_search_with_score_by_vector(embedding, k, filter, fetch_k, **kwargs)
+
+        scores, indices = self._rescored_search(embedding, k if filter is None else fetch_k)
+        filter_func = self._create_filter_func(filter) if filter is not None else None
+
+        docs = []
+        for score, position in zip(scores, indices):
+            doc = self._document(position)
+            if filter_func is None or filter_func(doc.metadata):
+                docs.append((doc, float(score)))
+
+        score_threshold = kwargs.get('score_threshold')
+        if score_threshold is not None:
+            cmp = (
+                operator.ge
+                if self.distance_strategy in (DistanceStrategy.MAX_INNER_PRODUCT, DistanceStrategy.JACCARD)
+                else operator.le
+            )
+            docs = [(doc, score) for doc, score in docs if cmp(score, score_threshold)]
+        return docs[:k]
+
+    def similarity_search_with_score_by_vectors(
+        self, embeddings: list[list[float]] | np.ndarray, k: int = 4, **kwargs: Any
+    ) -> list[list[tuple[Document, float]]]:
+        """
+        Returns the documents most similar to each of several embeddings, searching the index once for all of them.
+
+        Parameters
+        ----------
+        embeddings : list[list[float]] | np.ndarray
+            Query embeddings.
+        k : int, optional
+            Number of documents to return per embedding, by default 4.
+        **kwargs
+            `filter`, `fetch_k` and `score_threshold` like `similarity_search_with_score_by_vector`.
+            Filtered or thresholded searches are run one embedding at a time.
+
+        Returns
+        -------
+        list[list[tuple[Document, float]]]
+            Documents and their scores for every embedding, in the order of the embeddings.
+        """
+        if kwargs.get('filter') is not None or kwargs.get('score_threshold') is not None:
+            return [self.similarity_search_with_score_by_vector(embedding, k, **kwargs) for embedding in embeddings]
+        if not len(embeddings):
+            return []
+
+        if self.exact_vectors is not None:
+            results = self._rescored_search_batch(embeddings, k)
+        else:
+            scores, indices = self.index.search(self._query_vectors(embeddings), k)
+            results = [(row_scores[row >= 0], row[row >= 0]) for row_scores, row in zip(scores, indices)]
+        return [
+            [(self._document(position), float(score)) for score, position in zip(scores, positions)]
+            for scores, positions in results
+        ]
+
+    def _candidate_vectors(self, positions: np.ndarray) -> np.ndarray:
+        """Returns the vectors of search candidates, exact ones if kept, otherwise read from the index in one call."""
+        if self.exact_vectors is not None:
+            return self.exact_vectors.get(positions)
+        return self.index.reconstruct_batch(np.asarray(positions, dtype=np.int64))
+
+    @staticmethod
+    def mmr(
+        query: np.ndarray,
+        vectors: np.ndarray,
+        k: int = 4,
+        lambda_mult: float = 0.5,
+        groups: np.ndarray | None = None,
+    ) -> list[int]:
+        """
+        Selects candidates by maximal marginal relevance of their cosine similarities.
+
+        The similarities of the candidates to the query and to each other are computed with one
+        matrix product each. The greedy selection keeps the highest similarity of every candidate
+        to the selected ones and only updates it with the row of the last selected candidate, so
+        every step is a vector operation over the candidates.
+
+        Parameters
+        ----------
+        query : np.ndarray
+            Query embedding.
+        vectors : np.ndarray
+            Vectors of the candidates.
+        k : int, optional
+            Number of candidates to select, by default 4.
+        lambda_mult : float, optional
+            Trade-off between similarity (1) and diversity (0), by default 0.5.
+        groups : np.ndarray | None, optional
+            Group of every candidate, e.g. its file id, by default None. Candidates are then selected
+            from groups without a selected candidate while there are any left, so every group is
+            represented once before any is represented twice.
+
+        Returns
+        -------
+        list[int]
+            Positions of the selected candidates in `vectors`, in the order of selection.
+        """
+        k = min(k, len(vectors))
+        if k <= 0:
+            return []
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        query = np.asarray(query, dtype=np.float32).ravel()
+        query_norm = np.linalg.norm(query)
+        if query_norm:
+            query = query / query_norm
+
+        relevance = vectors @ query
+        similarity = vectors @ vectors.T
+
+        selected = [int(np.argmax(relevance))]
+        available = np.ones(len(vectors), dtype=bool)
+        redundancy = np.full(len(vectors), -np.inf, dtype=np.float32)
+        while len(selected) < k:
+            available[selected[-1]] = False
+            if groups is not None:
+                available &= groups != groups[selected[-1]]
+                if not available.any():
+                    # Every group is represented, start over with the candidates not selected yet.
+                    available[:] = True
+                    available[selected] = False
+
+            redundancy = np.maximum(redundancy, similarity[selected[-1]])
+            scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+            scores[~available] = -np.inf
+            selected.append(int(np.argmax(scores)))
+        return selected
+
+    def max_marginal_relevance_search_with_score_by_vector(
+        self,
+        embedding: list[float],
+        *,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Callable | dict[str, Any] | None = None,
+        diversity: str = 'chunk',
+    ) -> list[tuple[Document, float]]:
+        """
+        Returns documents selected by maximal marginal relevance among the nearest candidates, see `mmr`.
+
+        Candidate vectors are the exact vectors of compressed indexes, or are read from the index
+        with `reconstruct_batch`, and documents are only built for the selected candidates.
+
+        Parameters
+        ----------
+        embedding : list[float]
+            Query embedding.
+        k : int, optional
+            Number of documents to return, by default 4.
+        fetch_k : int, optional
+            Number of candidates to select from, by default 20.
+        lambda_mult : float, optional
+            Trade-off between similarity (1) and diversity (0), by default 0.5.
+        filter : Callable | dict[str, Any] | None, optional
+            Metadata filter, by default None.
+        diversity : str, optional
+            'chunk' to diversify chunks by their similarity, or 'file' to also select chunks of
+            different files first (see `FileMap`), by default 'chunk'.
+
+        Returns
+        -------
+        list[tuple[Document, float]]
+            Documents and their scores.
+
+        Raises
+        ------
+        ValueError
+            if the diversity is not 'chunk' or 'file'
+        """
+        if diversity not in ('chunk', 'file'):
+            raise ValueError(f"Diversity {diversity} is not supported, use 'chunk' or 'file'.")
+
+        fetch_k = fetch_k if filter is None else fetch_k * 2
+        if self.exact_vectors is not None:
+            scores, positions = self._rescored_search(embedding, fetch_k)
+        else:
+            scores, indices = self.index.search(self._query_vectors([embedding]), fetch_k)
+            found = indices[0] >= 0
+            scores, positions = scores[0][found], indices[0][found]
+
+        if filter is not None:
+            filter_func = self._create_filter_func(filter)
+            keep = [i for i, position in enumerate(positions) if filter_func(self._document(position).metadata)]
+            scores, positions = scores[keep], positions[keep]
+        if not len(positions):
+            return []
+
+        groups = self.file_map.get(positions) if diversity == 'file' and self.file_map is not None else None
+        selected = RescoredFAISS.mmr(
+            np.asarray(embedding, dtype=np.float32),
+            self._candidate_vectors(positions),
+            k=k,
+            lambda_mult=lambda_mult,
+            groups=groups,
+        )
+        return [(self._document(positions[i]), float(scores[i])) for i in selected]
@@ -1,7 +1,13 @@
-from repo_rag.components.vectorstore import Vectorstore
+from repo_rag.components.constants import SEARCH_PARAMS
+from repo_rag.components.sharded_store import ShardedRetriever
+from repo_rag.components.store_pool import vectorstore_pool
 
 
-vectorstore = Vectorstore(1)
-vectorstore.create()
-vectorstore = vectorstore.load()
-retriever = vectorstore.as_retriever(search_type='similarity', search_kwargs={'k': 10})
+# Follows the published vectorstore version, see `StoreVersions`. Hybrid search matches identifiers
+# of the question lexically, without an extra LLM call to extract them.
+retriever = ShardedRetriever(
+    pool=vectorstore_pool,
+    search_params=SEARCH_PARAMS,
+    search_type='hybrid',
+    search_kwargs={'k': 10, 'fetch_k': 50},
+)
@@ -0,0 +1,229 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SegmentLog:
+    """
+    Append-only write-ahead log of vectorstore commits, stored next to the FAISS snapshot.
+
+    Every commit appends one JSON line to `wal.jsonl` holding the deleted ids, the added
+    documents and manifest operations, with the added vectors written to a `.npy` segment
+    beforehand. Both are fsynced, so a committed batch costs O(batch) and survives a crash,
+    while a torn last line of an interrupted write is discarded. Loading replays the log on
+    top of the snapshot, and compaction folds it into a new snapshot.
+
+    Only writers modify the files: `append` and `compact` finish an interrupted compaction and
+    truncate a torn last line, while readers ignore a torn last line, so processes serving a
+    store never change it while another process commits to it.
+    """
+
+    FILE_NAME = 'wal.jsonl'
+    SEGMENTS_DIR = 'segments'
+    MARKER_NAME = 'COMPACTING'
+    STAGED_PREFIX = 'compact.'
+
+    COMPACT_MIN_BYTES = 64 * 1024**2
+    COMPACT_RATIO = 1.0
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.log_path = self.path / SegmentLog.FILE_NAME
+        self.segments_path = self.path / SegmentLog.SEGMENTS_DIR
+        self.marker_path = self.path / SegmentLog.MARKER_NAME
+
+        self._next_segment: int | None = None
+
+    @staticmethod
+    def _fsync_dir(path: Path) -> None:
+        """Persists directory entries (created, renamed or removed files)."""
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _scan(self) -> tuple[list[dict], int]:
+        """Reads complete records of the log, returning them with the byte offset of their end."""
+        if not self.log_path.exists():
+            return [], 0
+
+        records, end = [], 0
+        with self.log_path.open('rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+                end += len(line)
+
+        return records, end
+
+    def records(self) -> Iterator[dict]:
+        """
+        Iterates over the committed records in commit order, ignoring a torn last record without
+        modifying the log.
+
+        Yields
+        ------
+        dict
+            Record with `delete` (list of ids), `add` (ids, texts, metadatas and segment name, or
+            None) and `manifest` (list of `Manifest` operations).
+        """
+        yield from self._scan()[0]
+
+    def vectors(self, record: dict) -> np.ndarray:
+        """Loads the vectors added by a record."""
+        return np.load(self.segments_path / record['add']['segment'])
+
+    def append(
+        self,
+        delete: list[str] | None = None,
+        add: dict | None = None,
+        vectors: np.ndarray | None = None,
+        manifest: list[list] | None = None,
+    ) -> None:
+        """
+        Durably appends a commit record.
+
+        Parameters
+        ----------
+        delete : list[str] | None, optional
+            Ids of the deleted documents, by default None.
+        add : dict | None, optional
+            `ids`, `texts` and `metadatas` of the added documents, by default None.
+        vectors : np.ndarray | None, optional
+            Vectors of the added documents, required with `add`, by default None.
+        manifest : list[list] | None, optional
+            Manifest operations of the commit, by default None.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        if self._next_segment is None:
+            self.recover()
+            for path in self.path.glob(SegmentLog.STAGED_PREFIX + '*'):
+                path.unlink()
+
+            records, end = self._scan()
+            if self.log_path.exists() and self.log_path.stat().st_size > end:
+                logger.warning(f'Discarding incomplete record at the end of {self.log_path}')
+                with self.log_path.open('r+b') as f:
+                    f.truncate(end)
+            self._next_segment = 1 + max(
+                (int(r['add']['segment'].split('.')[0]) for r in records if r['add']), default=0
+            )
+
+        if add is not None:
+            self.segments_path.mkdir(exist_ok=True)
+            add = {**add, 'segment': f'{self._next_segment:08d}.npy'}
+            self._next_segment += 1
+
+            segment_path = self.segments_path / add['segment']
+            with segment_path.open('wb') as f:
+                np.save(f, np.asarray(vectors, dtype=np.float32))
+                f.flush()
+                os.fsync(f.fileno())
+            self._fsync_dir(self.segments_path)
+
+        line = json.dumps({'delete': delete or [], 'add': add, 'manifest': manifest or []}) + '\n'
+        with self.log_path.open('ab') as f:
+            f.write(line.encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def size(self) -> int:
+        """Returns the size of the log and its segments in bytes."""
+        size = self.log_path.stat().st_size if self.log_path.exists() else 0
+        if self.segments_path.exists():
+            size += sum(path.stat().st_size for path in self.segments_path.iterdir())
+        return size
+
+    def should_compact(self, snapshot_bytes: int) -> bool:
+        """
+        Checks whether the log grew large enough to be folded into the snapshot.
+
+        The log is compacted once it outgrows both `COMPACT_MIN_BYTES` and `COMPACT_RATIO`
+        times the snapshot, which keeps replay cheap while the snapshot is only rewritten
+        a logarithmic number of times as the store grows.
+
+        Parameters
+        ----------
+        snapshot_bytes : int
+            Size of the current snapshot in bytes.
+
+        Returns
+        -------
+        bool
+            True if the log should be compacted.
+        """
+        size = self.size()
+        return size > SegmentLog.COMPACT_MIN_BYTES and size > SegmentLog.COMPACT_RATIO * snapshot_bytes
+
+    def staged(self, file_name: str) -> Path:
+        """Returns the path a snapshot file is written to before `compact` publishes it."""
+        return self.path / (SegmentLog.STAGED_PREFIX + file_name)
+
+    def compact(self, file_names: list[str], removed_names: list[str] | None = None) -> None:
+        """
+        Publishes a new snapshot written to `staged` paths and empties the log.
+
+        A marker file makes the switch crash-safe: once it exists, `recover` finishes an
+        interrupted compaction, and staged files without it are discarded by the next writer.
+
+        Parameters
+        ----------
+        file_names : list[str]
+            Names of the snapshot files written to their `staged` paths.
+        removed_names : list[str] | None, optional
+            Names of files of the previous snapshot that are not part of the new one, by default None.
+        """
+        for file_name in file_names:
+            with self.staged(file_name).open('rb') as f:
+                os.fsync(f.fileno())
+
+        tmp_path = self.marker_path.with_suffix('.tmp')
+        with tmp_path.open('w', encoding='utf-8') as f:
+            json.dump({'files': file_names, 'removed': removed_names or []}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.marker_path)
+        self._fsync_dir(self.path)
+
+        self.recover()
+
+    def recover(self) -> None:
+        """Finishes a compaction interrupted after its snapshot was completely written. Only called by writers."""
+        if not self.marker_path.exists():
+            return
+
+        try:
+            with self.marker_path.open('r', encoding='utf-8') as f:
+                marker = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+
+        for file_name in marker['files']:
+            try:
+                os.replace(self.staged(file_name), self.path / file_name)
+            except FileNotFoundError:
+                pass
+        for file_name in marker['removed']:
+            (self.path / file_name).unlink(missing_ok=True)
+
+        self.log_path.unlink(missing_ok=True)
+        if self.segments_path.exists():
+            for path in self.segments_path.iterdir():
+                path.unlink(missing_ok=True)
+        self._fsync_dir(self.path)
+
+        self.marker_path.unlink(missing_ok=True)
+        self._next_segment = None
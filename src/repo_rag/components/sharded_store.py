@@ -0,0 +1,552 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+from pathlib import Path
+from typing import Any
+
+import faiss
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict, PrivateAttr
+
+from repo_rag.components.ann import AnnIndex
+from repo_rag.components.constants import RRF_K, SHARD_SEARCH_WORKERS, VECTORSTORE_PATH
+from repo_rag.components.rescoring import RescoredFAISS
+from repo_rag.components.store_pool import VectorstorePool, vectorstore_pool
+from repo_rag.components.vectorstore import Vectorstore
+from repo_rag.components.versions import StoreVersions
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=SHARD_SEARCH_WORKERS, thread_name_prefix='shard-search')
+
+
+class ShardedVectorstore:
+    """
+    A vectorstore split into one `Vectorstore` shard per repository.
+
+    Every repository is indexed into its own shard under `shards/`, and `shards.json` maps
+    repository URLs to shard names. Shards are independent vectorstores with their own index,
+    docstore, manifest and segment log, so adding a repository does not grow the index of the
+    others, and a shard can be rebuilt (see `drop`) without touching the rest. Searches fan out
+    to the shards in parallel and merge their results, see `ShardedRetriever`.
+
+    A store directory holding a single vectorstore built before sharding is used as one shard
+    holding all of its repositories.
+
+    `index_factory` and the embedding backend and model apply to new shards; every shard records
+    its own, so shards of one store may be embedded with different models.
+    """
+
+    REGISTRY_NAME = 'shards.json'
+    SHARDS_DIR = 'shards'
+    LEGACY_SHARD = ''
+
+    def __init__(
+        self,
+        version: int = 0,
+        index_factory: str | None = None,
+        embedding_backend: str | None = None,
+        embedding_model: str | None = None,
+    ):
+        self.vectorstore_path = VECTORSTORE_PATH + f'_v{version}'
+        self.index_factory = index_factory
+        self.embedding_backend = embedding_backend
+        self.embedding_model = embedding_model
+        self._registry: dict[str, str] = {}
+        self._registry_mtime: int | None = None
+
+    @property
+    def registry_path(self) -> Path:
+        return Path(self.vectorstore_path) / ShardedVectorstore.REGISTRY_NAME
+
+    def is_legacy(self) -> bool:
+        """Checks whether the store directory holds a single vectorstore built before sharding."""
+        path = Path(self.vectorstore_path)
+        return (path / f'{Vectorstore.INDEX_NAME}.faiss').exists() or (path / f'{Vectorstore.INDEX_NAME}.pkl').exists()
+
+    def registry(self) -> dict[str, str]:
+        """Returns the shard names by repository URL, re-reading the registry only when it changed."""
+        if not self.registry_path.exists():
+            return {}
+
+        mtime = self.registry_path.stat().st_mtime_ns
+        if mtime != self._registry_mtime:
+            with self.registry_path.open('r', encoding='utf-8') as f:
+                self._registry = json.load(f)
+            self._registry_mtime = mtime
+        return dict(self._registry)
+
+    def _save_registry(self, registry: dict[str, str]) -> None:
+        """Writes the registry atomically."""
+        self.registry_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.registry_path.with_suffix('.tmp')
+        with tmp_path.open('w', encoding='utf-8') as f:
+            json.dump(registry, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.registry_path)
+
+    @staticmethod
+    def shard_name(repo_url: str) -> str:
+        """
+        Returns the directory name of the shard of a repository, e.g. `viarotel-org-escrcpy-1a2b3c4d`.
+
+        Parameters
+        ----------
+        repo_url : str
+            URL of the repository.
+
+        Returns
+        -------
+        str
+            Readable slug of the repository name, followed by a hash of the URL to keep names unique.
+        """
+        repo_url = repo_url.rstrip('/')
+        slug = re.sub(r'[^a-z0-9]+', '-', repo_url.split('github.com/')[-1].lower()).strip('-')[-64:]
+        digest = hashlib.sha1(repo_url.encode('utf-8')).hexdigest()[:8]
+        return f'{slug}-{digest}' if slug else digest
+
+    def _vectorstore(self, name: str) -> Vectorstore:
+        """Returns the vectorstore of a shard."""
+        path = Path(self.vectorstore_path)
+        if name != ShardedVectorstore.LEGACY_SHARD:
+            path = path / ShardedVectorstore.SHARDS_DIR / name
+        return Vectorstore(
+            index_factory=self.index_factory,
+            path=str(path),
+            embedding_backend=self.embedding_backend,
+            embedding_model=self.embedding_model,
+        )
+
+    def shard(self, repo_url: str) -> Vectorstore:
+        """
+        Returns the shard of a repository, registering a new shard for repositories not seen before.
+
+        Parameters
+        ----------
+        repo_url : str
+            URL of the repository, as recorded in the `repo_url` metadata of its documents.
+
+        Returns
+        -------
+        Vectorstore
+            Vectorstore of the shard, created on the first commit.
+        """
+        if self.is_legacy():
+            return self._vectorstore(ShardedVectorstore.LEGACY_SHARD)
+
+        repo_url = repo_url.rstrip('/')
+        registry = self.registry()
+        if repo_url not in registry:
+            registry[repo_url] = ShardedVectorstore.shard_name(repo_url)
+            self._save_registry(registry)
+            logger.info(f'Registered shard {registry[repo_url]} for {repo_url}.')
+        return self._vectorstore(registry[repo_url])
+
+    def shards(self, repo_urls: list[str] | None = None) -> dict[str, Vectorstore]:
+        """
+        Returns the shards holding the given repositories.
+
+        Parameters
+        ----------
+        repo_urls : list[str] | None, optional
+            URLs of the repositories, by default all repositories.
+
+        Returns
+        -------
+        dict[str, Vectorstore]
+            Vectorstores of the shards by shard name.
+        """
+        if self.is_legacy():
+            return {ShardedVectorstore.LEGACY_SHARD: self._vectorstore(ShardedVectorstore.LEGACY_SHARD)}
+
+        registry = self.registry()
+        if repo_urls is not None:
+            wanted = {repo_url.rstrip('/') for repo_url in repo_urls}
+            missing = wanted - registry.keys()
+            if missing:
+                logger.warning(f'No shards found for {sorted(missing)}.')
+            registry = {repo_url: name for repo_url, name in registry.items() if repo_url in wanted}
+        return {name: self._vectorstore(name) for name in sorted(set(registry.values()))}
+
+    def drop(self, repo_url: str) -> None:
+        """
+        Deletes the shard of a repository, so it is rebuilt from scratch the next time it is indexed.
+
+        Parameters
+        ----------
+        repo_url : str
+            URL of the repository.
+
+        Raises
+        ------
+        ValueError
+            if the store is a single vectorstore built before sharding
+        """
+        if self.is_legacy():
+            raise ValueError(f'Vectorstore {self.vectorstore_path} is not sharded. Build a new version to shard it.')
+
+        repo_url = repo_url.rstrip('/')
+        registry = self.registry()
+        name = registry.pop(repo_url, None)
+        if name is None:
+            return
+
+        self._save_registry(registry)
+        shutil.rmtree(self._vectorstore(name).vectorstore_path, ignore_errors=True)
+        logger.info(f'Dropped shard {name} of {repo_url}.')
+
+    def load(self, read_only: bool = False, repo_urls: list[str] | None = None) -> dict[str, RescoredFAISS]:
+        """
+        Loads the shards holding the given repositories in parallel, see `Vectorstore.load`.
+
+        Parameters
+        ----------
+        read_only : bool, optional
+            Whether to memory-map the indexes for searching only, by default False.
+        repo_urls : list[str] | None, optional
+            URLs of the repositories, by default all repositories.
+
+        Returns
+        -------
+        dict[str, RescoredFAISS]
+            Loaded vectorstores by shard name. Registered shards without any commits are left out.
+        """
+        shards = {
+            name: shard for name, shard in self.shards(repo_urls).items() if Path(shard.vectorstore_path).exists()
+        }
+        loaded = _executor.map(lambda shard: shard.load(read_only=read_only), shards.values())
+        return dict(zip(shards, loaded))
+
+    def retriever(
+        self,
+        repo_urls: list[str] | None = None,
+        search_params: dict[str, float] | None = None,
+        pool: VectorstorePool | None = None,
+        **kwargs,
+    ) -> 'ShardedRetriever':
+        """
+        Creates a retriever searching the shards in parallel, loading them on demand.
+
+        Parameters
+        ----------
+        repo_urls : list[str] | None, optional
+            URLs of the repositories to search, by default all repositories.
+        search_params : dict[str, float] | None, optional
+            Search-time parameters of the indexes, see `Vectorstore.retriever`, by default None.
+        pool : VectorstorePool | None, optional
+            Pool keeping the loaded shards, by default the process-wide `vectorstore_pool`.
+        **kwargs
+            `search_type` ('similarity', 'mmr', 'hybrid' or 'files') and `search_kwargs` like `VectorStoreRetriever`.
+
+        Returns
+        -------
+        ShardedRetriever
+            Retriever over the shards.
+        """
+        return ShardedRetriever(
+            store=self,
+            repo_urls=repo_urls,
+            search_params=search_params or {},
+            pool=pool or vectorstore_pool,
+            **kwargs,
+        )
+
+
+class ShardedRetriever(BaseRetriever):
+    """
+    A retriever searching the shards of a `ShardedVectorstore` in parallel and merging the results.
+
+    Shards are taken from a `VectorstorePool`, which loads them on their first search and keeps
+    the recently used ones resident, so the repositories indexed after the retriever was created
+    are searched as well. The query is embedded while the shards are looked up, once per embedding
+    model the shards were built with (see `Vectorstore.embeddings`). Every shard is
+    searched for its own top k on a thread pool (FAISS releases the GIL while searching) under the
+    shard's `search_lock`, and the results are merged into a global top k by score, so query latency
+    grows with the largest shard rather than with the number of repositories. Scores of shards built
+    with different embedding models or index metrics are not on one scale, so their results are
+    fused by rank instead (see `fuse`). MMR searches select diverse documents within every shard,
+    and their results are interleaved shard by shard, keeping the diversity order of every shard.
+
+    Hybrid searches (`search_type='hybrid'`) also search the BM25 `LexicalIndex` of every shard,
+    which finds chunks containing identifiers of the question that the embedding misses, and fuse
+    the global dense ranking and the lexical ranking of every shard, of `fetch_k` documents each, by
+    reciprocal rank (see `fuse`). BM25 scores of shards of different sizes are not comparable, nor
+    with similarities, so no scores of these rankings are compared.
+
+    File searches (`search_type='files'`) return the top k distinct files rather than chunks, each
+    represented by its most similar chunk. Every shard groups its nearest chunks by file (see
+    `RescoredFAISS.file_search_by_vector`), scoring files by their best chunk or, with
+    `search_kwargs={'aggregate': 'sum'}`, by the sum over their chunks, and the files of all shards
+    are merged like chunks.
+
+    The searched repositories can be narrowed per query with the `repo_urls` argument of `invoke`.
+    `batch_search` retrieves the documents of many queries with one embedding request and one
+    index search per shard.
+    Without a `store` the retriever follows the published version (see `StoreVersions`): every
+    search resolves it anew, so a newly published version is picked up by the next search while
+    searches in flight finish on the version they started with.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    store: ShardedVectorstore | None = None
+    pool: VectorstorePool
+    repo_urls: list[str] | None = None
+    search_params: dict[str, float] = {}
+    search_type: str = 'similarity'
+    search_kwargs: dict[str, Any] = {}
+
+    _stores: dict[int, ShardedVectorstore] = PrivateAttr(default_factory=dict)
+
+    def _store(self) -> ShardedVectorstore:
+        """Returns the searched store, the one of the published version if none was given."""
+        if self.store is not None:
+            return self.store
+
+        version = StoreVersions.current()
+        if version not in self._stores:
+            self._stores = {version: ShardedVectorstore(version)}
+        return self._stores[version]
+
+    def _search_shard(
+        self, vectorstore: RescoredFAISS, embeddings: list[list[float]], k: int | None = None
+    ) -> list[list[tuple[Document, float]]]:
+        """
+        Searches one shard for every query embedding with the retriever's search parameters, optionally for
+        another number of documents. Similarity searches search the index once for all embeddings.
+        """
+        search_kwargs = self.search_kwargs if k is None else {**self.search_kwargs, 'k': k}
+        with vectorstore.search_lock:
+            AnnIndex.set_search_params(vectorstore.index, self.search_params)
+            if self.search_type == 'mmr':
+                return [
+                    vectorstore.max_marginal_relevance_search_with_score_by_vector(embedding, **search_kwargs)
+                    for embedding in embeddings
+                ]
+            if self.search_type == 'files':
+                return [
+                    vectorstore.file_search_by_vector(
+                        embedding, search_kwargs.get('k', 4), aggregate=search_kwargs.get('aggregate', 'max')
+                    )
+                    for embedding in embeddings
+                ]
+            return vectorstore.similarity_search_with_score_by_vectors(embeddings, **search_kwargs)
+
+    @staticmethod
+    def fuse(rankings: list[list[Document]], k: int = RRF_K) -> list[tuple[Document, float]]:
+        """
+        Fuses rankings by reciprocal rank: a document scores the sum of 1 / (k + rank) over the rankings it is in.
+
+        Parameters
+        ----------
+        rankings : list[list[Document]]
+            Rankings of documents, best first.
+        k : int, optional
+            Rank offset damping the weight of the top ranks, by default `RRF_K`.
+
+        Returns
+        -------
+        list[tuple[Document, float]]
+            Documents of all rankings and their fused scores, best first.
+        """
+        docs: dict[str, Document] = {}
+        scores: dict[str, float] = {}
+        for ranking in rankings:
+            for rank, doc in enumerate(ranking, start=1):
+                key = doc.id if doc.id is not None else doc.page_content
+                docs.setdefault(key, doc)
+                scores[key] = scores.get(key, 0.0) + 1 / (k + rank)
+        return sorted(((docs[key], score) for key, score in scores.items()), key=lambda result: result[1], reverse=True)
+
+    def _merge(
+        self, rankings: list[list[tuple[Document, float]]], comparable: bool, higher_is_better: bool
+    ) -> list[tuple[Document, float]]:
+        """
+        Merges the results of the shards for one query, best first.
+
+        MMR results are interleaved shard by shard, keeping the diversity order of every shard. Other
+        results are sorted by score if the scores of the shards are comparable, otherwise fused by rank.
+        """
+        if self.search_type == 'mmr':
+            return [result for results in zip_longest(*rankings) for result in results if result is not None]
+        if comparable:
+            return sorted(
+                (result for ranking in rankings for result in ranking),
+                key=lambda result: result[1],
+                reverse=higher_is_better,
+            )
+        return ShardedRetriever.fuse([[doc for doc, _ in ranking] for ranking in rankings])
+
+    def search_with_scores(self, query: str, repo_urls: list[str] | None = None) -> list[tuple[Document, float]]:
+        """
+        Searches the shards and returns the global top k documents with their scores.
+
+        Parameters
+        ----------
+        query : str
+            Query text.
+        repo_urls : list[str] | None, optional
+            URLs of the repositories to search, by default the retriever's `repo_urls`.
+
+        Returns
+        -------
+        list[tuple[Document, float]]
+            Documents and their scores, most similar first. Hybrid searches and searches of shards with different
+            embedding models or metrics return fused scores, file searches one document per file with the file's score.
+
+        Raises
+        ------
+        ValueError
+            if the search type is not 'similarity', 'mmr', 'hybrid' or 'files'
+        """
+        return self.batch_search_with_scores([query], repo_urls)[0]
+
+    def batch_search_with_scores(
+        self, queries: list[str], repo_urls: list[str] | None = None
+    ) -> list[list[tuple[Document, float]]]:
+        """
+        Searches the shards for several queries at once and returns the global top k documents of each.
+
+        The queries are embedded in one request per embedding model of the shards (repeated queries
+        are answered from the query cache), and every shard is searched once for all of them with a
+        matrix search, so bulk jobs such as evaluations cost a handful of round-trips instead of one
+        per query. MMR and file searches still search the shards query by query.
+
+        Parameters
+        ----------
+        queries : list[str]
+            Query texts.
+        repo_urls : list[str] | None, optional
+            URLs of the repositories to search, by default the retriever's `repo_urls`.
+
+        Returns
+        -------
+        list[list[tuple[Document, float]]]
+            Documents and their scores for every query in the order of the queries, like `search_with_scores`.
+
+        Raises
+        ------
+        ValueError
+            if the search type is not 'similarity', 'mmr', 'hybrid' or 'files'
+        """
+        if self.search_type not in ('similarity', 'mmr', 'hybrid', 'files'):
+            raise ValueError(
+                f"Search type {self.search_type} is not supported, use 'similarity', 'mmr', 'hybrid' or 'files'."
+            )
+
+        shards = self._store().shards(repo_urls if repo_urls is not None else self.repo_urls)
+        shards = [shard for shard in shards.values() if Path(shard.vectorstore_path).exists()]
+        loading = [_executor.submit(self.pool.get, shard) for shard in shards]
+        if not loading or not queries:
+            return [[] for _ in queries]
+
+        # Shards embedded with the same model share the query embeddings.
+        embeddings = {id(shard.embeddings): shard.embeddings for shard in shards}
+        query_embeddings = {key: embeddings.embed_queries(queries) for key, embeddings in embeddings.items()}
+        searches, scales = [], set()
+        for shard, vectorstore in zip(shards, (future.result() for future in loading)):
+            if vectorstore.index.ntotal:
+                searches.append((vectorstore, query_embeddings[id(shard.embeddings)]))
+                scales.add((id(shard.embeddings), vectorstore.index.metric_type))
+        if not searches:
+            return [[] for _ in queries]
+
+        k = self.search_kwargs.get('k', 4)
+        fetch_k = max(self.search_kwargs.get('fetch_k', 20), k) if self.search_type == 'hybrid' else None
+        results = list(_executor.map(lambda search: self._search_shard(*search, k=fetch_k), searches))
+        vectorstores = [vectorstore for vectorstore, _ in searches]
+        if self.search_type == 'hybrid':
+            lexical_results = list(
+                _executor.map(
+                    lambda vectorstore: [vectorstore.lexical_search(query, fetch_k) for query in queries], vectorstores
+                )
+            )
+
+        # Scores are only comparable between shards of one embedding model and metric. File scores are
+        # similarities for every metric.
+        comparable = len(scales) == 1
+        higher_is_better = (
+            self.search_type == 'files' or vectorstores[0].index.metric_type == faiss.METRIC_INNER_PRODUCT
+        )
+        ranked = []
+        for i in range(len(queries)):
+            merged = self._merge([shard_results[i] for shard_results in results], comparable, higher_is_better)
+            if self.search_type != 'hybrid':
+                ranked.append(merged[:k])
+                continue
+
+            # BM25 scores depend on the size of the shard's corpus, so every shard's lexical ranking is fused on its own
+            rankings = [[doc for doc, _ in merged[:fetch_k]]]
+            rankings += [[doc for doc, _ in shard_results[i]] for shard_results in lexical_results]
+            ranked.append(ShardedRetriever.fuse(rankings)[:k])
+        return ranked
+
+    def batch_search(self, queries: list[str], repo_urls: list[str] | None = None) -> list[list[Document]]:
+        """
+        Searches the shards for several queries at once, see `batch_search_with_scores`.
+
+        Parameters
+        ----------
+        queries : list[str]
+            Query texts.
+        repo_urls : list[str] | None, optional
+            URLs of the repositories to search, by default the retriever's `repo_urls`.
+
+        Returns
+        -------
+        list[list[Document]]
+            Documents for every query in the order of the queries, most relevant first.
+        """
+        return [[doc for doc, _ in results] for results in self.batch_search_with_scores(queries, repo_urls)]
+
+    def lookup_symbols(self, names: list[str], repo_urls: list[str] | None = None) -> tuple[list[Document], list[str]]:
+        """
+        Resolves symbol names with the symbol tables of the shards, without searching the vectors.
+
+        Parameters
+        ----------
+        names : list[str]
+            Exact names of the symbols, see `SymbolIndex.mentions`.
+        repo_urls : list[str] | None, optional
+            URLs of the repositories to search, by default the retriever's `repo_urls`.
+
+        Returns
+        -------
+        tuple[list[Document], list[str]]
+            Chunks holding definitions of the names without duplicates, taking turns between the names
+            so that the first chunk of every definition comes first, and the names without any definition.
+        """
+        if not names:
+            return [], []
+
+        shards = self._store().shards(repo_urls if repo_urls is not None else self.repo_urls)
+        shards = [shard for shard in shards.values() if Path(shard.vectorstore_path).exists()]
+        vectorstores = list(_executor.map(self.pool.get, shards))
+
+        found = {
+            name: [doc for vectorstore in vectorstores for doc in vectorstore.lookup_symbol(name)] for name in names
+        }
+        missing = [name for name, docs in found.items() if not docs]
+        # a chunk defining several of the names is returned once, at its first position
+        unique: dict[str, Document] = {}
+        for doc in (doc for docs in zip_longest(*found.values()) for doc in docs if doc is not None):
+            unique.setdefault(doc.id if doc.id is not None else doc.page_content, doc)
+        return list(unique.values()), missing
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun, repo_urls: list[str] | None = None
+    ) -> list[Document]:
+        return [doc for doc, _ in self.search_with_scores(query, repo_urls)]
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun, repo_urls: list[str] | None = None
+    ) -> list[Document]:
+        return [doc for doc, _ in await asyncio.to_thread(self.search_with_scores, query, repo_urls)]
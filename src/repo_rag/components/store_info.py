@@ -0,0 +1,104 @@
+import json
+import os
+from pathlib import Path
+
+
+class StoreInfo:
+    """
+    Metadata of a vectorstore stored in its `store.json`.
+
+    Records how the store was built, so it is loaded, extended and queried the same way
+    regardless of the current defaults: the FAISS factory string of its index type, the vector
+    dimension, and the embedding backend and model (with the number of dimensions requested from
+    models returning shortened embeddings) that embedded its documents.
+    """
+
+    FILE_NAME = 'store.json'
+
+    def __init__(
+        self,
+        path: str | Path,
+        index_factory: str,
+        dimension: int,
+        embedding_backend: str,
+        embedding_model: str,
+        embedding_dimensions: int | None = None,
+    ):
+        self.path = Path(path)
+        self.index_factory = index_factory
+        self.dimension = dimension
+        self.embedding_backend = embedding_backend
+        self.embedding_model = embedding_model
+        self.embedding_dimensions = embedding_dimensions
+
+    @classmethod
+    def load(
+        cls,
+        vectorstore_path: str | Path,
+        index_factory: str,
+        dimension: int,
+        embedding_backend: str,
+        embedding_model: str,
+        embedding_dimensions: int | None = None,
+    ) -> 'StoreInfo':
+        """
+        Loads the metadata of a vectorstore, or returns the given defaults if it has none.
+
+        Stores whose metadata predates the embedding fields are assumed to be embedded with the
+        given embedding defaults.
+
+        Parameters
+        ----------
+        vectorstore_path : str | Path
+            Directory of the vectorstore.
+        index_factory : str
+            FAISS factory string used if the store has no metadata.
+        dimension : int
+            Vector dimension used if the store has no metadata.
+        embedding_backend : str
+            Embedding backend used if the store has no metadata.
+        embedding_model : str
+            Embedding model used if the store has no metadata.
+        embedding_dimensions : int | None, optional
+            Dimensions of shortened embeddings used if the store has no metadata, by default None.
+
+        Returns
+        -------
+        StoreInfo
+            Loaded metadata.
+        """
+        path = Path(vectorstore_path) / cls.FILE_NAME
+        if not path.exists():
+            return cls(path, index_factory, dimension, embedding_backend, embedding_model, embedding_dimensions)
+
+        with path.open('r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(
+            path,
+            data['index_factory'],
+            data['dimension'],
+            data.get('embedding_backend', embedding_backend),
+            data.get('embedding_model', embedding_model),
+            data.get('embedding_dimensions', embedding_dimensions),
+        )
+
+    def exists(self) -> bool:
+        """Checks whether the metadata has been saved."""
+        return self.path.exists()
+
+    def save(self) -> None:
+        """Writes the metadata atomically."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with tmp_path.open('w', encoding='utf-8') as f:
+            json.dump(
+                {
+                    'index_factory': self.index_factory,
+                    'dimension': self.dimension,
+                    'embedding_backend': self.embedding_backend,
+                    'embedding_model': self.embedding_model,
+                    'embedding_dimensions': self.embedding_dimensions,
+                },
+                f,
+            )
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,167 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from repo_rag.components.constants import VECTORSTORE_POOL_MAX_BYTES
+from repo_rag.components.rescoring import RescoredFAISS
+from repo_rag.components.vectorstore import Vectorstore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class VectorstorePool:
+    """
+    A process-wide pool of loaded vectorstores with least-recently-used eviction under a memory budget.
+
+    A vectorstore is loaded on its first request and kept resident while it is used. Once the
+    resident stores exceed `max_bytes` the least recently used ones are evicted, so one process can
+    serve many repositories while only the hot ones stay in memory. The memory of a store is
+    estimated from the size of its snapshot and segment log, see `Vectorstore.size_bytes`.
+
+    Concurrent requests for a store that is not resident wait for a single load of it. Searches
+    holding an evicted store keep using it until they finish.
+
+    Resident stores are keyed by path and remember the `Vectorstore.generation` they were loaded at,
+    so a store rebuilt in place, also by another process, is reloaded on its next request.
+    """
+
+    def __init__(self, max_bytes: int, read_only: bool = True):
+        self.max_bytes = max_bytes
+        self.read_only = read_only
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+
+        # path -> (loaded store, size in bytes, generation it was loaded at)
+        self._stores: OrderedDict[str, tuple[RescoredFAISS, int, tuple]] = OrderedDict()
+        self._loading: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _resident(self, key: str, generation: tuple) -> RescoredFAISS | None:
+        """
+        Returns a resident store of the given generation and marks it as most recently used, counting the hit.
+        Call with the lock held.
+        """
+        entry = self._stores.get(key)
+        if entry is None:
+            return None
+        if entry[2] != generation:
+            logger.info(f'Vectorstore {key} changed on disk, reloading it.')
+            del self._stores[key]
+            return None
+
+        self._stores.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def get(self, vectorstore: Vectorstore) -> RescoredFAISS:
+        """
+        Returns a loaded vectorstore, loading it if it is not resident.
+
+        Parameters
+        ----------
+        vectorstore : Vectorstore
+            Vectorstore to load, identified by its path.
+
+        Returns
+        -------
+        RescoredFAISS
+            The loaded vectorstore.
+
+        Raises
+        ------
+        FileNotFoundError
+            if the vectorstore was not found
+        """
+        key = vectorstore.vectorstore_path
+        generation = vectorstore.generation()
+        with self._lock:
+            loaded = self._resident(key, generation)
+            if loaded is not None:
+                return loaded
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        with loading:
+            with self._lock:
+                loaded = self._resident(key, generation)
+                if loaded is not None:
+                    return loaded
+                self.misses += 1
+
+            start_time = time.perf_counter()
+            try:
+                loaded = vectorstore.load(read_only=self.read_only)
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+            load_time = time.perf_counter() - start_time
+            size = vectorstore.size_bytes()
+
+            with self._lock:
+                self._stores[key] = (loaded, size, generation)
+                self.loads += 1
+                self.load_seconds += load_time
+                self._evict(keep=key)
+
+        logger.info(f'Loaded vectorstore {key} ({size / 1024 / 1024:.1f} MB) in {load_time:.2f} s.')
+        return loaded
+
+    def _evict(self, keep: str) -> None:
+        """Evicts least recently used stores until the budget is met, keeping the given one. Call with the lock held."""
+        resident_bytes = sum(entry[1] for entry in self._stores.values())
+        for key in list(self._stores):
+            if resident_bytes <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+
+            size = self._stores.pop(key)[1]
+            resident_bytes -= size
+            self.evictions += 1
+            logger.info(f'Evicted vectorstore {key} ({size / 1024 / 1024:.1f} MB) from the pool.')
+
+    def evict(self, vectorstore: Vectorstore) -> None:
+        """
+        Drops a vectorstore from the pool, so it is reloaded on its next request. Stores changed on disk are
+        reloaded without it, see `Vectorstore.generation`.
+
+        Parameters
+        ----------
+        vectorstore : Vectorstore
+            Vectorstore to drop, identified by its path.
+        """
+        with self._lock:
+            self._stores.pop(vectorstore.vectorstore_path, None)
+
+    def stats(self) -> dict[str, float]:
+        """
+        Returns pool statistics.
+
+        Returns
+        -------
+        dict[str, float]
+            Number of hits and misses, hit rate, evictions, number of loads and their total and mean time in seconds,
+            number of resident stores, their estimated size in bytes and the memory budget.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'loads': self.loads,
+                'load_seconds': self.load_seconds,
+                'mean_load_seconds': self.load_seconds / self.loads if self.loads else 0.0,
+                'resident_stores': len(self._stores),
+                'resident_bytes': sum(entry[1] for entry in self._stores.values()),
+                'max_bytes': self.max_bytes,
+            }
+
+
+vectorstore_pool = VectorstorePool(VECTORSTORE_POOL_MAX_BYTES)
@@ -0,0 +1,332 @@
+import json
+import logging
+import os
+import re
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SymbolIndex:
+    """
+    A symbol table mapping the names of definitions to the chunks holding them, for exact lookups.
+
+    At index time `annotate` extracts the definitions of functions, classes, types and exported
+    constants of a file with per-language patterns (Python, JavaScript/TypeScript, Go, Rust, Java,
+    Kotlin, C#, C/C++, Ruby and PHP) and records them in the `symbols` metadata of every chunk
+    overlapping their line range, as `[name, kind, start line, end line]`. The end of a definition
+    is found by indentation: it is the last line before the code returns to the indentation of its
+    first line. The table is built from that metadata as chunks are added to the vectorstore and
+    saved in the snapshot as `symbols.json`, mapping names to `[chunk id, kind, start, end]` entries
+    in chunk order.
+
+    Questions are scanned for identifiers by `mentions`, which are then resolved with `lookup`
+    without embedding the question or searching the vectors.
+    """
+
+    FILE_NAME = 'symbols.json'
+    FILE_NAMES = (FILE_NAME,)
+    METADATA_KEY = 'symbols'
+
+    EXTENSIONS = {
+        '.py': 'python',
+        '.pyi': 'python',
+        '.js': 'javascript',
+        '.jsx': 'javascript',
+        '.mjs': 'javascript',
+        '.cjs': 'javascript',
+        '.ts': 'javascript',
+        '.tsx': 'javascript',
+        '.vue': 'javascript',
+        '.svelte': 'javascript',
+        '.go': 'go',
+        '.rs': 'rust',
+        '.java': 'java',
+        '.kt': 'kotlin',
+        '.kts': 'kotlin',
+        '.cs': 'java',
+        '.scala': 'kotlin',
+        '.c': 'c',
+        '.h': 'c',
+        '.cc': 'c',
+        '.cpp': 'c',
+        '.cxx': 'c',
+        '.hpp': 'c',
+        '.rb': 'ruby',
+        '.php': 'php',
+        '.swift': 'kotlin',
+    }
+
+    PATTERNS = {
+        'python': [
+            ('function', re.compile(r'\s*(?:async\s+)?def\s+(\w+)')),
+            ('class', re.compile(r'\s*class\s+(\w+)')),
+            ('constant', re.compile(r'([A-Z][A-Z0-9_]*)\s*(?::[^=]+)?=(?!=)')),
+        ],
+        'javascript': [
+            ('function', re.compile(r'\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*(\w+)')),
+            ('class', re.compile(r'\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+(\w+)')),
+            ('type', re.compile(r'\s*(?:export\s+)?(?:declare\s+)?(?:interface|type|enum)\s+(\w+)')),
+            (
+                'function',
+                re.compile(
+                    r'\s*(?:export\s+)?(?:const|let|var)\s+(\w+)\s*(?::[^=]+)?=\s*(?:async\s+)?(?:\([^)]*\)|\w+)\s*=>'
+                ),
+            ),
+            ('constant', re.compile(r'\s*export\s+(?:const|let|var)\s+(\w+)')),
+            ('method', re.compile(r'\s+(?:static\s+)?(?:async\s+)?(?:get\s+|set\s+)?(\w+)\s*\([^)]*\)\s*\{')),
+        ],
+        'go': [
+            ('function', re.compile(r'func\s+(?:\([^)]*\)\s*)?(\w+)')),
+            ('type', re.compile(r'type\s+(\w+)')),
+            ('constant', re.compile(r'(?:const|var)\s+([A-Z]\w*)')),
+        ],
+        'rust': [
+            ('function', re.compile(r'\s*(?:pub(?:\([^)]*\))?\s+)?(?:const\s+)?(?:async\s+)?(?:unsafe\s+)?fn\s+(\w+)')),
+            ('type', re.compile(r'\s*(?:pub(?:\([^)]*\))?\s+)?(?:struct|enum|trait|type|union)\s+(\w+)')),
+            ('constant', re.compile(r'\s*(?:pub(?:\([^)]*\))?\s+)?(?:const|static)\s+([A-Z][A-Z0-9_]*)')),
+        ],
+        'java': [
+            ('class', re.compile(r'\s*(?:[a-z]+\s+)*(?:class|interface|enum|record|struct)\s+(\w+)')),
+            (
+                'method',
+                re.compile(
+                    r'\s*(?:(?:public|private|protected|internal|static|final|abstract|async|override|'
+                    r'virtual|synchronized)\s+)+[\w<>\[\],.?]+\s+(\w+)\s*\('
+                ),
+            ),
+        ],
+        'kotlin': [
+            ('function', re.compile(r'\s*(?:[a-z]+\s+)*(?:fun|func|def)\s+(?:<[^>]*>\s*)?(?:\w+\.)?(\w+)')),
+            ('class', re.compile(r'\s*(?:[a-z]+\s+)*(?:class|interface|object|struct|protocol|enum|trait)\s+(\w+)')),
+        ],
+        'c': [
+            ('class', re.compile(r'\s*(?:typedef\s+)?(?:class|struct|enum|union)\s+(\w+)\s*(?:[:{]|$)')),
+            ('function', re.compile(r'[A-Za-z_][\w\s\*&:<>,]*?[\s\*&]\**(\w+)\s*\([^;]*$')),
+            ('constant', re.compile(r'#define\s+([A-Z][A-Z0-9_]*)')),
+        ],
+        'ruby': [
+            ('function', re.compile(r'\s*def\s+(?:self\.)?(\w+[?!]?)')),
+            ('class', re.compile(r'\s*(?:class|module)\s+(?:\w+::)*(\w+)')),
+            ('constant', re.compile(r'\s*([A-Z][A-Z0-9_]*)\s*=(?!=)')),
+        ],
+        'php': [
+            (
+                'function',
+                re.compile(r'\s*(?:(?:public|private|protected|static|abstract|final)\s+)*function\s+&?(\w+)'),
+            ),
+            ('class', re.compile(r'\s*(?:(?:abstract|final)\s+)*(?:class|interface|trait|enum)\s+(\w+)')),
+            ('constant', re.compile(r'\s*(?:(?:public|private|protected)\s+)?const\s+(\w+)')),
+        ],
+    }
+
+    KEYWORDS = frozenset(
+        'if else elif for foreach while do switch case catch try finally return new delete throw sizeof typeof '
+        'await yield with function constructor super this self import export from'.split()
+    )
+
+    MENTION = re.compile(
+        r'`([^`\n]+)`'
+        r'|\b([A-Za-z_$][\w$.]*)\(\)'
+        r'|\b((?=\w*(?:[a-z0-9]_[A-Za-z0-9]|[a-z][A-Z]))[A-Za-z_]\w*)\b'
+    )
+    NAME = re.compile(r'[A-Za-z_$][\w$]*')
+
+    def __init__(self, symbols: dict[str, list[list]] | None = None):
+        self.symbols = symbols or {}
+        self._names: dict[str, list[str]] | None = None
+
+    @staticmethod
+    def _end_line(lines: list[str], start: int) -> int:
+        """Returns the last line of a definition starting at a line, judged by indentation."""
+        indent = len(lines[start]) - len(lines[start].lstrip())
+        end = start
+        for i in range(start + 1, len(lines)):
+            stripped = lines[i].strip()
+            if not stripped:
+                continue
+            if len(lines[i]) - len(lines[i].lstrip()) <= indent and stripped[0] not in ')]}':
+                break
+            end = i
+        return end
+
+    @staticmethod
+    def extract(text: str, file_name: str) -> list[tuple[str, str, int, int]]:
+        """
+        Extracts the definitions of a file.
+
+        Parameters
+        ----------
+        text : str
+            Content of the file.
+        file_name : str
+            Path of the file, whose extension selects the language.
+
+        Returns
+        -------
+        list[tuple[str, str, int, int]]
+            Name, kind, first and last line (1-based) of every definition, in file order.
+            Files in other languages have none.
+        """
+        language = SymbolIndex.EXTENSIONS.get(os.path.splitext(file_name)[1].lower())
+        if language is None:
+            return []
+
+        patterns = SymbolIndex.PATTERNS[language]
+        lines = text.splitlines()
+        symbols = []
+        for i, line in enumerate(lines):
+            for kind, pattern in patterns:
+                match = pattern.match(line)
+                if match and match.group(1) not in SymbolIndex.KEYWORDS:
+                    symbols.append((match.group(1), kind, i + 1, SymbolIndex._end_line(lines, i) + 1))
+                    break
+        return symbols
+
+    @staticmethod
+    def annotate(file_doc: Document, chunks: list[Document]) -> None:
+        """
+        Records the definitions of a file in the metadata of its chunks overlapping them.
+
+        Parameters
+        ----------
+        file_doc : Document
+            Document holding the whole file, with `file_name` metadata.
+        chunks : list[Document]
+            Chunks of the file in file order, substrings of its content.
+        """
+        text = file_doc.page_content
+        symbols = SymbolIndex.extract(text, file_doc.metadata.get('file_name', ''))
+        if not symbols:
+            return
+
+        position, line = 0, 1
+        for chunk in chunks:
+            start = text.find(chunk.page_content, position)
+            if start < 0:
+                continue
+
+            line += text.count('\n', position, start)
+            position = start
+            last_line = line + chunk.page_content.count('\n')
+            overlapping = [list(symbol) for symbol in symbols if symbol[2] <= last_line and symbol[3] >= line]
+            if overlapping:
+                chunk.metadata[SymbolIndex.METADATA_KEY] = overlapping
+
+    @staticmethod
+    def mentions(question: str) -> list[str]:
+        """
+        Returns the identifiers a question refers to.
+
+        Identifiers are names in backticks, names followed by `()`, and words spelled like code,
+        i.e. in snake_case or camelCase. Qualified names such as `Loader.split` refer to their last part.
+
+        Parameters
+        ----------
+        question : str
+            Question in natural language.
+
+        Returns
+        -------
+        list[str]
+            Distinct identifiers in the order they appear.
+        """
+        names = []
+        for quoted, called, spelled in SymbolIndex.MENTION.findall(question):
+            if quoted:
+                match = SymbolIndex.NAME.findall(quoted.split('(')[0])
+                name = match[-1] if match else None
+            else:
+                name = (called or spelled).split('.')[-1]
+            if name and name not in names:
+                names.append(name)
+        return names
+
+    @classmethod
+    def exists(cls, vectorstore_path: str | Path) -> bool:
+        """Checks whether a vectorstore has a symbol table snapshot."""
+        return (Path(vectorstore_path) / cls.FILE_NAME).exists()
+
+    @classmethod
+    def load(cls, vectorstore_path: str | Path) -> 'SymbolIndex':
+        """Reads the symbol table snapshot of a vectorstore."""
+        with (Path(vectorstore_path) / cls.FILE_NAME).open('r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    @classmethod
+    def build(cls, ids: list[str], metadatas: list[dict]) -> 'SymbolIndex':
+        """Builds the symbol table of a vectorstore that has no snapshot of it yet from the chunk metadata."""
+        index = cls()
+        index.add(ids, metadatas)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def _names_by_id(self) -> dict[str, list[str]]:
+        """Returns the names defined in every chunk."""
+        if self._names is None:
+            self._names = {}
+            for name, entries in self.symbols.items():
+                for entry in entries:
+                    self._names.setdefault(entry[0], []).append(name)
+        return self._names
+
+    def add(self, ids: list[str], metadatas: list[dict]) -> None:
+        """
+        Adds the definitions recorded in the metadata of chunks.
+
+        Parameters
+        ----------
+        ids : list[str]
+            Ids of the chunks.
+        metadatas : list[dict]
+            Metadata of the chunks.
+        """
+        names = self._names_by_id()
+        for doc_id, metadata in zip(ids, metadatas):
+            for name, kind, start, end in metadata.get(SymbolIndex.METADATA_KEY) or []:
+                self.symbols.setdefault(name, []).append([doc_id, kind, start, end])
+                names.setdefault(doc_id, []).append(name)
+
+    def delete(self, ids: list[str]) -> None:
+        """
+        Removes the definitions of chunks, ignoring chunks without any.
+
+        Parameters
+        ----------
+        ids : list[str]
+            Ids of the chunks.
+        """
+        names = self._names_by_id()
+        for doc_id in ids:
+            for name in set(names.pop(doc_id, [])):
+                entries = [entry for entry in self.symbols[name] if entry[0] != doc_id]
+                if entries:
+                    self.symbols[name] = entries
+                else:
+                    del self.symbols[name]
+
+    def lookup(self, name: str) -> list[list]:
+        """
+        Returns the definitions of a name.
+
+        Parameters
+        ----------
+        name : str
+            Exact name of the symbol.
+
+        Returns
+        -------
+        list[list]
+            `[chunk id, kind, start line, end line]` of every chunk overlapping a definition of the name.
+        """
+        return self.symbols.get(name, [])
+
+    def write(self, vectorstore_path: str | Path, prefix: str = '') -> None:
+        """Writes a snapshot of the symbol table, prefixing the file name."""
+        with (Path(vectorstore_path) / f'{prefix}{SymbolIndex.FILE_NAME}').open('w', encoding='utf-8') as f:
+            json.dump(self.symbols, f)
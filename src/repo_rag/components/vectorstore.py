@@ -1,59 +1,202 @@
-import time
 import logging
+import pickle
 from pathlib import Path
 from uuid import uuid4
 import faiss
+import numpy as np
 
-from langchain_community.docstore.in_memory import InMemoryDocstore
-from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 
-from repo_rag.components.constants import VECTORSTORE_PATH
-from repo_rag.components.embeddings import openai_embeddings
+from repo_rag.components.ann import AnnIndex, TunedRetriever
+from repo_rag.components.constants import (
+    DEFAULT_EMBEDDING_MODELS,
+    EMBEDDING_BACKEND,
+    EMBEDDING_DIMENSIONS,
+    EMBEDDING_MODEL,
+    INDEX_FACTORY,
+    VECTORSTORE_PATH,
+)
+from repo_rag.components.docstore import CompactDocstore
+from repo_rag.components.embedding_cache import CachedEmbeddings
+from repo_rag.components.embeddings import embedding_dimension, get_embeddings
+from repo_rag.components.file_map import FileMap
+from repo_rag.components.lexical import LexicalIndex
+from repo_rag.components.manifest import Manifest
+from repo_rag.components.rescoring import ExactVectors, RescoredFAISS
+from repo_rag.components.segment_log import SegmentLog
+from repo_rag.components.symbols import SymbolIndex
+from repo_rag.components.store_info import StoreInfo
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 class Vectorstore:
-    """Vectorstore class"""
+    """
+    Vectorstore class
 
-    embeddings = openai_embeddings
+    The store is a snapshot (`index.faiss`, the `CompactDocstore` files and `manifest.json`) plus a
+    `SegmentLog` of the batches committed since it was written. Commits only append to the
+    log, loading replays it, and the log is compacted into a new snapshot once it grows
+    comparable to the snapshot itself.
 
-    def __init__(self, version: int = 0):
-        self.vectorstore_path = VECTORSTORE_PATH + f'_v{version}'
+    The index type is given by a FAISS factory string recorded in `store.json`. Index types
+    that need training are built as an exact flat index first and trained once the store
+    holds enough vectors, see `AnnIndex`. Compressed index types (e.g. `SQfp16`, `SQ8` or
+    `PQ64`) keep full-precision vectors on disk to re-score search candidates, see `RescoredFAISS`.
 
-    def create(self) -> FAISS:
+    Chunk texts are also indexed into a BM25 `LexicalIndex` as they are committed, for hybrid
+    lexical and dense retrieval (see `ShardedRetriever`), the definitions recorded in their
+    metadata into a `SymbolIndex`, and their files into a `FileMap` for file-grouped searches.
+    All of them are part of the snapshot.
+    """
+
+    INDEX_NAME = 'index'
+    MAPPABLE_INDEX_NAME = 'index.mmap'
+    FLAT_FOURCCS = (b'IxFI', b'IxF2', b'IxFl')
+
+    def __init__(
+        self,
+        version: int = 0,
+        index_factory: str | None = None,
+        path: str | None = None,
+        embedding_backend: str | None = None,
+        embedding_model: str | None = None,
+        embedding_dimensions: int | None = None,
+    ):
+        self.vectorstore_path = path or VECTORSTORE_PATH + f'_v{version}'
+        self.log = SegmentLog(self.vectorstore_path)
+        self.index_factory = index_factory
+        self.embedding_backend = embedding_backend
+        self.embedding_model = embedding_model
+        self.embedding_dimensions = embedding_dimensions
+        self._manifest: Manifest | None = None
+        self._info: StoreInfo | None = None
+        self._training_size: int | None = None
+
+    def _embedding(self) -> tuple[str, str, int | None]:
+        """Returns the embedding backend, model and dimensions given to the constructor, or the configured ones."""
+        if self.embedding_backend is None:
+            return EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS
+        model = self.embedding_model or DEFAULT_EMBEDDING_MODELS.get(self.embedding_backend)
+        return self.embedding_backend, model, self.embedding_dimensions
+
+    @property
+    def info(self) -> StoreInfo:
+        """
+        Metadata of the store. New stores use the `index_factory` and embedding model given to the
+        constructor, or `INDEX_FACTORY` and the `EMBEDDING_*` settings by default, while existing
+        stores keep the index type and embedding model they were built with (a flat index for
+        stores created before `store.json` existed).
+
+        Returns
+        -------
+        StoreInfo
+            Metadata of this vectorstore.
+        """
+        if self._info is None:
+            embedding = self._embedding()
+            info = StoreInfo.load(self.vectorstore_path, INDEX_FACTORY, 0, *embedding)
+            if not info.exists():
+                info.dimension = embedding_dimension(*embedding)
+            if not info.exists() and Path(self.vectorstore_path).exists():
+                info.index_factory = 'Flat'
+            elif not info.exists():
+                info.index_factory = self.index_factory or info.index_factory
+            else:
+                if self.index_factory and self.index_factory != info.index_factory:
+                    logger.warning(
+                        f'Vectorstore {self.vectorstore_path} uses index {info.index_factory}, '
+                        f'ignoring {self.index_factory}. Build a new version to change the index type.'
+                    )
+                stored = (info.embedding_backend, info.embedding_model, info.embedding_dimensions)
+                if self.embedding_backend and embedding != stored:
+                    logger.warning(
+                        f'Vectorstore {self.vectorstore_path} is embedded with {stored}, ignoring {embedding}. '
+                        'Build a new version to change the embedding model.'
+                    )
+            self._info = info
+        return self._info
+
+    @property
+    def embeddings(self) -> CachedEmbeddings:
+        """Embeddings of the model the store was built with, used for its documents and queries."""
+        info = self.info
+        return get_embeddings(info.embedding_backend, info.embedding_model, info.embedding_dimensions)
+
+    @property
+    def manifest(self) -> Manifest:
+        """
+        Manifest mapping indexed files to their blob SHA and chunk ids.
+
+        The saved manifest is brought up to date with the operations in the segment log.
+        Stores created before manifests existed get one bootstrapped from the docstore, with
+        unknown SHAs, so their files are re-indexed once instead of being duplicated.
+
+        Returns
+        -------
+        Manifest
+            Manifest of this vectorstore.
+        """
+        if self._manifest is None:
+            manifest = Manifest.load(self.vectorstore_path)
+
+            if not manifest.exists() and Path(self.vectorstore_path).exists():
+                vectorstore = self.load()
+                for doc_id in vectorstore.index_to_docstore_id.values():
+                    doc = vectorstore.docstore.search(doc_id)
+                    if isinstance(doc, Document) and 'repo_url' in doc.metadata:
+                        manifest.add_chunks(doc.metadata['repo_url'], doc.metadata['file_name'], [str(doc_id)])
+                manifest.save()
+
+            for record in self.log.records():
+                manifest.apply(record['manifest'])
+            manifest.pending()
+
+            self._manifest = manifest
+        return self._manifest
+
+    def create(self) -> RescoredFAISS:
         """
         Creates a new vectorstore if it does not exist.
 
         Returns
         -------
-        FAISS
+        RescoredFAISS
             FAISS vectorstore
         """
         vectorstore_path = Path(self.vectorstore_path)
         if vectorstore_path.exists():
             return self.load()
 
-        index = faiss.IndexFlatIP(1536)
-        docstore = InMemoryDocstore()
+        index = AnnIndex.create(self.info.index_factory, self.info.dimension)
+        docstore = CompactDocstore()
         index_to_docstore_id = {}
 
-        vectorstore = FAISS(
-            embedding_function=Vectorstore.embeddings,
+        vectorstore = RescoredFAISS(
+            embedding_function=self.embeddings,
             index=index,
             docstore=docstore,
             index_to_docstore_id=index_to_docstore_id,
+            exact_vectors=ExactVectors(index.d) if AnnIndex.is_compressed(index) else None,
+            lexical_index=LexicalIndex(),
+            symbol_index=SymbolIndex(),
+            file_map=FileMap(),
         )
 
-        vectorstore.save_local(self.vectorstore_path)
+        vectorstore_path.mkdir(parents=True)
+        self._write_snapshot(vectorstore)
+        self.manifest.save()
+        self.info.save()
         return vectorstore
 
     def add_docs(self, docs: list[Document], batch_size: int) -> None:
         """
-        Adds documents in batches of batch_size to avoid rate limiting issues.
-        If there are more than batch_size documents, the function waits 1 minute before continuing.
+        Adds documents in batches of batch_size. Embedding requests to the OpenAI API are throttled
+        by `Vectorstore.embeddings` to the configured TPM/RPM budgets rather than by fixed sleeps.
+
+        Documents keep their ids (deterministic for chunks produced by `Loader.split`), documents
+        already present in the vectorstore are skipped, and committed chunks are recorded in the manifest.
 
         Parameters
         ----------
@@ -62,45 +205,580 @@ class Vectorstore:
         batch_size : int
             batch size
         """
-        try:
-            vectorstore = self.load()
-        except FileNotFoundError:
-            vectorstore = self.create()
+        vectorstore = self.load_for_commit()
+        tracker = FileTracker(vectorstore)
+        tracker.register(docs)
 
         total_docs = len(docs)
         for i in range(0, total_docs, batch_size):
             batch = docs[i : i + batch_size]
-            ids = [uuid4() for _ in batch]
+            new_docs = self.commit(vectorstore, batch, tracker)
+
+            logger.info(f'Added {new_docs} documents to vectorstore. ({i + len(batch)}/{total_docs})')
+
+        self.remove_stale(vectorstore, tracker)
+
+    def commit(
+        self,
+        vectorstore: RescoredFAISS,
+        batch: list[Document],
+        tracker: 'FileTracker',
+        embeddings: list[list[float]] | None = None,
+    ) -> int:
+        """
+        Adds a batch of documents to the vectorstore and records it in the manifest and the segment log.
+
+        The first time a file is seen by the tracker, chunks of its previous version are recorded in
+        the tracker, to be removed all at once by `remove_stale` at the end of the build. Documents whose
+        ids are already in the vectorstore are not embedded again. Persisting the batch costs O(batch):
+        it is appended to the segment log, which is compacted when needed.
+
+        Parameters
+        ----------
+        vectorstore : RescoredFAISS
+            Loaded FAISS vectorstore.
+        batch : list[Document]
+            Documents registered in the tracker.
+        tracker : FileTracker
+            Tracker of the files being indexed.
+        embeddings : list[list[float]] | None, optional
+            Precomputed embeddings of the batch, by default embedded with `Vectorstore.embeddings`.
+
+        Returns
+        -------
+        int
+            Number of documents added to the vectorstore.
+        """
+        manifest = self.manifest
+
+        for key in tracker.keys(batch) - tracker.replaced:
+            tracker.replaced.add(key)
+
+            entry = manifest.get(*key)
+            if entry:
+                stale_ids = [chunk_id for chunk_id in entry['chunk_ids'] if chunk_id not in tracker.chunk_ids[key]]
+                if stale_ids:
+                    tracker.stale_ids[key] = stale_ids
+                    # unconfirm the previous version, keeping its chunk ids until they are removed
+                    manifest.remove_files(key[0], [key[1]])
+                    manifest.add_chunks(*key, entry['chunk_ids'])
+
+        vectors = embeddings if embeddings is not None else [None] * len(batch)
+        new = [(doc, vector) for doc, vector in zip(batch, vectors) if doc.id not in tracker.existing_ids]
+        new_docs = [doc for doc, _ in new]
+
+        added = None
+        if new:
+            new_vectors = [vector for _, vector in new]
+            if embeddings is None:
+                new_vectors = self.embeddings.embed_documents([doc.page_content for doc in new_docs])
+
+            added = {
+                'ids': [doc.id for doc in new_docs],
+                'texts': [doc.page_content for doc in new_docs],
+                'metadatas': [doc.metadata for doc in new_docs],
+            }
+            vectorstore.add_embeddings(
+                text_embeddings=list(zip(added['texts'], new_vectors)),
+                metadatas=added['metadatas'],
+                ids=added['ids'],
+            )
+            tracker.existing_ids.update(added['ids'])
+
+        for doc in batch:
+            key = tracker.key(doc)
+            if key is None:
+                continue
+
+            manifest.add_chunks(*key, [doc.id])
+            if tracker.commit(doc):
+                # files with stale chunks are only confirmed once these are removed, see `remove_stale`
+                if key in tracker.stale_ids:
+                    tracker.completed[key] = doc.metadata['sha']
+                else:
+                    manifest.complete(*key, doc.metadata['sha'])
+
+        self.log.append(
+            add=added,
+            vectors=np.asarray(new_vectors, dtype=np.float32) if added else None,
+            manifest=manifest.pending(),
+        )
+        if self._train(vectorstore) or self.log.should_compact(self._snapshot_bytes()):
+            self.compact(vectorstore)
+
+        return len(new)
+
+    def remove_stale(self, vectorstore: RescoredFAISS, tracker: 'FileTracker') -> int:
+        """
+        Removes the chunks of previous versions of the files committed with a tracker, and confirms these files.
+
+        Stale chunks are collected by `commit` and removed here at once, so index types that are rebuilt
+        on removal (HNSW) are rebuilt once per build rather than once per batch. Until then the files are
+        not confirmed in the manifest and keep their stale chunk ids, so an interrupted build removes them
+        when it re-indexes these files.
+
+        Parameters
+        ----------
+        vectorstore : RescoredFAISS
+            Loaded FAISS vectorstore the tracker's files were committed to.
+        tracker : FileTracker
+            Tracker of the indexed files.
+
+        Returns
+        -------
+        int
+            Number of removed chunks.
+        """
+        if not tracker.stale_ids:
+            return 0
+
+        manifest = self.manifest
+        stale_ids = {chunk_id for chunk_ids in tracker.stale_ids.values() for chunk_id in chunk_ids}
+        removed_ids = Vectorstore._delete_ids(vectorstore, list(stale_ids))
+
+        for key in tracker.stale_ids:
+            kept_ids = [chunk_id for chunk_id in manifest.get(*key)['chunk_ids'] if chunk_id not in stale_ids]
+            manifest.remove_files(key[0], [key[1]])
+            manifest.add_chunks(*key, kept_ids)
+            if key in tracker.completed:
+                manifest.complete(*key, tracker.completed.pop(key))
+
+        tracker.stale_ids = {}
+        tracker.existing_ids.difference_update(stale_ids)
+        tracker.removed += len(removed_ids)
+
+        self.log.append(delete=removed_ids, manifest=manifest.pending())
+        logger.info(f'Removed {len(removed_ids)} stale documents from vectorstore.')
+        return len(removed_ids)
+
+    def _train(self, vectorstore: RescoredFAISS) -> bool:
+        """Replaces a flat stand-in index with the trained target index once there are enough vectors."""
+        index_factory = self.info.index_factory
+        if self._training_size is None:
+            self._training_size = AnnIndex.training_size(index_factory, self.info.dimension)
+
+        if not self._training_size or vectorstore.index.ntotal < self._training_size:
+            return False
+        if not AnnIndex.is_pending(vectorstore.index, index_factory):
+            return False
+
+        trained = AnnIndex.train(vectorstore.index, index_factory)
+        if AnnIndex.is_compressed(trained):
+            vectorstore.exact_vectors = ExactVectors.from_index(vectorstore.index)
+        vectorstore.index = trained
+        return True
+
+    @staticmethod
+    def _delete_ids(vectorstore: RescoredFAISS, ids: list[str]) -> list[str]:
+        """Deletes the given ids that are present in the vectorstore, returning the deleted ones."""
+        positions = {str(doc_id): position for position, doc_id in vectorstore.index_to_docstore_id.items()}
+        ids = [doc_id for doc_id in ids if doc_id in positions]
+        if not ids:
+            return ids
+
+        removed = {positions[doc_id] for doc_id in ids}
+        exact_vectors = vectorstore.exact_vectors
+        vectorstore.index = AnnIndex.remove(
+            vectorstore.index, list(removed), exact_vectors.get if exact_vectors is not None else None
+        )
+        if vectorstore.exact_vectors is not None:
+            vectorstore.exact_vectors.remove(list(removed))
+        vectorstore.docstore.delete([vectorstore.index_to_docstore_id[position] for position in removed])
+        if vectorstore.lexical_index is not None:
+            vectorstore.lexical_index.delete(ids)
+        if vectorstore.symbol_index is not None:
+            vectorstore.symbol_index.delete(ids)
+        if vectorstore.file_map is not None:
+            vectorstore.file_map.remove(list(removed))
+        remaining = [
+            doc_id for position, doc_id in sorted(vectorstore.index_to_docstore_id.items()) if position not in removed
+        ]
+        vectorstore.index_to_docstore_id = dict(enumerate(remaining))
+        return ids
+
+    @staticmethod
+    def vectors(vectorstore: RescoredFAISS) -> np.ndarray | None:
+        """
+        Returns the full-precision vectors of a loaded vectorstore in index order.
+
+        Parameters
+        ----------
+        vectorstore : RescoredFAISS
+            Loaded vectorstore.
+
+        Returns
+        -------
+        np.ndarray | None
+            The exact vectors, or None if the index only stores them lossily.
+        """
+        ntotal = vectorstore.index.ntotal
+        if vectorstore.exact_vectors is not None:
+            return vectorstore.exact_vectors.get(np.arange(ntotal))
+        if AnnIndex.is_compressed(vectorstore.index):
+            return None
+        return vectorstore.index.reconstruct_n(0, ntotal)
+
+    def _snapshot_bytes(self) -> int:
+        """Returns the size of the index and docstore snapshot files in bytes."""
+        file_names = [
+            f'{Vectorstore.INDEX_NAME}.faiss',
+            f'{Vectorstore.INDEX_NAME}.pkl',
+            *CompactDocstore.FILE_NAMES,
+            *LexicalIndex.FILE_NAMES,
+            *SymbolIndex.FILE_NAMES,
+            *FileMap.FILE_NAMES,
+            ExactVectors.FILE_NAME,
+        ]
+        paths = [Path(self.vectorstore_path) / file_name for file_name in file_names]
+        return sum(path.stat().st_size for path in paths if path.exists())
+
+    def size_bytes(self) -> int:
+        """Returns the size of the snapshot and segment log in bytes, approximating the memory of the loaded store."""
+        return self._snapshot_bytes() + self.log.size()
+
+    def generation(self) -> tuple:
+        """
+        Returns a marker of the committed state of the store, which changes with every commit and compaction.
+
+        Commits append to the segment log and compactions replace the index file, so the marker is the inode,
+        modification time and size of both, and tells processes that loaded the store whether another process
+        changed it since.
+        """
+        marker = []
+        for path in (Path(self.vectorstore_path) / f'{Vectorstore.INDEX_NAME}.faiss', self.log.log_path):
+            try:
+                stat = path.stat()
+                marker.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                marker.append(None)
+        return tuple(marker)
 
-            vectorstore.add_documents(documents=batch, ids=ids)
-            vectorstore.save_local(self.vectorstore_path)
+    def _write_snapshot(self, vectorstore: RescoredFAISS, prefix: str = '') -> list[str]:
+        """
+        Writes the index, a compact docstore, the lexical index, the symbol table, the file map and the exact
+        vectors of compressed indexes, prefixing the file names, and returns the names of the written files.
+        """
+        faiss.write_index(
+            vectorstore.index, str(Path(self.vectorstore_path) / f'{prefix}{Vectorstore.INDEX_NAME}.faiss')
+        )
+        ids = [vectorstore.index_to_docstore_id[position] for position in range(len(vectorstore.index_to_docstore_id))]
+        CompactDocstore.write(vectorstore.docstore, ids, self.vectorstore_path, prefix)
+        vectorstore.lexical_index.write(self.vectorstore_path, prefix)
+        vectorstore.symbol_index.write(self.vectorstore_path, prefix)
+        vectorstore.file_map.write(self.vectorstore_path, prefix)
 
-            logger.info(f'Added {len(batch)} documents to vectorstore. ({i + len(batch)}/{total_docs})')
+        file_names = [
+            f'{Vectorstore.INDEX_NAME}.faiss',
+            *CompactDocstore.FILE_NAMES,
+            *LexicalIndex.FILE_NAMES,
+            *SymbolIndex.FILE_NAMES,
+            *FileMap.FILE_NAMES,
+        ]
+        if vectorstore.exact_vectors is not None:
+            vectorstore.exact_vectors.write(self.vectorstore_path, prefix)
+            file_names.append(ExactVectors.FILE_NAME)
+        return file_names
 
-            if i + batch_size < total_docs:
-                logger.warning('Rate limit reached. Sleeping for 1 minute...')
-                time.sleep(60)
+    def compact(self, vectorstore: RescoredFAISS | None = None) -> None:
+        """
+        Folds the segment log into a new snapshot of the index, docstore and manifest.
+
+        Flat indexes are also written as a memory-mappable copy for `load(read_only=True)`, and
+        stores with a pickled docstore (`index.pkl`) are converted to a `CompactDocstore`.
 
-    def load(self) -> FAISS:
+        Parameters
+        ----------
+        vectorstore : RescoredFAISS | None, optional
+            Loaded vectorstore with all logged commits applied, by default loaded from disk.
+        """
+        if vectorstore is None:
+            self.log.recover()
+            vectorstore = self.load()
+        manifest = self.manifest
+
+        file_names = [*self._write_snapshot(vectorstore, SegmentLog.STAGED_PREFIX), Manifest.FILE_NAME]
+        manifest.save(self.log.staged(Manifest.FILE_NAME))
+        self.info.save()
+
+        removed_names = [f'{Vectorstore.INDEX_NAME}.pkl']
+        if ExactVectors.FILE_NAME not in file_names:
+            removed_names.append(ExactVectors.FILE_NAME)
+        mappable_name = f'{Vectorstore.MAPPABLE_INDEX_NAME}.faiss'
+        if AnnIndex.is_flat(vectorstore.index):
+            faiss.write_index(AnnIndex.to_mappable(vectorstore.index), str(self.log.staged(mappable_name)))
+            file_names.append(mappable_name)
+        else:
+            removed_names.append(mappable_name)
+        self.log.compact(file_names, removed_names)
+        logger.info(f'Compacted vectorstore {self.vectorstore_path} ({vectorstore.index.ntotal} documents).')
+
+    def _replay(self, vectorstore: RescoredFAISS) -> None:
+        """Applies the commits of the segment log to a vectorstore loaded from the snapshot."""
+        existing_ids = {str(doc_id) for doc_id in vectorstore.index_to_docstore_id.values()}
+
+        for record in self.log.records():
+            deleted_ids = Vectorstore._delete_ids(vectorstore, record['delete'])
+            existing_ids.difference_update(deleted_ids)
+
+            added = record['add']
+            if added:
+                vectors = self.log.vectors(record)
+                new = [i for i, doc_id in enumerate(added['ids']) if doc_id not in existing_ids]
+                if new:
+                    vectorstore.add_embeddings(
+                        text_embeddings=[(added['texts'][i], vectors[i]) for i in new],
+                        metadatas=[added['metadatas'][i] for i in new],
+                        ids=[added['ids'][i] for i in new],
+                    )
+                    existing_ids.update(added['ids'][i] for i in new)
+
+    def delete_files(self, repo_url: str, file_names: list[str]) -> int:
+        """
+        Removes all chunks of the given files from the FAISS index, the docstore and the manifest.
+
+        Parameters
+        ----------
+        repo_url : str
+            URL of the GitHub repository.
+        file_names : list[str]
+            Paths of the files to remove.
+
+        Returns
+        -------
+        int
+            Number of removed chunks.
+        """
+        if not file_names:
+            return 0
+
+        self.log.recover()
+        manifest = self.manifest
+        chunk_ids = manifest.remove_files(repo_url, file_names)
+
+        removed_ids = []
+        if chunk_ids:
+            vectorstore = self.load()
+            removed_ids = Vectorstore._delete_ids(vectorstore, chunk_ids)
+
+        self.log.append(delete=removed_ids, manifest=manifest.pending())
+        return len(removed_ids)
+
+    @staticmethod
+    def retriever(
+        vectorstore: RescoredFAISS, search_params: dict[str, float] | None = None, **kwargs
+    ) -> TunedRetriever:
+        """
+        Creates a retriever with its own FAISS search parameters.
+
+        Parameters
+        ----------
+        vectorstore : RescoredFAISS
+            Loaded FAISS vectorstore.
+        search_params : dict[str, float] | None, optional
+            Search-time parameters of the index, e.g. `{'nprobe': 32}` for IVF or `{'efSearch': 128}`
+            for HNSW indexes, by default None (FAISS defaults). Parameters the index type does not
+            have are ignored.
+        **kwargs
+            Arguments of `VectorStoreRetriever`, such as `search_type` and `search_kwargs`.
+
+        Returns
+        -------
+        TunedRetriever
+            Retriever applying the search parameters to every search.
+        """
+        tags = kwargs.pop('tags', None) or []
+        return TunedRetriever(
+            vectorstore=vectorstore,
+            search_params=search_params or {},
+            tags=tags + vectorstore._get_retriever_tags(),
+            **kwargs,
+        )
+
+    def load(self, read_only: bool = False) -> RescoredFAISS:
         """
         Loads an existing vectorstore, or raises an error if not found.
 
+        The snapshot is loaded first, then the commits of the segment log are replayed on top of it.
+        Texts and metadata of the docstore are mapped rather than read, and only turned into
+        documents for search results, see `CompactDocstore`. The postings of the lexical index are
+        mapped too. Snapshots written before lexical indexes, symbol tables or file maps existed get them
+        built from the docstore.
+
+        In read-only mode the index is memory-mapped instead of read into the heap, so processes
+        serving the same store share one page-cache copy and start up in time independent of the
+        index size. Inverted-file indexes are mapped directly and flat indexes through their
+        mappable copy written by `compact`, other index types are read as usual. Stores with
+        uncompacted commits are loaded normally, as the log cannot be replayed onto a mapped index.
+
+        Loading never modifies the store, so serving processes can load a store another process commits
+        to. Writers load it with `load_for_commit`, which first finishes an interrupted compaction.
+
+        Parameters
+        ----------
+        read_only : bool, optional
+            Whether to memory-map the index for searching only, by default False.
+
         Returns
         -------
-        FAISS
+        RescoredFAISS
             loaded FAISS vectorstore
 
         Raises
         ------
         FileNotFoundError
             if vectorstore was not found
+        ValueError
+            if the vectors of the store do not match the dimension of the configured embeddings
         """
         vectorstore_path = Path(self.vectorstore_path)
         if not vectorstore_path.exists():
             raise FileNotFoundError("Vectorstore not found. Create it using 'Vectorstore.create()'.")
 
-        return FAISS.load_local(
-            vectorstore_path,
-            Vectorstore.embeddings,
-            allow_dangerous_deserialization=True,
+        mapped = read_only and self.log.size() == 0
+        if read_only and not mapped:
+            logger.warning(f'Vectorstore {self.vectorstore_path} has uncompacted commits, loading it into memory.')
+
+        vectorstore = self._load_snapshot(mapped)
+        info = self.info
+        dimension = embedding_dimension(info.embedding_backend, info.embedding_model, info.embedding_dimensions)
+        if vectorstore.index.d != dimension:
+            raise ValueError(
+                f'Vectorstore {self.vectorstore_path} holds {vectorstore.index.d}-dimensional vectors, but its '
+                f'embeddings ({info.embedding_backend} {info.embedding_model}) have {dimension} dimensions.'
+            )
+        if not mapped:
+            self._replay(vectorstore)
+        return vectorstore
+
+    def load_for_commit(self) -> RescoredFAISS:
+        """
+        Loads the vectorstore to commit to, creating it if it does not exist.
+
+        A compaction interrupted after its snapshot was written is finished first (see `SegmentLog.recover`),
+        so the store is loaded from one complete snapshot.
+
+        Returns
+        -------
+        RescoredFAISS
+            Loaded or new FAISS vectorstore.
+        """
+        self.log.recover()
+        try:
+            return self.load()
+        except FileNotFoundError:
+            return self.create()
+
+    def _load_snapshot(self, mapped: bool = False) -> RescoredFAISS:
+        """Loads the snapshot, optionally with a memory-mapped, read-only index."""
+        vectorstore_path = Path(self.vectorstore_path)
+        index_path = vectorstore_path / f'{Vectorstore.INDEX_NAME}.faiss'
+        mappable_path = vectorstore_path / f'{Vectorstore.MAPPABLE_INDEX_NAME}.faiss'
+
+        if mapped:
+            with index_path.open('rb') as f:
+                is_flat = f.read(4) in Vectorstore.FLAT_FOURCCS
+            if is_flat and mappable_path.exists():
+                index_path = mappable_path
+            index = faiss.read_index(str(index_path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        else:
+            index = faiss.read_index(str(index_path))
+
+        if CompactDocstore.exists(vectorstore_path):
+            docstore = CompactDocstore.load(vectorstore_path)
+            index_to_docstore_id = dict(enumerate(docstore.ids))
+        else:
+            with (vectorstore_path / f'{Vectorstore.INDEX_NAME}.pkl').open('rb') as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+
+        ids, docs = [], []
+        if not all(sidecar.exists(vectorstore_path) for sidecar in (LexicalIndex, SymbolIndex, FileMap)):
+            logger.info(
+                f'Indexing the chunks of {self.vectorstore_path}, the indexes are saved by the next compaction.'
+            )
+            ids = [index_to_docstore_id[position] for position in range(len(index_to_docstore_id))]
+            docs = [docstore.search(doc_id) for doc_id in ids]
+
+        if LexicalIndex.exists(vectorstore_path):
+            lexical_index = LexicalIndex.load(vectorstore_path)
+        else:
+            lexical_index = LexicalIndex.build(ids, [doc.page_content for doc in docs])
+        if SymbolIndex.exists(vectorstore_path):
+            symbol_index = SymbolIndex.load(vectorstore_path)
+        else:
+            symbol_index = SymbolIndex.build(ids, [doc.metadata for doc in docs])
+        if FileMap.exists(vectorstore_path):
+            file_map = FileMap.load(vectorstore_path)
+        else:
+            file_map = FileMap.build([doc.metadata for doc in docs])
+
+        return RescoredFAISS(
+            embedding_function=self.embeddings,
+            index=AnnIndex.prepare(index),
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id,
+            exact_vectors=ExactVectors.load(vectorstore_path) if ExactVectors.exists(vectorstore_path) else None,
+            lexical_index=lexical_index,
+            symbol_index=symbol_index,
+            file_map=file_map,
         )
+
+
+class FileTracker:
+    """
+    Tracks chunks of the files being indexed until all of them are committed.
+
+    A file's blob SHA is only confirmed in the manifest once every registered chunk of it
+    has been committed, so an interrupted build re-indexes partially committed files.
+    """
+
+    def __init__(self, vectorstore: RescoredFAISS):
+        self.existing_ids = {str(doc_id) for doc_id in vectorstore.index_to_docstore_id.values()}
+        self.chunk_ids: dict[tuple[str, str], set[str]] = {}
+        self.pending_ids: dict[tuple[str, str], set[str]] = {}
+        self.replaced: set[tuple[str, str]] = set()
+        # chunk ids of previous versions of replaced files, and SHAs of these files once committed
+        self.stale_ids: dict[tuple[str, str], list[str]] = {}
+        self.completed: dict[tuple[str, str], str] = {}
+        self.removed = 0
+
+    @staticmethod
+    def key(doc: Document) -> tuple[str, str] | None:
+        """Returns the (repo_url, file_name) key of a chunk, or None for documents without a blob SHA."""
+        if 'sha' not in doc.metadata:
+            return None
+        return doc.metadata['repo_url'], doc.metadata['file_name']
+
+    def keys(self, docs: list[Document]) -> set[tuple[str, str]]:
+        """Returns keys of the files the documents belong to."""
+        return {key for key in map(self.key, docs) if key is not None}
+
+    def register(self, docs: list[Document]) -> None:
+        """
+        Registers all chunks of one or more files, assigning random ids to documents without one.
+
+        Parameters
+        ----------
+        docs : list[Document]
+            Complete list of chunks of the registered files.
+        """
+        for doc in docs:
+            doc.id = doc.id or str(uuid4())
+
+            key = self.key(doc)
+            if key is not None:
+                self.chunk_ids.setdefault(key, set()).add(doc.id)
+                self.pending_ids.setdefault(key, set()).add(doc.id)
+
+    def commit(self, doc: Document) -> bool:
+        """Marks a chunk as committed, returning True when it was the last pending chunk of its file."""
+        key = self.key(doc)
+        pending_ids = self.pending_ids.get(key)
+        if pending_ids is None:
+            return False
+
+        pending_ids.discard(doc.id)
+        if pending_ids:
+            return False
+
+        del self.pending_ids[key]
+        return True
@@ -0,0 +1,173 @@
+import json
+import logging
+import os
+import re
+import shutil
+from pathlib import Path
+
+from repo_rag.components.constants import VECTORSTORE_PATH, VECTORSTORE_POINTER_PATH, VECTORSTORE_VERSION
+from repo_rag.components.segment_log import SegmentLog
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class StoreVersions:
+    """
+    A component publishing vectorstore versions through a pointer file.
+
+    Builds write to a new `vectorstore_v{version}` directory, staged as a copy of the published
+    version, and only switch the pointer (`current.json`) once the build is complete. The switch
+    is an atomic rename, so readers see either the previous or the new version, never a partially
+    written one, and running apps pick up the new version on their next search. Previous versions
+    are kept on disk and listed in the pointer, so `rollback` republishes them instantly.
+
+    Setting `VECTORSTORE_VERSION` pins a version instead, which is then built in place.
+    """
+
+    DEFAULT_VERSION = 1
+
+    @staticmethod
+    def path(version: int) -> Path:
+        """Returns the directory of a version."""
+        return Path(VECTORSTORE_PATH + f'_v{version}')
+
+    @staticmethod
+    def _read() -> dict:
+        """Reads the pointer, or returns an empty one if no version was published yet."""
+        try:
+            with open(VECTORSTORE_POINTER_PATH, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'version': None, 'previous': []}
+
+    @staticmethod
+    def _write(pointer: dict) -> None:
+        """Writes the pointer atomically."""
+        path = Path(VECTORSTORE_POINTER_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        with tmp_path.open('w', encoding='utf-8') as f:
+            json.dump(pointer, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def current() -> int:
+        """
+        Returns the version to serve.
+
+        Returns
+        -------
+        int
+            The pinned `VECTORSTORE_VERSION`, else the published version, else `DEFAULT_VERSION`.
+        """
+        return VECTORSTORE_VERSION or StoreVersions._read()['version'] or StoreVersions.DEFAULT_VERSION
+
+    @staticmethod
+    def versions() -> list[int]:
+        """Returns the versions present on disk in ascending order."""
+        root = Path(VECTORSTORE_PATH)
+        pattern = re.compile(re.escape(root.name) + r'_v(\d+)')
+        if not root.parent.exists():
+            return []
+        return sorted(int(match.group(1)) for path in root.parent.iterdir() if (match := pattern.fullmatch(path.name)))
+
+    @staticmethod
+    def stage(clone: bool = True) -> int:
+        """
+        Creates the directory of a new version for a build.
+
+        Files are hard-linked from the current version, so staging costs no copy of the vectors:
+        snapshot and metadata files are only ever replaced by renames, never modified in place.
+        The segment log, which is appended to, is copied.
+
+        Parameters
+        ----------
+        clone : bool, optional
+            Whether to start from the contents of the current version, by default True. Otherwise
+            the new version starts empty.
+
+        Returns
+        -------
+        int
+            The new version, not yet published.
+        """
+        current = StoreVersions.current()
+        version = max([current, *StoreVersions.versions()]) + 1
+        while True:
+            try:
+                StoreVersions.path(version).parent.mkdir(parents=True, exist_ok=True)
+                StoreVersions.path(version).mkdir()
+                break
+            except FileExistsError:
+                version += 1
+
+        source = StoreVersions.path(current)
+        if clone and source.exists():
+            SegmentLog(source).recover()
+
+            def link(src: str, dst: str) -> None:
+                if Path(src).name == SegmentLog.FILE_NAME:
+                    shutil.copy2(src, dst)
+                    return
+                try:
+                    os.link(src, dst)
+                except OSError:
+                    shutil.copy2(src, dst)
+
+            shutil.copytree(source, StoreVersions.path(version), copy_function=link, dirs_exist_ok=True)
+
+        logger.info(f'Staged vectorstore version {version}' + (f' from version {current}.' if clone else '.'))
+        return version
+
+    @staticmethod
+    def publish(version: int) -> None:
+        """
+        Atomically makes a version the one served, keeping the previous one for `rollback`.
+
+        Parameters
+        ----------
+        version : int
+            Version to publish.
+
+        Raises
+        ------
+        FileNotFoundError
+            if the version does not exist
+        """
+        if not StoreVersions.path(version).exists():
+            raise FileNotFoundError(f'Vectorstore version {version} not found.')
+
+        pointer = StoreVersions._read()
+        previous = [v for v in pointer['previous'] if v != version]
+        if pointer['version'] is not None and pointer['version'] != version:
+            previous.append(pointer['version'])
+        StoreVersions._write({'version': version, 'previous': previous})
+        logger.info(f'Published vectorstore version {version}.')
+
+    @staticmethod
+    def rollback() -> int:
+        """
+        Republishes the previously published version that still exists.
+
+        Returns
+        -------
+        int
+            The version published again.
+
+        Raises
+        ------
+        ValueError
+            if there is no previous version to roll back to
+        """
+        pointer = StoreVersions._read()
+        previous = [v for v in pointer['previous'] if StoreVersions.path(v).exists()]
+        if not previous:
+            raise ValueError('There is no previous vectorstore version to roll back to.')
+
+        version = previous.pop()
+        StoreVersions._write({'version': version, 'previous': previous})
+        logger.info(f'Rolled back from vectorstore version {pointer["version"]} to {version}.')
+        return version
@@ -1,7 +1,11 @@
 import asyncio
+from uuid import uuid4
 
 import streamlit as st
 
+from repo_rag.components.answer_cache import answer_cache
+from repo_rag.components.embeddings import query_cache
+from repo_rag.components.store_pool import vectorstore_pool
 from repo_rag.graph.graph import create_workflow
 from repo_rag.frontend.utils import add_to_vector_store
 
@@ -46,15 +50,22 @@ def ui():
             graph = create_workflow()
             st.session_state['graph'] = graph
 
-        thread_id = '1'
+        # every conversation has its own checkpoint thread, so its first question can be answered from the cache
+        new_conversation = st.button('New conversation')
+        if new_conversation or 'thread_id' not in st.session_state:
+            st.session_state['thread_id'] = str(uuid4())
+            st.session_state['messages'] = []
+
+        thread_id = st.session_state['thread_id']
 
-        user_input = st.text_input('Ask question about repository:', '')
+        repo_url = st.session_state['repo_url']
+        user_input = st.text_input('Ask question about repository:', '', key=f'question-{thread_id}')
 
         if user_input:
             session_graph = st.session_state['graph']
             result = asyncio.run(
                 session_graph.ainvoke(
-                    {'messages': user_input},
+                    {'messages': user_input, 'repo_urls': [repo_url] if repo_url else None},
                     config={'configurable': {'thread_id': thread_id}},
                 )
             )
@@ -69,3 +80,28 @@ def ui():
                 st.markdown(f'**User:** {message["content"]}')
             elif message['role'] == 'chat':
                 st.markdown(f'**Repo Rag Assistant:** {message["content"]}')
+
+        pool_stats = vectorstore_pool.stats()
+        st.sidebar.subheader('Vectorstore pool')
+        st.sidebar.write(
+            f'{pool_stats["resident_stores"]} stores resident '
+            f'({pool_stats["resident_bytes"] / 1024 / 1024:.0f} of {pool_stats["max_bytes"] / 1024 / 1024:.0f} MB), '
+            f'hit rate {pool_stats["hit_rate"]:.2f}, {pool_stats["evictions"]} evictions, '
+            f'{pool_stats["loads"]} loads ({pool_stats["mean_load_seconds"]:.2f} s on average)'
+        )
+
+        query_stats = query_cache.stats()
+        st.sidebar.subheader('Query embedding cache')
+        st.sidebar.write(
+            f'{query_stats["entries"]} queries cached, hit rate {query_stats["hit_rate"]:.2f} '
+            f'({query_stats["hits"]} in memory, {query_stats["disk_hits"]} on disk, {query_stats["misses"]} misses)'
+        )
+
+        answer_stats = answer_cache.stats()
+        st.sidebar.subheader('Answer cache')
+        st.sidebar.write(
+            f'{answer_stats["entries"]} answers cached, hit rate {answer_stats["hit_rate"]:.2f} '
+            f'({answer_stats["hits"]} hits, {answer_stats["misses"]} misses), '
+            f'answers {answer_stats["mean_hit_age"]:.0f} s old on average, '
+            f'{answer_stats["invalidations"]} invalidated, {answer_stats["expirations"]} expired'
+        )
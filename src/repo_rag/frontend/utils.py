@@ -3,8 +3,12 @@ import logging
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import streamlit as st
 
-from repo_rag.components.loader import Loader
-from repo_rag.components.vectorstore import Vectorstore
+from repo_rag.components.answer_cache import answer_cache
+from repo_rag.components.constants import VECTORSTORE_VERSION
+from repo_rag.components.indexer import Indexer
+from repo_rag.components.sharded_store import ShardedVectorstore
+from repo_rag.components.store_pool import vectorstore_pool
+from repo_rag.components.versions import StoreVersions
 
 
 logging.basicConfig(level=logging.INFO)
@@ -22,20 +26,21 @@ def add_to_vector_store(repo_url: str) -> None:
     """
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=1024, chunk_overlap=64, separators=['\n', ' ', ''])
 
-    documents = Loader.load_and_split(repo_url, text_splitter)
-
-    logger.info(f'Total of {len(documents)} documents')
-
-    store = Vectorstore(1)
+    version = VECTORSTORE_VERSION or StoreVersions.stage()
+    store = ShardedVectorstore(version)
 
     batch_size = 900
-    total_batches = len(documents) // batch_size + (1 if len(documents) % batch_size != 0 else 0)
 
-    st.write(
-        f'Processing repository, adding documents to vector store, estimated time {int(total_batches * 1.3)} minutes...'
-    )
+    st.write('Processing repository, adding added or modified files to vector store...')
+
+    stats = Indexer.index_repository(store, repo_url, text_splitter, batch_size=batch_size)
+    if VECTORSTORE_VERSION:
+        vectorstore_pool.evict(store.shard(repo_url))
+        answer_cache.invalidate(repo_url)
+    else:
+        StoreVersions.publish(version)
 
-    store.add_docs(docs=documents, batch_size=batch_size)
+    logger.info(f'Indexed repository {repo_url} into vectorstore v{version}: {stats}')
 
     st.session_state['repo_url'] = repo_url
     st.session_state['go_to_chatbot'] = True
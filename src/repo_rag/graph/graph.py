@@ -1,7 +1,16 @@
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import END, START, StateGraph
 
-from repo_rag.graph.nodes import chatbot, fill_template, final_answer, retrieve_data, route_retriever
+from repo_rag.graph.nodes import (
+    cache_answer,
+    chatbot,
+    check_answer_cache,
+    fill_template,
+    final_answer,
+    retrieve_data,
+    route_answer_cache,
+    route_retriever,
+)
 from repo_rag.graph.state import RepoConvoState
 from repo_rag.graph.utils import run_graph
 
@@ -12,12 +21,15 @@ def create_workflow():
     """
     workflow = StateGraph(RepoConvoState)
 
+    workflow.add_node('check_answer_cache', check_answer_cache)
     workflow.add_node('chatbot', chatbot)
     workflow.add_node('retrieve_data', retrieve_data)
     workflow.add_node('fill_template', fill_template)
     workflow.add_node('final_answer', final_answer)
+    workflow.add_node('cache_answer', cache_answer)
 
-    workflow.add_edge(START, 'chatbot')
+    workflow.add_edge(START, 'check_answer_cache')
+    workflow.add_conditional_edges('check_answer_cache', route_answer_cache, {END: END, 'chatbot': 'chatbot'})
     workflow.add_conditional_edges(
         'chatbot',
         route_retriever,
@@ -25,7 +37,8 @@ def create_workflow():
     )
     workflow.add_edge('retrieve_data', 'fill_template')
     workflow.add_edge('fill_template', 'final_answer')
-    workflow.add_edge('final_answer', END)
+    workflow.add_edge('final_answer', 'cache_answer')
+    workflow.add_edge('cache_answer', END)
 
     memory_saver = MemorySaver()
 
@@ -36,12 +49,17 @@ def create_workflow():
 
 if __name__ == '__main__':
     import asyncio
+    from uuid import uuid4
 
     graph = create_workflow()
-    thread_id = '1'
+    thread_id = str(uuid4())
 
     while True:
         query = input('You: ')
+        if query == '/new':
+            thread_id = str(uuid4())
+            print('Started a new conversation.')
+            continue
 
         result = asyncio.run(run_graph(graph, query, thread_id))
 
@@ -1,12 +1,16 @@
+import asyncio
 import logging
 
 from langchain_core.messages import AIMessage
 from langgraph.graph import END
 
+from repo_rag.components.answer_cache import answer_cache
 from repo_rag.components.retrievers import retriever
+from repo_rag.components.sharded_store import ShardedRetriever
 from repo_rag.components.llms import chat_llm
 from repo_rag.components.chains import query_extraction_chain
 from repo_rag.components.prompts import route_to_retriever_placeholder
+from repo_rag.components.symbols import SymbolIndex
 from repo_rag.graph.state import RepoConvoState
 from repo_rag.graph.utils import format_prompt, format_docs
 
@@ -14,6 +18,43 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+async def check_answer_cache(state: RepoConvoState):
+    """
+    Answers the question from the answer cache if a similar enough question was answered before. Follow-up
+    questions are not looked up, as their answers depend on the conversation rather than on the question.
+
+    Parameters
+    ----------
+    state : RepoConvoState
+        The current workflow state.
+    """
+    if len(state['messages']) > 1:
+        return {**state, 'cache_hit': False}
+
+    question = state['messages'][-1].content
+    cached = await asyncio.to_thread(answer_cache.lookup, question, state.get('repo_urls'))
+    if cached is None:
+        return {**state, 'cache_hit': False}
+
+    logger.info(f'Answered from the cache of "{cached["question"]}" (similarity {cached["similarity"]:.3f}).')
+    return {**state, 'cache_hit': True, 'sources': cached['sources'], 'messages': [AIMessage(cached['answer'])]}
+
+
+async def route_answer_cache(state: RepoConvoState):
+    """
+    Decides whether the question was answered from the cache, or proceeds to the chatbot
+
+    Parameters
+    ----------
+    state : RepoConvoState
+        The current workflow state.
+    """
+    if state['cache_hit']:
+        return END
+    else:
+        return 'chatbot'
+
+
 async def chatbot(state: RepoConvoState):
     """
     Invokes query_extraction chain for retrieval routing.
@@ -56,7 +97,12 @@ async def route_retriever(state: RepoConvoState):
 
 async def retrieve_data(state: RepoConvoState):
     """
-    Retrieves repo documents relevant to the given research question from the vector database.
+    Retrieves repo documents relevant to the given research question from the vector database,
+    searching the repositories given in the state, or all of them.
+
+    Identifiers named in the question are resolved from the symbol table alongside the search, and
+    the chunks defining them are fused with the search results by reciprocal rank, so a question
+    about how a function is used gets both its definition and the chunks relevant to the question.
 
     Parameters
     ----------
@@ -64,10 +110,20 @@ async def retrieve_data(state: RepoConvoState):
         The current workflow state.
     """
     question = state['messages'][-1].content
+    repo_urls = state.get('repo_urls')
+    k = retriever.search_kwargs.get('k', 4)
 
-    retrieved_docs = await retriever.ainvoke(question)
+    names = SymbolIndex.mentions(question)
+    (symbol_docs, _), retrieved_docs = await asyncio.gather(
+        asyncio.to_thread(retriever.lookup_symbols, names, repo_urls),
+        retriever.ainvoke(question, repo_urls=repo_urls),
+    )
+    if not symbol_docs:
+        return {**state, 'retrieved_docs': retrieved_docs[:k]}
 
-    return {**state, 'retrieved_docs': retrieved_docs}
+    logger.info(f'Resolved {len(symbol_docs)} definitions of {names} from the symbol table.')
+    fused = ShardedRetriever.fuse([symbol_docs, retrieved_docs])
+    return {**state, 'retrieved_docs': [doc for doc, _ in fused[:k]]}
 
 
 async def fill_template(state: RepoConvoState):
@@ -110,3 +166,26 @@ async def final_answer(state: RepoConvoState):
     response = await chat_llm.ainvoke(prompt)
 
     return {**state, 'messages': [AIMessage(response.content)]}
+
+
+async def cache_answer(state: RepoConvoState):
+    """
+    Adds the answer to the answer cache if it is based on retrieved repository documents and answers the first
+    question of the conversation, as other answers may depend on the conversation rather than on the question.
+
+    Parameters
+    ----------
+    state : RepoConvoState
+        The current workflow state.
+    """
+    if not state['should_retrieve']:
+        return {**state, 'sources': []}
+
+    sources = list(
+        dict.fromkeys(f'{doc.metadata["file_name"]} - {doc.metadata["full_url"]}' for doc in state['retrieved_docs'])
+    )
+    if len(state['messages']) == 2:
+        question, answer = state['messages'][0].content, state['messages'][1].content
+        await asyncio.to_thread(answer_cache.add, question, answer, sources, state.get('repo_urls'))
+
+    return {**state, 'sources': sources}
@@ -11,6 +11,10 @@ class RepoConvoState(TypedDict):
     """
 
     messages: Annotated[list, add_messages]
+    repo_urls: list[str] | None
+
+    cache_hit: bool
+    sources: list[str]
 
     should_retrieve: bool
     retrieving_query: str